@@ -1,31 +1,37 @@
+import time
+# Taken before anything else is imported, for --profile-startup
+STARTUP_T0 = time.perf_counter()
 import sys
 import os
 import shutil
 import subprocess
-import json
+import importlib.util
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QComboBox, 
                              QSpinBox, QCheckBox, QTabWidget, QLineEdit,
-                             QMessageBox, QDoubleSpinBox, QDialog, QDialogButtonBox)
-from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSignal
+                             QMessageBox, QDoubleSpinBox, QDialog, QDialogButtonBox,
+                             QTableWidget, QTableWidgetItem, QAbstractItemView,
+                             QFileDialog, QProgressBar, QInputDialog)
+from PyQt5.QtCore import QTimer, Qt, QThread, QObject, QEvent, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor, QKeySequence
-import time
-
-# Check for required libraries
-missing_libs = []
-try:
-    import pyautogui
-except ImportError:
-    missing_libs.append("pyautogui")
+from timing import MISSED_POLICIES, CATCH_UP, CLICKS_PER_SECOND
+from engines import ClickEngine, TypeEngine, StreamTypeEngine, JobEngine
+from macro import EventLog, MacroRecorder, ReplayEngine
+from backends import BACKEND_NAMES, BUTTONS, create_backend, list_windows, x11_windows_available
+from hotkeys import HotkeyDispatcher
+# engines imports paste anyway
+from paste import AUTO, KEYS, PASTE_THRESHOLD, STRATEGIES
 
-try:
-    import keyboard
-except ImportError:
-    missing_libs.append("keyboard")
+# Check for required libraries. Only looks them up, importing pyautogui and
+# keyboard is slow and the backends do it when they're first used. The rest
+# of what the GUI can do is imported by whatever first needs it.
+missing_libs = [lib for lib in ("pyautogui", "keyboard") if importlib.util.find_spec(lib) is None]
 
 class SettingsDialog(QDialog):
-    def __init__(self, parent=None, ignore_tos=False):
+    def __init__(self, parent=None, ignore_tos=False, input_backend="auto", control_socket=False,
+                 engine_process=False, trace_events=False):
         super().__init__(parent)
+        import control
         self.setWindowTitle("Settings")
         self.setModal(True)
         
@@ -35,108 +41,237 @@ class SettingsDialog(QDialog):
         self.ignore_tos_checkbox.setChecked(ignore_tos)
         layout.addWidget(self.ignore_tos_checkbox)
         
+        # How clicks and keys get sent to the OS
+        backend_layout = QHBoxLayout()
+        backend_layout.addWidget(QLabel("Input backend:"))
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(BACKEND_NAMES)
+        self.backend_combo.setCurrentText(input_backend)
+        backend_layout.addWidget(self.backend_combo)
+        layout.addLayout(backend_layout)
+        
+        # Lets scripts start and stop things, see control.py
+        self.control_checkbox = QCheckBox(f"Accept commands from scripts on {control.default_socket_path()}")
+        self.control_checkbox.setChecked(control_socket)
+        self.control_checkbox.setEnabled(control.available())
+        layout.addWidget(self.control_checkbox)
+        
+        # Keeps the GUI from holding up the clicks, see workers.py
+        self.process_checkbox = QCheckBox("Run the clicker and typer in their own process")
+        self.process_checkbox.setChecked(engine_process)
+        layout.addWidget(self.process_checkbox)
+        
+        # See eventtrace.py
+        self.trace_checkbox = QCheckBox("Record a timing trace of every clicker and typer run")
+        self.trace_checkbox.setChecked(trace_events)
+        layout.addWidget(self.trace_checkbox)
+        
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
 
-class ClickerThread(QThread):
+class TracedThread(QThread):
+    # Runs self.engine, then writes out its trace if it kept one and
+    # trace_path is set, along with the GUI's marks
+    trace_saved = pyqtSignal(str, str)  # path, and why it couldn't be written ("" if it was)
+    trace_path = None
+    marks = None
+    
+    def run(self):
+        self.engine.run()
+        if self.trace_path and self.engine.trace is not None:
+            from eventtrace import write_trace
+            try:
+                write_trace(self.trace_path, self.engine.trace, self.marks)
+            except OSError as e:
+                self.trace_saved.emit(self.trace_path, str(e))
+            else:
+                self.trace_saved.emit(self.trace_path, "")
+
+class ClickerThread(TracedThread):
     finished = pyqtSignal()
     countdown = pyqtSignal(int)
+    stats = pyqtSignal(float, float, int)  # achieved clicks/s, jitter in ms, missed clicks
+    failed = pyqtSignal(str)
+    
+    def __init__(self, backend, interval, time_unit, missed_policy=CATCH_UP, burst=1, humanize=None,
+                 in_process=False, trace=None):
+        super().__init__()
+        settings = dict(
+            interval=interval,
+            time_unit=time_unit,
+            missed_policy=missed_policy,
+            countdown=5,
+            burst=burst,
+            humanize=humanize,
+            trace=trace
+        )
+        callbacks = dict(on_countdown=self.countdown.emit, on_stats=self.stats.emit)
+        if in_process:
+            # backend is the name of the one the worker should open
+            from workers import ProcessEngine
+            self.engine = ProcessEngine(ClickEngine, backend, settings, callbacks, self.failed.emit)
+        else:
+            self.engine = ClickEngine(backend, **settings, **callbacks)
+    
+    def stop(self):
+        self.engine.stop()
+        self.finished.emit()
+
+class TyperThread(TracedThread):
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    throughput = pyqtSignal(str, float)  # strategy, characters a second
+    
+    def __init__(self, backend, interval, time_unit, text_to_type, duration, key_delay, in_process=False,
+                 trace=None, strategy=KEYS, paste_threshold=PASTE_THRESHOLD):
+        super().__init__()
+        settings = dict(
+            interval=interval,
+            time_unit=time_unit,
+            text_to_type=text_to_type,
+            duration=duration,
+            key_delay=key_delay,
+            trace=trace,
+            strategy=strategy,
+            paste_threshold=paste_threshold
+        )
+        callbacks = dict(on_finished=self.finished.emit, on_throughput=self.throughput.emit)
+        if in_process:
+            from workers import ProcessEngine
+            self.engine = ProcessEngine(TypeEngine, backend, settings, callbacks, self.failed.emit)
+        else:
+            self.engine = TypeEngine(backend, **settings, **callbacks)
+    
+    def stop(self):
+        self.engine.stop()
+        self.finished.emit()
+
+class StreamTyperThread(QThread):
+    finished = pyqtSignal()
+    progress = pyqtSignal(int, int, int)  # bytes done, total bytes, lines done
     
-    def __init__(self, interval, time_unit, stop_key):
+    def __init__(self, backend, source, key_delay, resume):
         super().__init__()
-        self.interval = interval
-        self.time_unit = time_unit
-        self.stop_key = stop_key.lower() if stop_key else 'q'
-        self.running = True
+        self.engine = StreamTypeEngine(
+            backend, source, key_delay, resume,
+            on_progress=self.progress.emit,
+            on_finished=self.finished.emit
+        )
         
     def run(self):
-        # Countdown from 5 to 1
-        for i in range(5, 0, -1):
-            if not self.running:
-                self.finished.emit()
-                return
-            self.countdown.emit(i)
-            time.sleep(1)
-        
-        # Convert interval to seconds
-        if self.time_unit == "Milliseconds":
-            wait_time = self.interval / 1000
-        elif self.time_unit == "Seconds":
-            wait_time = self.interval
-        else:  # Minutes
-            wait_time = self.interval * 60
-        
-        # Signal that countdown is done
-        self.countdown.emit(0)
-            
-        while self.running:
-            if keyboard.is_pressed(self.stop_key):
-                self.running = False
-                self.finished.emit()
-                break
-            pyautogui.click()
-            time.sleep(wait_time)
+        self.engine.run()
     
     def stop(self):
-        self.running = False
+        self.engine.stop()
         self.finished.emit()
 
-class TyperThread(QThread):
+class WatchThread(QThread):
+    stats = pyqtSignal(float, int, float, float)  # frames/s, clicks, capture ms, compare ms
+    
+    def __init__(self, backend, grabber, detector, poll_rate, button):
+        super().__init__()
+        from watch import WatchEngine
+        self.engine = WatchEngine(
+            backend, grabber, detector, poll_rate,
+            button=button,
+            on_stats=self.stats.emit
+        )
+        
+    def run(self):
+        self.engine.run()
+    
+    def stop(self):
+        self.engine.stop()
+
+class JobEngineThread(QThread):
+    def __init__(self, backend):
+        super().__init__()
+        self.engine = JobEngine(backend)
+        
+    def run(self):
+        self.engine.run()
+    
+    def stop(self):
+        self.engine.stop()
+
+class ReplayThread(QThread):
     finished = pyqtSignal()
     
-    def __init__(self, interval, time_unit, text_to_type, duration):
+    def __init__(self, backend, log, speed, loops):
         super().__init__()
-        self.interval = interval
-        self.time_unit = time_unit
-        self.text_to_type = text_to_type
-        self.duration = duration
-        self.running = True
+        self.engine = ReplayEngine(backend, log, speed, loops, on_finished=self.finished.emit)
         
     def run(self):
-        # Convert interval to seconds
-        if self.time_unit == "Second":
-            wait_time = self.interval
-        else:  # Minute
-            wait_time = self.interval * 60
-        
-        start_time = time.time()
-        
-        while self.running:
-            # Check duration if set
-            if self.duration > 0:
-                if time.time() - start_time >= self.duration:
-                    self.running = False
-                    self.finished.emit()
-                    break
-                    
-            pyautogui.typewrite(self.text_to_type, interval=0.05)
-            time.sleep(wait_time)
+        self.engine.run()
     
     def stop(self):
-        self.running = False
+        self.engine.stop()
         self.finished.emit()
 
-class HotkeyListener(QThread):
-    hotkey_pressed = pyqtSignal()
+class PathThread(QThread):
+    finished = pyqtSignal()
     
-    def __init__(self, hotkey):
+    def __init__(self, backend, path, loops, button):
         super().__init__()
-        self.hotkey = hotkey.lower() if hotkey else None
-        self.running = True
+        from trajectory import PathEngine
+        self.engine = PathEngine(backend, path, loops, button, on_finished=self.finished.emit)
         
     def run(self):
-        if not self.hotkey:
-            return
-        while self.running:
-            if keyboard.is_pressed(self.hotkey):
-                self.hotkey_pressed.emit()
-                time.sleep(0.5)  # Debounce
-            time.sleep(0.1)
+        self.engine.run()
+    
+    def stop(self):
+        self.engine.stop()
+        self.finished.emit()
+
+class HotkeyListener(QObject):
+    hotkey_pressed = pyqtSignal(str)
+    
+    def __init__(self, source=None):
+        super().__init__()
+        self.dispatcher = HotkeyDispatcher()
+        self.source = source
+        
+    def bind(self, key):
+        # Callbacks run on the hook's thread, the signal carries the key
+        # over to the GUI thread
+        if key:
+            self.dispatcher.bind(key, self.hotkey_pressed.emit)
+    
+    def start(self):
+        self.dispatcher.start(self.source)
     
     def stop(self):
-        self.running = False
+        self.dispatcher.stop()
+
+def widget_value(widget):
+    if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+        return widget.value()
+    if isinstance(widget, QComboBox):
+        return widget.currentText()
+    if isinstance(widget, QCheckBox):
+        return widget.isChecked()
+    return widget.text()
+
+def set_widget_value(widget, value):
+    if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+        widget.setValue(value)
+    elif isinstance(widget, QComboBox):
+        widget.setCurrentText(value)
+    elif isinstance(widget, QCheckBox):
+        widget.setChecked(value)
+    else:
+        widget.setText(value)
+
+def changed_signal(widget):
+    if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+        return widget.valueChanged
+    if isinstance(widget, QComboBox):
+        return widget.currentTextChanged
+    if isinstance(widget, QCheckBox):
+        return widget.stateChanged
+    return widget.textChanged
 
 class AutoClickerGUI(QMainWindow):
     def __init__(self):
@@ -146,11 +281,36 @@ class AutoClickerGUI(QMainWindow):
         
         self.dark_mode = False
         self.ignore_tos_warnings = False
+        self.input_backend = "auto"
+        self.control_socket = False
+        self.control_server = None
+        self.engine_process = False
+        self.trace_events = False
+        # What the GUI thread was up to, for traces; only kept while tracing
+        self.gui_marks = None
+        self.heartbeat = None
         self.clicker_thread = None
+        # Switched on by the user: the emergency STOP key stops the clicking
+        # but leaves it armed, so the turn on key can start it again
+        self.clicker_armed = False
         self.typer_thread = None
+        self.jobs_thread = None
+        self.jobs_humanize = None
+        self.replay_thread = None
+        self.path_thread = None
+        self.watch_thread = None
+        self.watch_reference = None
+        self.metrics_server = None
         self.hotkey_listener = None
+        self.macro_recorder = None
+        self.macro_log = EventLog()
+        # Click jobs as shown in the jobs tab, with the engine's id once running
+        self.click_jobs = []
+        # Set while a profile is being put into the widgets
+        self.applying_profile = False
         
-        self.config_file = os.path.join(os.path.expanduser("~"), ".autoclicker_config.json")
+        from settings import SettingsStore
+        self.settings = SettingsStore()
         self.load_settings()
         
         # Show ToS warning on first launch
@@ -158,6 +318,11 @@ class AutoClickerGUI(QMainWindow):
             self.show_tos_warning()
         
         self.init_ui()
+        self.apply_profile(self.settings.profile())
+        self.set_tracing(self.trace_events)
+        
+        if self.control_socket:
+            self.set_control_server(True)
         
     def show_tos_warning(self):
         msg = QMessageBox(self)
@@ -186,34 +351,170 @@ class AutoClickerGUI(QMainWindow):
             sys.exit(0)
         
     def load_settings(self):
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    settings = json.load(f)
-                    self.dark_mode = settings.get('dark_mode', False)
-                    self.ignore_tos_warnings = settings.get('ignore_tos_warnings', False)
-        except:
-            pass
+        # Only the global settings and the name of the active profile; the
+        # profile itself is read once the widgets exist
+        self.settings.load()
+        self.dark_mode = self.settings.get('dark_mode', False)
+        self.ignore_tos_warnings = self.settings.get('ignore_tos_warnings', False)
+        self.input_backend = self.settings.get('input_backend', "auto")
+        self.control_socket = self.settings.get('control_socket', False)
+        self.engine_process = self.settings.get('engine_process', False)
+        self.trace_events = self.settings.get('trace_events', False)
     
     def save_settings(self):
+        # Returns straight away, the store writes it out in the background
+        self.settings.update(
+            dark_mode=self.dark_mode,
+            ignore_tos_warnings=self.ignore_tos_warnings,
+            input_backend=self.input_backend,
+            control_socket=self.control_socket,
+            engine_process=self.engine_process,
+            trace_events=self.trace_events
+        )
+    
+    def profile_widgets(self):
+        # What a profile remembers, by the name it's saved under
+        return {
+            'interval': self.click_interval,
+            'unit': self.time_unit,
+            'missed': self.missed_policy,
+            'burst': self.click_burst,
+            'humanize': self.humanize_check,
+            'humanize_distribution': self.humanize_distribution,
+            'humanize_spread': self.humanize_spread,
+            'humanize_offset': self.humanize_offset,
+            'humanize_seed': self.humanize_seed,
+            'turn_on_key': self.turn_on_key,
+            'stop_key': self.stop_key,
+            'type_interval': self.type_interval,
+            'type_unit': self.type_time_unit,
+            'type_duration': self.type_duration,
+            'key_delay': self.type_key_delay,
+            'type_strategy': self.type_strategy,
+            'paste_threshold': self.paste_threshold,
+            'text': self.text_to_type,
+        }
+    
+    def profile_jobs(self):
+        # The click jobs as a profile saves them
+        return [
+            {'x': job['x'], 'y': job['y'], 'interval_ms': job['interval_ms'], 'button': job['button']}
+            for job in self.click_jobs
+        ]
+    
+    def profile_values(self):
+        values = {name: widget_value(widget) for name, widget in self.profile_widgets().items()}
+        values['jobs'] = self.profile_jobs()
+        return values
+    
+    def jobs_differ(self, values):
+        return 'jobs' in values and values['jobs'] != self.profile_jobs()
+    
+    def confirm_replace_jobs(self, values):
+        # False if taking on values would stop the running jobs and the
+        # user would rather it didn't
+        if not self.jobs_thread or not self.jobs_differ(values):
+            return True
+        reply = QMessageBox.question(
+            self,
+            "Switch Profile",
+            "That profile has different click jobs, switching stops the ones running now.\n\nSwitch anyway?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
+    
+    def apply_profile(self, values):
+        # Signals are blocked so nothing asks for confirmation or saves
+        # while the values go in; running engines get the result after
+        self.applying_profile = True
         try:
-            settings = {
-                'dark_mode': self.dark_mode,
-                'ignore_tos_warnings': self.ignore_tos_warnings
-            }
-            with open(self.config_file, 'w') as f:
-                json.dump(settings, f)
-        except:
-            pass
-        
+            for name, widget in self.profile_widgets().items():
+                if name in values:
+                    widget.blockSignals(True)
+                    set_widget_value(widget, values[name])
+                    widget.blockSignals(False)
+            # Left alone, running or not, unless the profile's are different
+            if self.jobs_differ(values):
+                if self.jobs_thread:
+                    self.stop_jobs()
+                self.click_jobs = [dict(job, id=None, clicks=0) for job in values['jobs']]
+                self.refresh_jobs_table()
+        finally:
+            self.applying_profile = False
+        self.reconfigure_clicker()
+        self.reconfigure_typer()
+    
+    def profile_changed(self, *args):
+        if not self.applying_profile:
+            self.gui_mark("profile change")
+            self.settings.save_profile(self.profile_values())
+    
+    def switch_profile(self, name):
+        if not name or name == self.settings.active_profile:
+            return
+        values = self.settings.profile(name)
+        if not self.confirm_replace_jobs(values):
+            self.profile_combo.blockSignals(True)
+            self.profile_combo.setCurrentText(self.settings.active_profile)
+            self.profile_combo.blockSignals(False)
+            return
+        self.settings.set_active(name)
+        self.apply_profile(values)
+    
+    def new_profile(self):
+        name, ok = QInputDialog.getText(self, "New Profile", "Name (starts as a copy of this one):")
+        name = name.strip()
+        if not ok or not name:
+            return
+        try:
+            self.settings.save_profile(self.profile_values(), name)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        if self.profile_combo.findText(name) < 0:
+            self.profile_combo.addItem(name)
+        self.profile_combo.setCurrentText(name)
+    
+    def delete_profile(self):
+        from settings import DEFAULT_PROFILE
+        name = self.profile_combo.currentText()
+        if name == DEFAULT_PROFILE:
+            QMessageBox.warning(self, "Error", "The default profile can't be deleted!")
+            return
+        values = self.settings.profile(DEFAULT_PROFILE)
+        if not self.confirm_replace_jobs(values):
+            return
+        self.settings.delete_profile(name)
+        # Straight to the default; removing the item on its own would
+        # switch to whichever profile is next to it first
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.removeItem(self.profile_combo.findText(name))
+        self.profile_combo.setCurrentText(DEFAULT_PROFILE)
+        self.profile_combo.blockSignals(False)
+        self.apply_profile(values)
+    
+
     def init_ui(self):
         # Create central widget and main layout
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
         
-        # Settings button at top
+        # Profile picker and settings button at top
         settings_btn_layout = QHBoxLayout()
+        settings_btn_layout.addWidget(QLabel("Profile:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(self.settings.profile_names())
+        self.profile_combo.setCurrentText(self.settings.active_profile)
+        self.profile_combo.currentTextChanged.connect(self.switch_profile)
+        settings_btn_layout.addWidget(self.profile_combo)
+        new_profile_btn = QPushButton("New...")
+        new_profile_btn.clicked.connect(self.new_profile)
+        settings_btn_layout.addWidget(new_profile_btn)
+        delete_profile_btn = QPushButton("Delete")
+        delete_profile_btn.clicked.connect(self.delete_profile)
+        settings_btn_layout.addWidget(delete_profile_btn)
         settings_btn_layout.addStretch()
         self.settings_btn = QPushButton("⚙ Settings")
         self.settings_btn.clicked.connect(self.open_settings)
@@ -234,6 +535,30 @@ class AutoClickerGUI(QMainWindow):
         self.create_typer_tab()
         self.tabs.addTab(self.typer_tab, "Auto Typer")
         
+        # Create Click Jobs Tab
+        self.jobs_tab = QWidget()
+        self.create_jobs_tab()
+        self.tabs.addTab(self.jobs_tab, "Click Jobs")
+        
+        # Create Macro Tab
+        self.macro_tab = QWidget()
+        self.create_macro_tab()
+        self.tabs.addTab(self.macro_tab, "Macro")
+        
+        # Create Watch Tab
+        self.watch_tab = QWidget()
+        self.create_watch_tab()
+        self.tabs.addTab(self.watch_tab, "Watch")
+        
+        # Create Stats Tab
+        self.stats_tab = QWidget()
+        self.create_stats_tab()
+        self.tabs.addTab(self.stats_tab, "Stats")
+        
+        # Every change to a profile setting gets saved (in the background)
+        for widget in self.profile_widgets().values():
+            changed_signal(widget).connect(self.profile_changed)
+        
         # Apply dark mode if saved
         if self.dark_mode:
             self.dark_mode_checkbox.setChecked(True)
@@ -266,11 +591,65 @@ class AutoClickerGUI(QMainWindow):
         interval_layout.addWidget(self.click_interval)
         
         self.time_unit = QComboBox()
-        self.time_unit.addItems(["Milliseconds", "Seconds", "Minutes"])
+        self.time_unit.addItems(["Milliseconds", "Seconds", "Minutes", CLICKS_PER_SECOND])
         interval_layout.addWidget(self.time_unit)
         interval_layout.addStretch()
         layout.addLayout(interval_layout)
         
+        # Several clicks per wakeup, sent in one batch, for rates beyond one
+        # click a millisecond
+        burst_layout = QHBoxLayout()
+        burst_layout.addWidget(QLabel("Clicks per batch:"))
+        self.click_burst = QSpinBox()
+        self.click_burst.setRange(1, 1000)
+        self.click_burst.setValue(1)
+        burst_layout.addWidget(self.click_burst)
+        burst_layout.addStretch()
+        layout.addLayout(burst_layout)
+        
+        # Vary the timing, and where click jobs land, so it looks less robotic
+        humanize_layout = QHBoxLayout()
+        self.humanize_check = QCheckBox("Humanize:")
+        humanize_layout.addWidget(self.humanize_check)
+        self.humanize_distribution = QComboBox()
+        from humanize import DISTRIBUTIONS
+        self.humanize_distribution.addItems(DISTRIBUTIONS)
+        humanize_layout.addWidget(self.humanize_distribution)
+        humanize_layout.addWidget(QLabel("spread %"))
+        self.humanize_spread = QSpinBox()
+        self.humanize_spread.setRange(1, 100)
+        self.humanize_spread.setValue(20)
+        humanize_layout.addWidget(self.humanize_spread)
+        humanize_layout.addWidget(QLabel("offset px"))
+        self.humanize_offset = QSpinBox()
+        self.humanize_offset.setRange(0, 50)
+        self.humanize_offset.setValue(3)
+        humanize_layout.addWidget(self.humanize_offset)
+        humanize_layout.addWidget(QLabel("seed"))
+        self.humanize_seed = QSpinBox()
+        self.humanize_seed.setRange(0, 2**31 - 1)
+        self.humanize_seed.setSpecialValueText("Random")
+        humanize_layout.addWidget(self.humanize_seed)
+        humanize_layout.addStretch()
+        layout.addLayout(humanize_layout)
+        
+        # What to do when clicks fall behind schedule
+        missed_layout = QHBoxLayout()
+        missed_layout.addWidget(QLabel("If clicks fall behind:"))
+        self.missed_policy = QComboBox()
+        self.missed_policy.addItems(MISSED_POLICIES)
+        missed_layout.addWidget(self.missed_policy)
+        missed_layout.addStretch()
+        layout.addLayout(missed_layout)
+        
+        self.click_target = self.create_target_row(layout)
+        
+        # Changes reach a running clicker without restarting it
+        self.click_interval.valueChanged.connect(self.reconfigure_clicker)
+        self.time_unit.currentTextChanged.connect(self.reconfigure_clicker)
+        self.missed_policy.currentTextChanged.connect(self.reconfigure_clicker)
+        self.click_burst.valueChanged.connect(self.reconfigure_clicker)
+        
         # Auto turn on button
         turn_on_layout = QHBoxLayout()
         turn_on_layout.addWidget(QLabel("Button to auto turn on:"))
@@ -335,6 +714,10 @@ class AutoClickerGUI(QMainWindow):
         toggle_layout.addStretch()
         layout.addLayout(toggle_layout)
         
+        # Achieved rate, as measured by the clicker thread
+        self.clicker_stats = QLabel("")
+        layout.addWidget(self.clicker_stats)
+        
         layout.addSpacing(20)
         
         # Dark mode checkbox
@@ -344,6 +727,43 @@ class AutoClickerGUI(QMainWindow):
         
         layout.addStretch()
         
+    def create_target_row(self, layout):
+        # Where events go: through the real cursor and keyboard, or straight
+        # to one X11 window, leaving the cursor alone. Windows are only
+        # listed when Refresh is pressed.
+        target_layout = QHBoxLayout()
+        target_layout.addWidget(QLabel("Send to:"))
+        combo = QComboBox()
+        combo.addItem("Screen (moves the cursor)", None)
+        combo.setMinimumWidth(250)
+        target_layout.addWidget(combo)
+        refresh = QPushButton("Refresh")
+        refresh.clicked.connect(lambda: self.refresh_targets(combo))
+        target_layout.addWidget(refresh)
+        target_layout.addStretch()
+        layout.addLayout(target_layout)
+        if not x11_windows_available():
+            combo.setEnabled(False)
+            refresh.setEnabled(False)
+            combo.setToolTip("Sending to a window needs X11 and python-xlib")
+        return combo
+    
+    def refresh_targets(self, combo):
+        current = combo.currentData()
+        try:
+            windows = list_windows()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Couldn't list the windows:\n{e}")
+            return
+        own = int(self.winId())
+        combo.clear()
+        combo.addItem("Screen (moves the cursor)", None)
+        for window_id, title in windows:
+            if window_id != own:
+                combo.addItem(f"{title} (0x{window_id:x})", window_id)
+        index = combo.findData(current)
+        combo.setCurrentIndex(max(index, 0))
+    
     def create_typer_tab(self):
         layout = QVBoxLayout(self.typer_tab)
         
@@ -381,6 +801,38 @@ class AutoClickerGUI(QMainWindow):
         duration_layout.addStretch()
         layout.addLayout(duration_layout)
         
+        # Delay between keys
+        key_delay_layout = QHBoxLayout()
+        key_delay_layout.addWidget(QLabel("Delay between keys (ms):"))
+        self.type_key_delay = QSpinBox()
+        self.type_key_delay.setRange(0, 10000)
+        self.type_key_delay.setValue(50)
+        key_delay_layout.addWidget(self.type_key_delay)
+        key_delay_layout.addStretch()
+        layout.addLayout(key_delay_layout)
+        
+        # Key by key, or through the clipboard; Auto pastes long text. Keys
+        # unless asked, a program that ignores the paste chord gets nothing.
+        strategy_layout = QHBoxLayout()
+        strategy_layout.addWidget(QLabel("Typing:"))
+        self.type_strategy = QComboBox()
+        self.type_strategy.addItems(STRATEGIES)
+        self.type_strategy.setCurrentText(KEYS)
+        strategy_layout.addWidget(self.type_strategy)
+        strategy_layout.addWidget(QLabel("paste from (characters):"))
+        self.paste_threshold = QSpinBox()
+        self.paste_threshold.setRange(1, 1_000_000)
+        self.paste_threshold.setValue(PASTE_THRESHOLD)
+        self.paste_threshold.setEnabled(False)
+        strategy_layout.addWidget(self.paste_threshold)
+        strategy_layout.addStretch()
+        layout.addLayout(strategy_layout)
+        self.type_strategy.currentTextChanged.connect(
+            lambda strategy: self.paste_threshold.setEnabled(strategy == AUTO)
+        )
+        
+        self.type_target = self.create_target_row(layout)
+        
         # Text to type
         text_layout = QVBoxLayout()
         text_layout.addWidget(QLabel("What to type:"))
@@ -389,6 +841,41 @@ class AutoClickerGUI(QMainWindow):
         text_layout.addWidget(self.text_to_type)
         layout.addLayout(text_layout)
         
+        # Or a whole file, typed once and streamed from disk
+        file_layout = QHBoxLayout()
+        file_layout.addWidget(QLabel("Or type a file once:"))
+        self.type_file = QLineEdit()
+        self.type_file.setPlaceholderText("No file")
+        file_layout.addWidget(self.type_file)
+        browse_btn = QPushButton("Browse...")
+        browse_btn.clicked.connect(self.browse_type_file)
+        file_layout.addWidget(browse_btn)
+        layout.addLayout(file_layout)
+        
+        self.type_resume = QCheckBox("Resume where the last run stopped")
+        self.type_resume.setChecked(True)
+        layout.addWidget(self.type_resume)
+        
+        self.type_progress = QProgressBar()
+        self.type_progress.setRange(0, 1000)
+        self.type_progress.setFormat("")
+        self.type_progress.setTextVisible(True)
+        layout.addWidget(self.type_progress)
+        
+        # Characters a second each strategy has managed, as the typer measures it
+        self.type_rates = {}
+        self.type_throughput = QLabel("")
+        layout.addWidget(self.type_throughput)
+        
+        # Changes reach a running typer from its next repetition
+        self.type_interval.valueChanged.connect(self.reconfigure_typer)
+        self.type_time_unit.currentTextChanged.connect(self.reconfigure_typer)
+        self.type_duration.valueChanged.connect(self.reconfigure_typer)
+        self.type_key_delay.valueChanged.connect(self.reconfigure_typer)
+        self.text_to_type.textChanged.connect(self.reconfigure_typer)
+        self.type_strategy.currentTextChanged.connect(self.reconfigure_typer)
+        self.paste_threshold.valueChanged.connect(self.reconfigure_typer)
+        
         layout.addSpacing(20)
         
         # Turn On/Off button
@@ -417,6 +904,614 @@ class AutoClickerGUI(QMainWindow):
         
         layout.addStretch()
     
+    def create_jobs_tab(self):
+        layout = QVBoxLayout(self.jobs_tab)
+        
+        title = QLabel("Click Jobs - many spots, one thread")
+        title.setStyleSheet("font-size: 18px; font-weight: bold;")
+        layout.addWidget(title)
+        
+        # New job
+        job_layout = QHBoxLayout()
+        job_layout.addWidget(QLabel("X:"))
+        self.job_x = QSpinBox()
+        self.job_x.setRange(0, 100000)
+        job_layout.addWidget(self.job_x)
+        job_layout.addWidget(QLabel("Y:"))
+        self.job_y = QSpinBox()
+        self.job_y.setRange(0, 100000)
+        job_layout.addWidget(self.job_y)
+        job_layout.addWidget(QLabel("Every (ms):"))
+        self.job_interval = QSpinBox()
+        self.job_interval.setRange(1, 600000)
+        self.job_interval.setValue(100)
+        job_layout.addWidget(self.job_interval)
+        self.job_button = QComboBox()
+        self.job_button.addItems(BUTTONS)
+        job_layout.addWidget(self.job_button)
+        job_layout.addStretch()
+        layout.addLayout(job_layout)
+        
+        buttons_layout = QHBoxLayout()
+        add_btn = QPushButton("Add Job")
+        add_btn.clicked.connect(self.add_click_job)
+        buttons_layout.addWidget(add_btn)
+        retime_btn = QPushButton("Set Interval of Selected")
+        retime_btn.clicked.connect(self.retime_click_job)
+        buttons_layout.addWidget(retime_btn)
+        remove_btn = QPushButton("Remove Selected")
+        remove_btn.clicked.connect(self.remove_click_job)
+        buttons_layout.addWidget(remove_btn)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+        
+        # Active jobs
+        self.jobs_table = QTableWidget(0, 5)
+        self.jobs_table.setHorizontalHeaderLabels(["X", "Y", "Every (ms)", "Button", "Clicks"])
+        self.jobs_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.jobs_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.jobs_table)
+        
+        # Turn On/Off button
+        toggle_layout = QHBoxLayout()
+        toggle_layout.addWidget(QLabel("Turn On or Off:"))
+        self.jobs_toggle = QPushButton("OFF")
+        self.jobs_toggle.setCheckable(True)
+        self.jobs_toggle.setMinimumWidth(100)
+        self.jobs_toggle.setStyleSheet(self.clicker_toggle.styleSheet())
+        self.jobs_toggle.clicked.connect(self.toggle_jobs)
+        toggle_layout.addWidget(self.jobs_toggle)
+        toggle_layout.addStretch()
+        layout.addLayout(toggle_layout)
+        
+        # Or visit the spots one after another, moving the cursor there
+        # along a smooth path
+        path_layout = QHBoxLayout()
+        path_layout.addWidget(QLabel("Move through them:"))
+        self.path_curve = QComboBox()
+        from trajectory import CURVES
+        self.path_curve.addItems(CURVES)
+        path_layout.addWidget(self.path_curve)
+        path_layout.addWidget(QLabel("px/s"))
+        self.path_speed = QSpinBox()
+        self.path_speed.setRange(50, 20000)
+        self.path_speed.setValue(1500)
+        path_layout.addWidget(self.path_speed)
+        path_layout.addWidget(QLabel("Loops:"))
+        self.path_loops = QSpinBox()
+        self.path_loops.setRange(0, 100000)
+        self.path_loops.setValue(1)
+        self.path_loops.setSpecialValueText("Forever")
+        path_layout.addWidget(self.path_loops)
+        self.path_toggle = QPushButton("OFF")
+        self.path_toggle.setCheckable(True)
+        self.path_toggle.setMinimumWidth(100)
+        self.path_toggle.setStyleSheet(self.clicker_toggle.styleSheet())
+        self.path_toggle.clicked.connect(self.toggle_path)
+        path_layout.addWidget(self.path_toggle)
+        path_layout.addStretch()
+        layout.addLayout(path_layout)
+        
+        # Click counts come from the engine, refreshed while it runs
+        self.jobs_refresh = QTimer(self)
+        self.jobs_refresh.setInterval(500)
+        self.jobs_refresh.timeout.connect(self.refresh_jobs_table)
+    
+    def add_click_job(self):
+        job = {
+            'x': self.job_x.value(),
+            'y': self.job_y.value(),
+            'interval_ms': self.job_interval.value(),
+            'button': self.job_button.currentText(),
+            'id': None,
+            'clicks': 0
+        }
+        if self.jobs_thread:
+            job['id'] = self.jobs_thread.engine.add_job(
+                job['x'], job['y'], job['interval_ms'] / 1000, job['button'], self.jobs_humanize
+            )
+        self.click_jobs.append(job)
+        self.refresh_jobs_table()
+        self.profile_changed()
+    
+    def selected_job_rows(self):
+        return sorted({index.row() for index in self.jobs_table.selectedIndexes()}, reverse=True)
+    
+    def retime_click_job(self):
+        for row in self.selected_job_rows():
+            job = self.click_jobs[row]
+            job['interval_ms'] = self.job_interval.value()
+            if self.jobs_thread and job['id']:
+                self.jobs_thread.engine.retime_job(job['id'], job['interval_ms'] / 1000)
+        self.refresh_jobs_table()
+        self.profile_changed()
+    
+    def remove_click_job(self):
+        for row in self.selected_job_rows():
+            job = self.click_jobs.pop(row)
+            if self.jobs_thread and job['id']:
+                self.jobs_thread.engine.remove_job(job['id'])
+        self.refresh_jobs_table()
+        self.profile_changed()
+    
+    def refresh_jobs_table(self):
+        if self.jobs_thread:
+            clicks = {job['id']: job['clicks'] for job in self.jobs_thread.engine.jobs()}
+            for job in self.click_jobs:
+                job['clicks'] = clicks.get(job['id'], job['clicks'])
+        self.jobs_table.setRowCount(len(self.click_jobs))
+        for row, job in enumerate(self.click_jobs):
+            values = [job['x'], job['y'], job['interval_ms'], job['button'], job['clicks']]
+            for column, value in enumerate(values):
+                self.jobs_table.setItem(row, column, QTableWidgetItem(str(value)))
+    
+    def toggle_jobs(self):
+        if self.jobs_toggle.isChecked():
+            # Humanize settings are on the clicker tab
+            try:
+                self.jobs_humanize = self.human_schedule()
+            except ImportError as e:
+                QMessageBox.critical(self, "Error", f"Humanizing needs numpy:\n{e}")
+                self.jobs_toggle.setChecked(False)
+                return
+            backend = self.open_backend()
+            if not backend:
+                self.jobs_toggle.setChecked(False)
+                return
+            self.start_hotkeys()
+            self.jobs_thread = JobEngineThread(backend)
+            for job in self.click_jobs:
+                job['id'] = self.jobs_thread.engine.add_job(
+                    job['x'], job['y'], job['interval_ms'] / 1000, job['button'], self.jobs_humanize
+                )
+                job['clicks'] = 0
+            self.jobs_thread.start()
+            self.jobs_refresh.start()
+            self.jobs_toggle.setText("ON")
+        else:
+            self.stop_jobs()
+    
+    def stop_jobs(self):
+        self.jobs_toggle.setChecked(False)
+        self.jobs_toggle.setText("OFF")
+        if self.jobs_thread:
+            self.jobs_thread.stop()
+            self.jobs_thread.wait()
+            self.refresh_jobs_table()
+            self.jobs_thread = None
+        self.jobs_refresh.stop()
+        self.stop_hotkeys_if_idle()
+    
+    def create_macro_tab(self):
+        layout = QVBoxLayout(self.macro_tab)
+        
+        title = QLabel("Macro - record and replay")
+        title.setStyleSheet("font-size: 18px; font-weight: bold;")
+        layout.addWidget(title)
+        
+        # Record / save / load
+        record_layout = QHBoxLayout()
+        self.record_btn = QPushButton("Record")
+        self.record_btn.setCheckable(True)
+        self.record_btn.clicked.connect(self.toggle_recording)
+        record_layout.addWidget(self.record_btn)
+        save_btn = QPushButton("Save...")
+        save_btn.clicked.connect(self.save_macro)
+        record_layout.addWidget(save_btn)
+        load_btn = QPushButton("Load...")
+        load_btn.clicked.connect(self.load_macro)
+        record_layout.addWidget(load_btn)
+        record_layout.addStretch()
+        layout.addLayout(record_layout)
+        
+        self.macro_status = QLabel("")
+        layout.addWidget(self.macro_status)
+        self.update_macro_status()
+        
+        layout.addSpacing(20)
+        
+        # Replay speed and loops
+        replay_layout = QHBoxLayout()
+        replay_layout.addWidget(QLabel("Speed:"))
+        self.replay_speed = QDoubleSpinBox()
+        self.replay_speed.setRange(0.1, 100)
+        self.replay_speed.setValue(1.0)
+        self.replay_speed.setSuffix("x")
+        replay_layout.addWidget(self.replay_speed)
+        replay_layout.addWidget(QLabel("Loops:"))
+        self.replay_loops = QSpinBox()
+        self.replay_loops.setRange(0, 100000)
+        self.replay_loops.setValue(1)
+        self.replay_loops.setSpecialValueText("Forever")
+        replay_layout.addWidget(self.replay_loops)
+        replay_layout.addStretch()
+        layout.addLayout(replay_layout)
+        
+        # Turn On/Off button
+        toggle_layout = QHBoxLayout()
+        toggle_layout.addWidget(QLabel("Replay:"))
+        self.replay_toggle = QPushButton("OFF")
+        self.replay_toggle.setCheckable(True)
+        self.replay_toggle.setMinimumWidth(100)
+        self.replay_toggle.setStyleSheet(self.clicker_toggle.styleSheet())
+        self.replay_toggle.clicked.connect(self.toggle_replay)
+        toggle_layout.addWidget(self.replay_toggle)
+        toggle_layout.addStretch()
+        layout.addLayout(toggle_layout)
+        
+        layout.addStretch()
+    
+    def update_macro_status(self):
+        self.macro_status.setText(
+            f"{len(self.macro_log)} events, {self.macro_log.duration():.1f} seconds"
+        )
+    
+    def toggle_recording(self):
+        if self.record_btn.isChecked():
+            self.macro_recorder = MacroRecorder(min_move_interval=0.005)
+            try:
+                self.macro_recorder.start()
+            except ImportError as e:
+                self.macro_recorder = None
+                self.record_btn.setChecked(False)
+                QMessageBox.critical(self, "Error", "Recording needs the keyboard and mouse packages "
+                                                    f"(pip install keyboard mouse):\n{e}")
+                return
+            except Exception as e:
+                self.macro_recorder = None
+                self.record_btn.setChecked(False)
+                QMessageBox.critical(self, "Error", f"Failed to start recording:\n{e}")
+                return
+            self.record_btn.setText("Stop Recording")
+        else:
+            self.record_btn.setText("Record")
+            if self.macro_recorder:
+                self.macro_log = self.macro_recorder.stop()
+                self.macro_recorder = None
+            self.update_macro_status()
+    
+    def save_macro(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Macro", "", "Macros (*.acm)")
+        if not path:
+            return
+        try:
+            self.macro_log.save(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save macro:\n{e}")
+    
+    def load_macro(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load Macro", "", "Macros (*.acm)")
+        if not path:
+            return
+        try:
+            self.macro_log = EventLog.load(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load macro:\n{e}")
+        self.update_macro_status()
+    
+    def toggle_replay(self):
+        if self.replay_toggle.isChecked():
+            if not len(self.macro_log):
+                QMessageBox.warning(self, "Error", "Record or load a macro first!")
+                self.replay_toggle.setChecked(False)
+                return
+            backend = self.open_backend()
+            if not backend:
+                self.replay_toggle.setChecked(False)
+                return
+            self.start_hotkeys()
+            self.replay_toggle.setText("ON")
+            self.replay_thread = ReplayThread(
+                backend,
+                self.macro_log,
+                self.replay_speed.value(),
+                self.replay_loops.value()
+            )
+            self.replay_thread.finished.connect(self.on_replay_finished)
+            self.replay_thread.start()
+        else:
+            self.stop_replay()
+    
+    def on_replay_finished(self):
+        self.replay_toggle.setChecked(False)
+        self.replay_toggle.setText("OFF")
+        self.stop_hotkeys_if_idle()
+    
+    def stop_replay(self):
+        self.replay_toggle.setChecked(False)
+        self.replay_toggle.setText("OFF")
+        if self.replay_thread:
+            self.replay_thread.stop()
+            self.replay_thread.wait()
+        self.stop_hotkeys_if_idle()
+    
+    def toggle_path(self):
+        if self.path_toggle.isChecked():
+            if not self.click_jobs:
+                QMessageBox.warning(self, "Error", "Add some jobs to move through first!")
+                self.path_toggle.setChecked(False)
+                return
+            loops = self.path_loops.value()
+            from trajectory import plan_path
+            try:
+                path = plan_path(
+                    [(job['x'], job['y']) for job in self.click_jobs],
+                    speed=self.path_speed.value(),
+                    curve=self.path_curve.currentText(),
+                    closed=loops != 1
+                )
+            except ImportError as e:
+                QMessageBox.critical(self, "Error", f"Paths need numpy:\n{e}")
+                self.path_toggle.setChecked(False)
+                return
+            backend = self.open_backend()
+            if not backend:
+                self.path_toggle.setChecked(False)
+                return
+            self.start_hotkeys()
+            self.path_toggle.setText("ON")
+            self.path_thread = PathThread(backend, path, loops, self.job_button.currentText())
+            self.path_thread.finished.connect(self.on_path_finished)
+            self.path_thread.start()
+        else:
+            self.stop_path()
+    
+    def on_path_finished(self):
+        self.path_toggle.setChecked(False)
+        self.path_toggle.setText("OFF")
+    
+    def stop_path(self):
+        self.on_path_finished()
+        if self.path_thread:
+            self.path_thread.stop()
+            self.path_thread.wait()
+            self.path_thread = None
+        self.stop_hotkeys_if_idle()
+    
+    def create_watch_tab(self):
+        layout = QVBoxLayout(self.watch_tab)
+        
+        title = QLabel("Watch - click when a spot on screen changes")
+        title.setStyleSheet("font-size: 18px; font-weight: bold;")
+        layout.addWidget(title)
+        
+        # Region to watch
+        region_layout = QHBoxLayout()
+        region_layout.addWidget(QLabel("Region X, Y, W, H:"))
+        self.watch_region = []
+        for value in (0, 0, 50, 50):
+            spin = QSpinBox()
+            spin.setRange(0, 100000)
+            spin.setValue(value)
+            region_layout.addWidget(spin)
+            self.watch_region.append(spin)
+        region_layout.addStretch()
+        layout.addLayout(region_layout)
+        
+        # What counts as a trigger
+        mode_layout = QHBoxLayout()
+        mode_layout.addWidget(QLabel("Click when:"))
+        self.watch_mode = QComboBox()
+        from watch import WATCH_MODES
+        self.watch_mode.addItems(WATCH_MODES)
+        mode_layout.addWidget(self.watch_mode)
+        mode_layout.addWidget(QLabel("Colour:"))
+        self.watch_colour = QLineEdit("#ffffff")
+        self.watch_colour.setMaximumWidth(80)
+        mode_layout.addWidget(self.watch_colour)
+        capture_btn = QPushButton("Capture Template")
+        capture_btn.clicked.connect(self.capture_watch_reference)
+        mode_layout.addWidget(capture_btn)
+        mode_layout.addStretch()
+        layout.addLayout(mode_layout)
+        
+        tuning_layout = QHBoxLayout()
+        tuning_layout.addWidget(QLabel("Tolerance:"))
+        self.watch_tolerance = QSpinBox()
+        self.watch_tolerance.setRange(0, 255)
+        self.watch_tolerance.setValue(16)
+        tuning_layout.addWidget(self.watch_tolerance)
+        tuning_layout.addWidget(QLabel("Pixels needed (%):"))
+        self.watch_threshold = QDoubleSpinBox()
+        self.watch_threshold.setRange(0.01, 100)
+        self.watch_threshold.setValue(1.0)
+        tuning_layout.addWidget(self.watch_threshold)
+        tuning_layout.addWidget(QLabel("Checks per second:"))
+        self.watch_rate = QSpinBox()
+        self.watch_rate.setRange(1, 240)
+        self.watch_rate.setValue(30)
+        tuning_layout.addWidget(self.watch_rate)
+        tuning_layout.addStretch()
+        layout.addLayout(tuning_layout)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(QLabel("Click the region's centre with:"))
+        self.watch_button = QComboBox()
+        self.watch_button.addItems(BUTTONS)
+        button_layout.addWidget(self.watch_button)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+        
+        layout.addSpacing(20)
+        
+        # Turn On/Off button
+        toggle_layout = QHBoxLayout()
+        toggle_layout.addWidget(QLabel("Turn On or Off:"))
+        self.watch_toggle = QPushButton("OFF")
+        self.watch_toggle.setCheckable(True)
+        self.watch_toggle.setMinimumWidth(100)
+        self.watch_toggle.setStyleSheet(self.clicker_toggle.styleSheet())
+        self.watch_toggle.clicked.connect(self.toggle_watch)
+        toggle_layout.addWidget(self.watch_toggle)
+        toggle_layout.addStretch()
+        layout.addLayout(toggle_layout)
+        
+        self.watch_stats = QLabel("")
+        layout.addWidget(self.watch_stats)
+        
+        layout.addStretch()
+    
+    def watch_region_value(self):
+        return tuple(spin.value() for spin in self.watch_region)
+    
+    def capture_watch_reference(self):
+        from watch import TEMPLATE, RegionGrabber
+        try:
+            self.watch_reference = RegionGrabber(self.watch_region_value()).grab().copy()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to capture the region:\n{e}")
+            return
+        self.watch_mode.setCurrentText(TEMPLATE)
+        QMessageBox.information(self, "Template", "Captured the region as the template.")
+    
+    def toggle_watch(self):
+        if self.watch_toggle.isChecked():
+            from watch import TEMPLATE, RegionDetector, RegionGrabber
+            colour = QColor(self.watch_colour.text())
+            if not colour.isValid():
+                QMessageBox.warning(self, "Error", "That's not a colour! Try something like #ff0000.")
+                self.watch_toggle.setChecked(False)
+                return
+            if self.watch_mode.currentText() == TEMPLATE and self.watch_reference is None:
+                QMessageBox.warning(self, "Error", "Capture a template first!")
+                self.watch_toggle.setChecked(False)
+                return
+            try:
+                detector = RegionDetector(
+                    self.watch_mode.currentText(),
+                    self.watch_tolerance.value(),
+                    self.watch_threshold.value() / 100,
+                    (colour.red(), colour.green(), colour.blue()),
+                    self.watch_reference
+                )
+            except ImportError as e:
+                QMessageBox.critical(self, "Error", f"Watching needs numpy:\n{e}")
+                self.watch_toggle.setChecked(False)
+                return
+            backend = self.open_backend()
+            if not backend:
+                self.watch_toggle.setChecked(False)
+                return
+            self.start_hotkeys()
+            self.watch_thread = WatchThread(
+                backend,
+                RegionGrabber(self.watch_region_value()),
+                detector,
+                self.watch_rate.value(),
+                self.watch_button.currentText()
+            )
+            self.watch_thread.stats.connect(self.update_watch_stats)
+            self.watch_thread.start()
+            self.watch_toggle.setText("ON")
+        else:
+            self.stop_watch()
+    
+    def stop_watch(self):
+        self.watch_toggle.setChecked(False)
+        self.watch_toggle.setText("OFF")
+        if self.watch_thread:
+            self.watch_thread.stop()
+            self.watch_thread.wait()
+            self.watch_thread = None
+        self.stop_hotkeys_if_idle()
+    
+    def update_watch_stats(self, fps, clicks, capture_ms, compare_ms):
+        self.watch_stats.setText(
+            f"{fps:.1f} checks/s, {clicks} clicks, capture {capture_ms:.2f} ms, compare {compare_ms:.2f} ms per frame"
+        )
+    
+    def create_stats_tab(self):
+        layout = QVBoxLayout(self.stats_tab)
+        
+        title = QLabel("Stats - what the engines are actually doing")
+        title.setStyleSheet("font-size: 18px; font-weight: bold;")
+        layout.addWidget(title)
+        
+        self.stats_table = QTableWidget(0, 7)
+        self.stats_table.setHorizontalHeaderLabels([
+            "Engine", "Events", "Missed", "Interval p50 (ms)", "Interval p99 (ms)",
+            "Backend avg (ms)", "Backend p99 (ms)"
+        ])
+        self.stats_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.stats_table)
+        
+        export_layout = QHBoxLayout()
+        export_btn = QPushButton("Export Prometheus File...")
+        export_btn.clicked.connect(self.export_metrics)
+        export_layout.addWidget(export_btn)
+        export_layout.addStretch()
+        layout.addLayout(export_layout)
+        
+        serve_layout = QHBoxLayout()
+        self.metrics_serve = QCheckBox("Serve metrics at http://127.0.0.1 port")
+        self.metrics_serve.stateChanged.connect(self.toggle_metrics_server)
+        serve_layout.addWidget(self.metrics_serve)
+        self.metrics_port = QSpinBox()
+        self.metrics_port.setRange(1024, 65535)
+        self.metrics_port.setValue(9464)
+        serve_layout.addWidget(self.metrics_port)
+        serve_layout.addWidget(QLabel("/metrics"))
+        serve_layout.addStretch()
+        layout.addLayout(serve_layout)
+        
+        # Where the last run's trace went, when tracing is on in settings
+        self.trace_label = QLabel("")
+        self.trace_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.trace_label.setWordWrap(True)
+        layout.addWidget(self.trace_label)
+        
+        # The engines never signal per event; the table polls their counters
+        self.stats_refresh = QTimer(self)
+        self.stats_refresh.setInterval(500)
+        self.stats_refresh.timeout.connect(self.refresh_stats_table)
+        self.stats_refresh.start()
+    
+    def engine_metrics(self):
+        threads = [self.clicker_thread, self.typer_thread, self.jobs_thread, self.replay_thread, self.watch_thread,
+                   self.path_thread]
+        return [thread.engine.metrics for thread in threads if thread]
+    
+    def refresh_stats_table(self):
+        if self.tabs.currentWidget() is not self.stats_tab:
+            return
+        self.gui_mark("stats refresh")
+        metrics = self.engine_metrics()
+        self.stats_table.setRowCount(len(metrics))
+        for row, m in enumerate(metrics):
+            values = [
+                m.engine, m.events_sent, m.missed_deadlines,
+                f"{m.interval.quantile_ms(0.5):g}", f"{m.interval.quantile_ms(0.99):g}",
+                f"{m.backend_call.mean_ms():.3f}", f"{m.backend_call.quantile_ms(0.99):g}"
+            ]
+            for column, value in enumerate(values):
+                self.stats_table.setItem(row, column, QTableWidgetItem(str(value)))
+    
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "autoclicker.prom", "Prometheus text (*.prom)")
+        if not path:
+            return
+        from telemetry import write_prometheus_file
+        try:
+            write_prometheus_file(path, self.engine_metrics())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export metrics:\n{e}")
+    
+    def toggle_metrics_server(self, state):
+        if state == Qt.Checked:
+            from telemetry import MetricsServer
+            try:
+                self.metrics_server = MetricsServer(self.engine_metrics, self.metrics_port.value())
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to start the metrics server:\n{e}")
+                self.metrics_serve.setChecked(False)
+                return
+            self.metrics_port.setEnabled(False)
+        else:
+            if self.metrics_server:
+                self.metrics_server.close()
+                self.metrics_server = None
+            self.metrics_port.setEnabled(True)
+    
     def validate_hotkey(self, text):
         if not text:
             return
@@ -442,70 +1537,315 @@ class AutoClickerGUI(QMainWindow):
                 self.turn_on_key.clear()
     
     def open_settings(self):
-        dialog = SettingsDialog(self, self.ignore_tos_warnings)
+        dialog = SettingsDialog(self, self.ignore_tos_warnings, self.input_backend, self.control_socket,
+                                self.engine_process, self.trace_events)
         if dialog.exec_() == QDialog.Accepted:
             self.ignore_tos_warnings = dialog.ignore_tos_checkbox.isChecked()
+            self.input_backend = dialog.backend_combo.currentText()
+            self.control_socket = dialog.control_checkbox.isChecked()
+            # Takes effect the next time the clicker or typer starts
+            self.engine_process = dialog.process_checkbox.isChecked()
+            self.trace_events = dialog.trace_checkbox.isChecked()
+            self.set_tracing(self.trace_events)
+            self.set_control_server(self.control_socket)
             self.save_settings()
+    
+    def set_tracing(self, enabled):
+        # The heartbeat marks every HEARTBEAT_MS, so gaps in it show where
+        # the GUI thread was too busy to get to it
+        if enabled and not self.gui_marks:
+            from eventtrace import HEARTBEAT, HEARTBEAT_MS, MarkTrace
+            self.gui_marks = MarkTrace()
+            self.heartbeat = QTimer(self)
+            self.heartbeat.setInterval(HEARTBEAT_MS)
+            self.heartbeat.timeout.connect(lambda: self.gui_marks.mark(HEARTBEAT))
+            self.heartbeat.start()
+        elif not enabled and self.gui_marks:
+            self.heartbeat.stop()
+            self.heartbeat = None
+            self.gui_marks = None
+    
+    def gui_mark(self, label):
+        if self.gui_marks:
+            self.gui_marks.mark(label)
+    
+    def new_trace(self):
+        # An EventTrace for a run that's starting, or None if tracing is off
+        if not self.trace_events:
+            return None
+        from eventtrace import EventTrace
+        return EventTrace()
+    
+    def keep_trace(self, thread, name):
+        # Has the thread write its trace under ~/.autoclicker/traces when it stops
+        if thread.engine.trace is None:
+            return
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        thread.trace_path = os.path.join(self.settings.directory, "traces", f"{name}-{stamp}.trace")
+        thread.marks = self.gui_marks
+        thread.trace_saved.connect(self.on_trace_saved)
+    
+    def on_trace_saved(self, path, error):
+        if error:
+            QMessageBox.warning(self, "Warning", f"Couldn't save the trace to {path}:\n{error}")
+            return
+        self.trace_label.setText(f"Last trace: {path}\nAnalyze it with: python cli.py analyze \"{path}\"")
+    
+    def set_control_server(self, enabled):
+        if enabled and not self.control_server:
+            from control import ControlServer
+            from guicontrol import GuiController
+            try:
+                self.control_server = ControlServer(GuiController(self))
+            except Exception as e:
+                QMessageBox.warning(self, "Warning", f"Failed to start the control socket:\n{e}")
+        elif not enabled and self.control_server:
+            self.control_server.close()
+            self.control_server = None
         
     def toggle_clicker(self):
         if self.clicker_toggle.isChecked():
-            # Start hotkey listener if key is set
-            hotkey = self.turn_on_key.text()
-            if hotkey and not self.hotkey_listener:
-                self.hotkey_listener = HotkeyListener(hotkey)
-                self.hotkey_listener.hotkey_pressed.connect(self.start_clicker)
-                self.hotkey_listener.start()
-            
+            self.clicker_armed = True
+            self.start_hotkeys()
             self.start_clicker()
         else:
+            self.clicker_armed = False
             self.clicker_toggle.setText("OFF")
             if self.clicker_thread:
                 self.clicker_thread.stop()
                 self.clicker_thread.wait()
-            if self.hotkey_listener:
-                self.hotkey_listener.stop()
-                self.hotkey_listener.wait()
+            self.stop_hotkeys_if_idle()
+    
+    def start_hotkeys(self):
+        # Start listening for the turn on and emergency stop keys
+        if not self.hotkey_listener:
+            self.hotkey_listener = HotkeyListener()
+            self.hotkey_listener.hotkey_pressed.connect(self.on_hotkey)
+            try:
+                self.hotkey_listener.start()
+            except Exception as e:
                 self.hotkey_listener = None
+                QMessageBox.warning(self, "Warning", f"Hotkeys are unavailable, the emergency STOP button won't work:\n{e}")
+        if self.hotkey_listener:
+            self.hotkey_listener.dispatcher.clear()
+            self.hotkey_listener.bind(self.turn_on_key.text())
+            self.hotkey_listener.bind(self.emergency_stop_key())
+    
+    def stop_hotkeys_if_idle(self):
+        # The clicker, jobs, replay, path and watch share one listener
+        if (self.clicker_armed or self.jobs_thread or self.watch_thread or self.path_toggle.isChecked()
+                or self.replay_toggle.isChecked()):
+            return
+        if self.hotkey_listener:
+            self.hotkey_listener.stop()
+            self.hotkey_listener = None
+    
+    def emergency_stop_key(self):
+        return self.stop_key.text().lower() if self.stop_key.text() else "q"
+    
+    def on_hotkey(self, key):
+        clicking = self.clicker_thread and self.clicker_thread.isRunning()
+        if key == self.emergency_stop_key() and self.jobs_thread:
+            self.stop_jobs()
+        if key == self.emergency_stop_key() and self.watch_thread:
+            self.stop_watch()
+        if key == self.emergency_stop_key() and self.path_thread:
+            self.stop_path()
+        if key == self.emergency_stop_key() and self.replay_thread:
+            self.stop_replay()
+        if clicking and key == self.emergency_stop_key():
+            self.clicker_thread.stop()
+        elif not clicking and self.clicker_armed and key == self.turn_on_key.text().lower():
+            # The listener is shared with jobs, replay, watch and path mode; the
+            # clicker only answers to it while switched on
+            self.clicker_toggle.setChecked(True)
+            self.start_clicker()
+    
+    def open_backend(self, window=None):
+        # window is an X11 window id to send to instead of the screen
+        if window is not None:
+            try:
+                return create_backend("window", window=window)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to reach window 0x{window:x}:\n{e}")
+                return None
+        try:
+            return create_backend(self.input_backend)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open the {self.input_backend} input backend:\n{e}")
+            return None
+    
+    def engine_backend(self, window=None):
+        # What the clicker and typer threads take: a worker opens its own
+        # backend, and says if it can't. Window targets stay in this process.
+        if self.engine_process and window is None:
+            return self.input_backend
+        return self.open_backend(window)
     
     def start_clicker(self):
         if self.clicker_thread and self.clicker_thread.isRunning():
             return
+        
+        try:
+            humanize = self.human_schedule()
+        except ImportError as e:
+            QMessageBox.critical(self, "Error", f"Humanizing needs numpy:\n{e}")
+            self.disarm_clicker()
+            return
+        
+        window = self.click_target.currentData()
+        backend = self.engine_backend(window)
+        if not backend:
+            self.disarm_clicker()
+            return
             
-        stop_key = self.stop_key.text() if self.stop_key.text() else "q"
         self.clicker_thread = ClickerThread(
+            backend,
             self.click_interval.value(),
             self.time_unit.currentText(),
-            stop_key
+            self.missed_policy.currentText(),
+            self.click_burst.value(),
+            humanize,
+            self.engine_process and window is None,
+            self.new_trace()
         )
+        self.keep_trace(self.clicker_thread, "clicker")
         self.clicker_thread.countdown.connect(self.update_clicker_countdown)
+        self.clicker_thread.stats.connect(self.update_clicker_stats)
         self.clicker_thread.finished.connect(self.on_clicker_finished)
+        self.clicker_thread.failed.connect(self.on_clicker_failed)
         self.clicker_thread.start()
     
+    def human_schedule(self):
+        # None unless humanizing is on; raises ImportError without numpy
+        if not self.humanize_check.isChecked():
+            return None
+        from humanize import HumanSchedule
+        return HumanSchedule(
+            self.humanize_distribution.currentText(),
+            self.humanize_spread.value() / 100,
+            self.humanize_offset.value(),
+            self.humanize_seed.value() or None
+        )
+    
+    def reconfigure_clicker(self, *args):
+        if self.clicker_thread and self.clicker_thread.isRunning():
+            self.gui_mark("reconfigure")
+            self.clicker_thread.engine.reconfigure(
+                interval=self.click_interval.value(),
+                time_unit=self.time_unit.currentText(),
+                missed_policy=self.missed_policy.currentText(),
+                burst=self.click_burst.value()
+            )
+    
     def update_clicker_countdown(self, count):
         if count > 0:
             self.clicker_toggle.setText(f"Starting in {count}")
         else:
             self.clicker_toggle.setText("ON")
     
+    def update_clicker_stats(self, rate, jitter_ms, missed):
+        self.clicker_stats.setText(
+            f"Achieved: {rate:.1f} clicks/s, jitter {jitter_ms:.2f} ms, missed {missed}"
+        )
+    
     def on_clicker_finished(self):
         self.clicker_toggle.setChecked(False)
         self.clicker_toggle.setText("OFF")
+    
+    def on_clicker_failed(self, message):
+        QMessageBox.critical(self, "Error", message)
+        self.disarm_clicker()
+    
+    def disarm_clicker(self):
+        # The clicker couldn't start, so the turn on key shouldn't retry it
+        self.clicker_armed = False
+        self.on_clicker_finished()
+        self.stop_hotkeys_if_idle()
                 
+    def browse_type_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Type File", "", "Text files (*.txt *.log *.csv *.py);;All files (*)")
+        if path:
+            self.type_file.setText(path)
+    
+    def reconfigure_typer(self, *args):
+        # A file being typed has nothing to change
+        if not isinstance(self.typer_thread, TyperThread) or not self.typer_thread.isRunning():
+            return
+        if not self.text_to_type.text():
+            return
+        self.gui_mark("reconfigure")
+        self.typer_thread.engine.reconfigure(
+            interval=self.type_interval.value(),
+            time_unit=self.type_time_unit.currentText(),
+            text_to_type=self.text_to_type.text(),
+            duration=self.type_duration.value(),
+            key_delay=self.type_key_delay.value() / 1000,
+            strategy=self.type_strategy.currentText(),
+            paste_threshold=self.paste_threshold.value()
+        )
+    
+    def update_type_throughput(self, strategy, chars_per_s):
+        self.type_rates[strategy] = chars_per_s
+        self.type_throughput.setText("Measured: " + ", ".join(
+            f"{name} {rate:,.0f} characters/s" for name, rate in sorted(self.type_rates.items())
+        ))
+    
+    def update_type_progress(self, done, total, lines):
+        self.type_progress.setValue(int(done * 1000 / total) if total else 1000)
+        self.type_progress.setFormat(f"{done:,} / {total:,} bytes, {lines:,} lines")
+    
     def toggle_typer(self):
-        if self.typer_toggle.isChecked():
+        if self.typer_toggle.isChecked() and self.type_file.text():
+            if not os.path.isfile(self.type_file.text()):
+                QMessageBox.warning(self, "Error", "That file doesn't exist!")
+                self.typer_toggle.setChecked(False)
+                return
+            
+            backend = self.open_backend(self.type_target.currentData())
+            if not backend:
+                self.typer_toggle.setChecked(False)
+                return
+            
+            self.typer_toggle.setText("ON")
+            self.typer_thread = StreamTyperThread(
+                backend,
+                self.type_file.text(),
+                self.type_key_delay.value() / 1000,
+                self.type_resume.isChecked()
+            )
+            self.typer_thread.progress.connect(self.update_type_progress)
+            self.typer_thread.finished.connect(self.on_typer_finished)
+            self.typer_thread.start()
+        elif self.typer_toggle.isChecked():
             if not self.text_to_type.text():
                 QMessageBox.warning(self, "Error", "Please enter text to type!")
                 self.typer_toggle.setChecked(False)
                 return
                 
+            window = self.type_target.currentData()
+            backend = self.engine_backend(window)
+            if not backend:
+                self.typer_toggle.setChecked(False)
+                return
+                
             self.typer_toggle.setText("ON")
             self.typer_thread = TyperThread(
+                backend,
                 self.type_interval.value(),
                 self.type_time_unit.currentText(),
                 self.text_to_type.text(),
-                self.type_duration.value()
+                self.type_duration.value(),
+                self.type_key_delay.value() / 1000,
+                self.engine_process and window is None,
+                self.new_trace(),
+                self.type_strategy.currentText(),
+                self.paste_threshold.value()
             )
+            self.keep_trace(self.typer_thread, "typer")
+            self.typer_thread.throughput.connect(self.update_type_throughput)
             self.typer_thread.finished.connect(self.on_typer_finished)
+            self.typer_thread.failed.connect(self.on_typer_failed)
             self.typer_thread.start()
         else:
             self.typer_toggle.setText("OFF")
@@ -516,6 +1856,10 @@ class AutoClickerGUI(QMainWindow):
     def on_typer_finished(self):
         self.typer_toggle.setChecked(False)
         self.typer_toggle.setText("OFF")
+    
+    def on_typer_failed(self, message):
+        QMessageBox.critical(self, "Error", message)
+        self.on_typer_finished()
                 
     def handle_startup(self, state):
         if state == Qt.Checked:
@@ -666,6 +2010,7 @@ class AutoClickerGUI(QMainWindow):
         self.setStyleSheet("")
     
     def closeEvent(self, event):
+        self.set_control_server(False)
         # Stop all threads before closing
         if self.clicker_thread:
             self.clicker_thread.stop()
@@ -673,17 +2018,32 @@ class AutoClickerGUI(QMainWindow):
         if self.typer_thread:
             self.typer_thread.stop()
             self.typer_thread.wait()
+        if self.jobs_thread:
+            self.jobs_thread.stop()
+            self.jobs_thread.wait()
+        if self.replay_thread:
+            self.replay_thread.stop()
+            self.replay_thread.wait()
+        if self.watch_thread:
+            self.watch_thread.stop()
+            self.watch_thread.wait()
+        if self.path_thread:
+            self.path_thread.stop()
+            self.path_thread.wait()
+        if self.macro_recorder:
+            self.macro_recorder.stop()
+        if self.metrics_server:
+            self.metrics_server.close()
         if self.hotkey_listener:
             self.hotkey_listener.stop()
-            self.hotkey_listener.wait()
+        # Anything still waiting to be written goes out now
+        self.settings.close()
         event.accept()
 
 def check_and_install_dependencies():
     if not missing_libs:
         return True
     
-    app = QApplication(sys.argv)
-    
     msg = QMessageBox()
     msg.setIcon(QMessageBox.Warning)
     msg.setWindowTitle("Missing Dependencies")
@@ -730,18 +2090,55 @@ def check_and_install_dependencies():
     
     return False
 
+class StartupProfile(QObject):
+    # Times each startup stage up to the window's first paint, then prints
+    # the breakdown and quits
+    def __init__(self, t0):
+        super().__init__()
+        self.marks = [("start", t0)]
+        
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.marks.append((stage, now))
+        
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            self.mark("first paint")
+            self.report()
+            QTimer.singleShot(0, QApplication.instance().quit)
+        return False
+    
+    def report(self):
+        start = self.marks[0][1]
+        previous = start
+        print("Startup profile (ms):", file=sys.stderr)
+        for stage, at in self.marks[1:]:
+            print(f"  {stage:<24} {(at - previous) * 1000:8.1f}  (total {(at - start) * 1000:8.1f})", file=sys.stderr)
+            previous = at
+
 if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # Lets a bundled .exe start engine worker processes
+        import multiprocessing
+        multiprocessing.freeze_support()
+    profile = None
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        profile = StartupProfile(STARTUP_T0)
+        profile.mark("imports")
+    
+    app = QApplication(sys.argv)
+    if profile:
+        profile.mark("QApplication")
     if check_and_install_dependencies():
-        # Try to enable multi-monitor support
-        try:
-            import pyautogui
-            # PyAutoGUI automatically supports multi-monitor setups
-            # Get all monitors info
-            screen_width, screen_height = pyautogui.size()
-        except:
-            pass
-        
-        app = QApplication(sys.argv)
+        if profile:
+            profile.mark("dependency check")
         window = AutoClickerGUI()
+        if profile:
+            profile.mark("window built")
+            window.installEventFilter(profile)
         window.show()
+        if profile:
+            profile.mark("show")
         sys.exit(app.exec_())
\ No newline at end of file
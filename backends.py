@@ -0,0 +1,579 @@
+import os
+import struct
+import sys
+import time
+
+# Every engine sends its input through one of these instead of calling
+# pyautogui directly. Libraries are only imported when a backend is created
+# so picking one doesn't drag in the others.
+
+# Characters that need shift on a US layout, mapped to the unshifted key
+US_SHIFTED = {
+    '~': '`', '!': '1', '@': '2', '#': '3', '$': '4', '%': '5', '^': '6',
+    '&': '7', '*': '8', '(': '9', ')': '0', '_': '-', '+': '=', '{': '[',
+    '}': ']', '|': '\\', ':': ';', '"': "'", '<': ',', '>': '.', '?': '/',
+}
+
+# Text characters that have a key name of their own
+CHAR_KEYS = {' ': 'space', '\n': 'enter', '\t': 'tab'}
+
+BUTTONS = ["left", "right", "middle"]
+
+
+def split_char(char):
+    # Returns (key, needs_shift) for a character of text
+    if char in CHAR_KEYS:
+        return CHAR_KEYS[char], False
+    if char in US_SHIFTED:
+        return US_SHIFTED[char], True
+    if char.isupper():
+        return char.lower(), True
+    return char, False
+
+
+class InputBackend:
+    name = None
+
+    def click(self, x=None, y=None, button="left"):
+        if x is not None and y is not None:
+            self.move(x, y)
+        self.mouse_down(button)
+        self.mouse_up(button)
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        # n clicks in a row, sent as one batch where the backend can
+        if x is not None and y is not None:
+            self.move(x, y)
+        for _ in range(n):
+            self.click(button=button)
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def mouse_down(self, button="left"):
+        raise NotImplementedError
+
+    def mouse_up(self, button="left"):
+        raise NotImplementedError
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def press(self, key):
+        self.key_down(key)
+        self.key_up(key)
+
+    def hotkey(self, *keys):
+        for key in keys:
+            self.key_down(key)
+        for key in reversed(keys):
+            self.key_up(key)
+
+    def type_text(self, text, interval=0.0):
+        for char in text:
+            key, shift = split_char(char)
+            if shift:
+                self.key_down('shift')
+            self.press(key)
+            if shift:
+                self.key_up('shift')
+            if interval:
+                time.sleep(interval)
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIBackend(InputBackend):
+    # Same calls the app always made, including pyautogui's PAUSE and failsafe
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self.pyautogui = pyautogui
+
+    def click(self, x=None, y=None, button="left"):
+        self.pyautogui.click(x, y, button=button)
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        # pyautogui only pauses once per call, not per click
+        self.pyautogui.click(x, y, clicks=n, interval=0.0, button=button)
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def mouse_down(self, button="left"):
+        self.pyautogui.mouseDown(button=button)
+
+    def mouse_up(self, button="left"):
+        self.pyautogui.mouseUp(button=button)
+
+    def key_down(self, key):
+        self.pyautogui.keyDown(key)
+
+    def key_up(self, key):
+        self.pyautogui.keyUp(key)
+
+    def press(self, key):
+        self.pyautogui.press(key)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys)
+
+    def type_text(self, text, interval=0.0):
+        self.pyautogui.typewrite(text, interval=interval)
+
+
+# Key names (pyautogui style) that don't match their X11 keysym name
+X11_KEYSYMS = {
+    'enter': 'Return', 'return': 'Return', 'space': 'space', 'tab': 'Tab',
+    'backspace': 'BackSpace', 'esc': 'Escape', 'escape': 'Escape',
+    'delete': 'Delete', 'insert': 'Insert', 'home': 'Home', 'end': 'End',
+    'pageup': 'Prior', 'pagedown': 'Next', 'up': 'Up', 'down': 'Down',
+    'left': 'Left', 'right': 'Right', 'shift': 'Shift_L', 'ctrl': 'Control_L',
+    'alt': 'Alt_L', 'win': 'Super_L', 'command': 'Super_L',
+    '`': 'grave', '-': 'minus', '=': 'equal', '[': 'bracketleft',
+    ']': 'bracketright', '\\': 'backslash', ';': 'semicolon',
+    "'": 'apostrophe', ',': 'comma', '.': 'period', '/': 'slash',
+}
+
+X11_BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+
+class XTestBackend(InputBackend):
+    # Talks to the X server directly through the XTest extension. Requests
+    # are only flushed, never synced, so a click is a single buffered write.
+    name = "xtest"
+
+    def __init__(self, display=None):
+        from Xlib import X, XK, display as xdisplay
+        from Xlib.ext import xtest
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = xdisplay.Display(display)
+        if not self.display.has_extension('XTEST'):
+            self.display.close()
+            raise RuntimeError("X server has no XTEST extension")
+        self._keycodes = {}
+
+    def keycode(self, key):
+        keycode = self._keycodes.get(key)
+        if keycode is None:
+            name = X11_KEYSYMS.get(key.lower(), key)
+            keysym = self.XK.string_to_keysym(name)
+            if not keysym and len(key) == 1:
+                keysym = ord(key)
+            keycode = self.display.keysym_to_keycode(keysym)
+            if not keycode:
+                raise ValueError(f"No keycode for key {key!r}")
+            self._keycodes[key] = keycode
+        return keycode
+
+    def move(self, x, y):
+        self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y))
+        self.display.flush()
+
+    def click(self, x=None, y=None, button="left"):
+        if x is not None and y is not None:
+            self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y))
+        detail = X11_BUTTONS[button]
+        self.xtest.fake_input(self.display, self.X.ButtonPress, detail)
+        self.xtest.fake_input(self.display, self.X.ButtonRelease, detail)
+        self.display.flush()
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        # Everything goes out in one flush
+        fake_input, display = self.xtest.fake_input, self.display
+        press, release = self.X.ButtonPress, self.X.ButtonRelease
+        if x is not None and y is not None:
+            fake_input(display, self.X.MotionNotify, x=int(x), y=int(y))
+        detail = X11_BUTTONS[button]
+        for _ in range(n):
+            fake_input(display, press, detail)
+            fake_input(display, release, detail)
+        display.flush()
+
+    def mouse_down(self, button="left"):
+        self.xtest.fake_input(self.display, self.X.ButtonPress, X11_BUTTONS[button])
+        self.display.flush()
+
+    def mouse_up(self, button="left"):
+        self.xtest.fake_input(self.display, self.X.ButtonRelease, X11_BUTTONS[button])
+        self.display.flush()
+
+    def key_down(self, key):
+        self.xtest.fake_input(self.display, self.X.KeyPress, self.keycode(key))
+        self.display.flush()
+
+    def key_up(self, key):
+        self.xtest.fake_input(self.display, self.X.KeyRelease, self.keycode(key))
+        self.display.flush()
+
+    def close(self):
+        self.display.close()
+
+
+# Modifier keys X11WindowBackend tracks itself, since synthetic events
+# don't change what the server thinks is held down
+X11_MODIFIER_MASKS = {
+    'shift': 1 << 0, 'ctrl': 1 << 2, 'alt': 1 << 3, 'win': 1 << 6, 'command': 1 << 6,
+}
+X11_BUTTON_MASKS = {"left": 1 << 8, "middle": 1 << 9, "right": 1 << 10}
+
+
+def parse_window_id(window):
+    # A window id as an int, from an int or a string like "0x3a00007"
+    if isinstance(window, int):
+        return window
+    return int(str(window), 0)
+
+
+class X11WindowBackend(InputBackend):
+    # Sends synthetic events straight to one X11 window with XSendEvent, so
+    # the real pointer and keyboard focus never move and several windows
+    # can be driven at once, each with a backend of its own (XTest can't
+    # do that, it always goes through the one pointer).
+    #
+    # Coordinates are relative to the window. Clicks without any land at x,
+    # y, or wherever the last move() left off; the middle of the window to
+    # start with. Some programs ignore synthetic events, xterm for one
+    # unless its allowSendEvents resource is set.
+    name = "window"
+
+    keycode = XTestBackend.keycode
+
+    def __init__(self, window, x=None, y=None, display=None):
+        from Xlib import X, XK, error, display as xdisplay
+        from Xlib.protocol import event
+        self.X = X
+        self.XK = XK
+        self.event = event
+        self.display = xdisplay.Display(display)
+        self.root = self.display.screen().root
+        self.window = self.display.create_resource_object('window', parse_window_id(window))
+        try:
+            geometry = self.window.get_geometry()
+            # Where the window is on screen, for the events' root_x/root_y;
+            # looked up once, so it goes stale if the window moves
+            origin = self.window.translate_coords(self.root, 0, 0)
+        except error.XError:
+            self.display.close()
+            raise ValueError(f"There is no window {window}")
+        self.origin_x = -origin.x
+        self.origin_y = -origin.y
+        self.x = geometry.width // 2 if x is None else int(x)
+        self.y = geometry.height // 2 if y is None else int(y)
+        self.state = 0  # modifier and button masks held down
+        self._keycodes = {}
+
+    def _send(self, kind, mask, detail):
+        # Queues one event; the caller flushes
+        event = kind(
+            time=self.X.CurrentTime, root=self.root.id, window=self.window.id, same_screen=1,
+            child=self.X.NONE, root_x=self.origin_x + self.x, root_y=self.origin_y + self.y,
+            event_x=self.x, event_y=self.y, state=self.state, detail=detail
+        )
+        self.window.send_event(event, event_mask=mask, propagate=True)
+
+    def _button(self, down, button):
+        X = self.X
+        if down:
+            self._send(self.event.ButtonPress, X.ButtonPressMask, X11_BUTTONS[button])
+            self.state |= X11_BUTTON_MASKS[button]
+        else:
+            self._send(self.event.ButtonRelease, X.ButtonReleaseMask, X11_BUTTONS[button])
+            self.state &= ~X11_BUTTON_MASKS[button]
+
+    def _key(self, down, key):
+        X = self.X
+        if down:
+            self._send(self.event.KeyPress, X.KeyPressMask, self.keycode(key))
+            self.state |= X11_MODIFIER_MASKS.get(key.lower(), 0)
+        else:
+            self._send(self.event.KeyRelease, X.KeyReleaseMask, self.keycode(key))
+            self.state &= ~X11_MODIFIER_MASKS.get(key.lower(), 0)
+
+    def move(self, x, y):
+        self.x, self.y = int(x), int(y)
+        self._send(self.event.MotionNotify, self.X.PointerMotionMask, 0)
+        self.display.flush()
+
+    def click(self, x=None, y=None, button="left"):
+        if x is not None and y is not None:
+            self.x, self.y = int(x), int(y)
+        self._button(True, button)
+        self._button(False, button)
+        self.display.flush()
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        # Everything goes out in one flush
+        if x is not None and y is not None:
+            self.x, self.y = int(x), int(y)
+        for _ in range(n):
+            self._button(True, button)
+            self._button(False, button)
+        self.display.flush()
+
+    def mouse_down(self, button="left"):
+        self._button(True, button)
+        self.display.flush()
+
+    def mouse_up(self, button="left"):
+        self._button(False, button)
+        self.display.flush()
+
+    def key_down(self, key):
+        self._key(True, key)
+        self.display.flush()
+
+    def key_up(self, key):
+        self._key(False, key)
+        self.display.flush()
+
+    def press(self, key):
+        self._key(True, key)
+        self._key(False, key)
+        self.display.flush()
+
+    def close(self):
+        self.display.close()
+
+
+def _window_title(display, window):
+    from Xlib import X
+    name = window.get_full_property(display.intern_atom('_NET_WM_NAME'), X.AnyPropertyType)
+    title = name.value if name else window.get_wm_name()
+    if isinstance(title, bytes):
+        title = title.decode('utf-8', 'replace')
+    return title or ""
+
+
+def list_windows(display=None):
+    # (id, title) of every top-level window with a title, for picking one
+    # to send to. Asks the window manager when there is one, otherwise
+    # looks at the root window's children.
+    from Xlib import X, error, display as xdisplay
+    display = xdisplay.Display(display)
+    try:
+        root = display.screen().root
+        clients = root.get_full_property(display.intern_atom('_NET_CLIENT_LIST'), X.AnyPropertyType)
+        ids = list(clients.value) if clients else [child.id for child in root.query_tree().children]
+        windows = []
+        for window_id in ids:
+            try:
+                title = _window_title(display, display.create_resource_object('window', window_id))
+            except error.XError:
+                # Gone already
+                continue
+            if title:
+                windows.append((window_id, title))
+        return windows
+    finally:
+        display.close()
+
+
+def find_window(window, display=None):
+    # A window id from an id, or from part of a window's title if that
+    # matches exactly one
+    try:
+        return parse_window_id(window)
+    except ValueError:
+        pass
+    matches = [(window_id, title) for window_id, title in list_windows(display) if window.lower() in title.lower()]
+    if len(matches) != 1:
+        found = "No" if not matches else f"{len(matches)}"
+        raise ValueError(f"{found} windows have {window!r} in their title")
+    return matches[0][0]
+
+
+# Key names that don't match their evdev KEY_* code
+UINPUT_KEYS = {
+    'enter': 'KEY_ENTER', 'return': 'KEY_ENTER', 'space': 'KEY_SPACE',
+    'tab': 'KEY_TAB', 'backspace': 'KEY_BACKSPACE', 'esc': 'KEY_ESC',
+    'escape': 'KEY_ESC', 'pageup': 'KEY_PAGEUP', 'pagedown': 'KEY_PAGEDOWN',
+    'shift': 'KEY_LEFTSHIFT', 'ctrl': 'KEY_LEFTCTRL', 'alt': 'KEY_LEFTALT',
+    'win': 'KEY_LEFTMETA', 'command': 'KEY_LEFTMETA',
+    '`': 'KEY_GRAVE', '-': 'KEY_MINUS', '=': 'KEY_EQUAL', '[': 'KEY_LEFTBRACE',
+    ']': 'KEY_RIGHTBRACE', '\\': 'KEY_BACKSLASH', ';': 'KEY_SEMICOLON',
+    "'": 'KEY_APOSTROPHE', ',': 'KEY_COMMA', '.': 'KEY_DOT', '/': 'KEY_SLASH',
+}
+
+UINPUT_BUTTONS = {"left": 'BTN_LEFT', "right": 'BTN_RIGHT', "middle": 'BTN_MIDDLE'}
+
+# struct input_event: a zero timeval (the kernel stamps it), type, code, value
+INPUT_EVENT = struct.Struct('llHHi')
+
+
+class UInputBackend(InputBackend):
+    # Creates a virtual input device through /dev/uinput, so it works below
+    # X11/Wayland entirely. Moving the pointer needs the screen size because
+    # the device reports absolute coordinates.
+    name = "uinput"
+
+    def __init__(self, screen_size=None):
+        from evdev import UInput, AbsInfo, ecodes
+        self.ecodes = ecodes
+        self.screen_size = screen_size
+        keys = [code for name, code in ecodes.ecodes.items()
+                if name.startswith('KEY_') and code < ecodes.KEY_MAX]
+        keys += [getattr(ecodes, name) for name in UINPUT_BUTTONS.values()]
+        events = {ecodes.EV_KEY: keys}
+        if screen_size:
+            width, height = screen_size
+            events[ecodes.EV_ABS] = [
+                (ecodes.ABS_X, AbsInfo(0, 0, width - 1, 0, 0, 0)),
+                (ecodes.ABS_Y, AbsInfo(0, 0, height - 1, 0, 0, 0)),
+            ]
+        self.device = UInput(events, name="autoclicker")
+        self._codes = {}
+
+    def code(self, key):
+        code = self._codes.get(key)
+        if code is None:
+            name = UINPUT_KEYS.get(key.lower(), 'KEY_' + key.upper())
+            code = getattr(self.ecodes, name, None)
+            if code is None:
+                raise ValueError(f"No uinput code for key {key!r}")
+            self._codes[key] = code
+        return code
+
+    def _button(self, button, value):
+        self.device.write(self.ecodes.EV_KEY, getattr(self.ecodes, UINPUT_BUTTONS[button]), value)
+
+    def move(self, x, y):
+        if not self.screen_size:
+            raise RuntimeError("uinput backend needs the screen size to move the pointer")
+        self.device.write(self.ecodes.EV_ABS, self.ecodes.ABS_X, int(x))
+        self.device.write(self.ecodes.EV_ABS, self.ecodes.ABS_Y, int(y))
+        self.device.syn()
+
+    def click(self, x=None, y=None, button="left"):
+        if x is not None and y is not None:
+            self.move(x, y)
+        self._button(button, 1)
+        self.device.syn()
+        self._button(button, 0)
+        self.device.syn()
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        # Packed up front and handed to the device in a single write()
+        if x is not None and y is not None:
+            self.move(x, y)
+        ecodes = self.ecodes
+        code = getattr(ecodes, UINPUT_BUTTONS[button])
+        pack = INPUT_EVENT.pack
+        syn = pack(0, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        click = pack(0, 0, ecodes.EV_KEY, code, 1) + syn + pack(0, 0, ecodes.EV_KEY, code, 0) + syn
+        os.write(self.device.fd, click * n)
+
+    def mouse_down(self, button="left"):
+        self._button(button, 1)
+        self.device.syn()
+
+    def mouse_up(self, button="left"):
+        self._button(button, 0)
+        self.device.syn()
+
+    def key_down(self, key):
+        self.device.write(self.ecodes.EV_KEY, self.code(key), 1)
+        self.device.syn()
+
+    def key_up(self, key):
+        self.device.write(self.ecodes.EV_KEY, self.code(key), 0)
+        self.device.syn()
+
+    def close(self):
+        self.device.close()
+
+
+class RecordingBackend(InputBackend):
+    # Sends nothing anywhere, just remembers what it was asked to do as
+    # (perf_counter_ns, action, args) tuples. Used for tests and benchmarks.
+    # With keep off it only counts them, so it can run for days (soak.py)
+    # without growing.
+    name = "recording"
+
+    def __init__(self, clock=None, keep=True):
+        self.events = []
+        self.counts = {}
+        self.keep = keep
+        # A timing.VirtualClock when simulating
+        self.now_ns = clock.now_ns if clock else time.perf_counter_ns
+
+    def _record(self, action, *args):
+        self.counts[action] = self.counts.get(action, 0) + 1
+        if self.keep:
+            self.events.append((self.now_ns(), action, args))
+
+    def click(self, x=None, y=None, button="left"):
+        self._record('click', x, y, button)
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        # n clicks with the same timestamp
+        self.counts['click'] = self.counts.get('click', 0) + n
+        if self.keep:
+            event = (self.now_ns(), 'click', (x, y, button))
+            self.events.extend([event] * n)
+
+    def move(self, x, y):
+        self._record('move', x, y)
+
+    def mouse_down(self, button="left"):
+        self._record('mouse_down', button)
+
+    def mouse_up(self, button="left"):
+        self._record('mouse_up', button)
+
+    def key_down(self, key):
+        self._record('key_down', key)
+
+    def key_up(self, key):
+        self._record('key_up', key)
+
+    def count(self, action):
+        return self.counts.get(action, 0)
+
+    def timestamps(self, action):
+        return [event[0] for event in self.events if event[1] == action]
+
+    def clear(self):
+        self.events = []
+        self.counts = {}
+
+
+BACKENDS = {
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    XTestBackend.name: XTestBackend,
+    X11WindowBackend.name: X11WindowBackend,
+    UInputBackend.name: UInputBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+# The ones that can be picked by name alone; the window backend is picked
+# by picking a window, create_backend("window", window=...)
+BACKEND_NAMES = ["auto"] + [name for name in BACKENDS if name != X11WindowBackend.name]
+
+
+def x11_windows_available():
+    # Whether windows can be listed and sent to at all
+    import importlib.util
+    return bool(os.environ.get('DISPLAY')) and importlib.util.find_spec('Xlib') is not None
+
+
+def create_backend(name="auto", **options):
+    if name == "auto":
+        # XTest skips pyautogui's per-call pause and failsafe checks, so use
+        # it whenever we're on X11 and python-xlib is around
+        if sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+            try:
+                return XTestBackend(**options)
+            except Exception:
+                pass
+        return PyAutoGUIBackend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown input backend {name!r}")
+    return BACKENDS[name](**options)
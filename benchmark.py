@@ -0,0 +1,598 @@
+import argparse
+import json
+import os
+import platform
+import select
+import sys
+import tempfile
+import threading
+import time
+
+from backends import RecordingBackend, create_backend
+from engines import ClickEngine, TypeEngine
+from timing import VirtualClock, simulate
+
+# Drives the engines against a recording backend (or a real one wrapped so
+# it still records timestamps) and reports how fast and how evenly they
+# send events. Needs no display unless a real backend is picked.
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --compare bench.json
+#   xvfb-run python benchmark.py --scenarios window
+
+DEFAULT_INTERVALS = [0.001, 0.002, 0.005, 0.01, 0.1, 1.0]
+
+# No delay between keys, so the typer runs as fast as the backend allows
+TYPE_KEY_DELAY = 0.0
+
+# Clicks per wakeup in the burst scenario
+BURST_SIZE = 10
+
+# Targets the path scenario moves through, spread over a 1080p screen
+PATH_TARGETS = 50
+
+# Clients hammering the control socket at once, and how many start/stop
+# rounds the command-to-effect latency is taken over
+IPC_CLIENTS = 8
+IPC_ROUNDS = 50
+
+# Threads of pure Python the gil and worker scenarios keep running in this
+# process, standing in for a GUI that's busy drawing or matching images
+LOAD_THREADS = 2
+
+# Clicks the sim scenario simulates per interval, however long that takes
+# in virtual time (a day and more at 1 s)
+SIM_EVENTS = 100_000
+
+# Stub windows the window scenario clicks into at once
+WINDOWS = 2
+
+# What the paste scenario types over and over, 10 KB of it
+PASTE_PAYLOAD = "The quick brown fox jumps over the lazy dog.\n" * 227
+
+
+class TimedBackend(RecordingBackend):
+    # Records like RecordingBackend but still sends everything on
+    name = "timed"
+
+    def __init__(self, inner):
+        super().__init__()
+        self.inner = inner
+
+    def click(self, x=None, y=None, button="left"):
+        super().click(x, y, button)
+        self.inner.click(x, y, button)
+
+    def click_batch(self, n, x=None, y=None, button="left"):
+        super().click_batch(n, x, y, button)
+        self.inner.click_batch(n, x, y, button)
+
+    def move(self, x, y):
+        super().move(x, y)
+        self.inner.move(x, y)
+
+    def mouse_down(self, button="left"):
+        super().mouse_down(button)
+        self.inner.mouse_down(button)
+
+    def mouse_up(self, button="left"):
+        super().mouse_up(button)
+        self.inner.mouse_up(button)
+
+    def key_down(self, key):
+        super().key_down(key)
+        self.inner.key_down(key)
+
+    def key_up(self, key):
+        super().key_up(key)
+        self.inner.key_up(key)
+
+    def close(self):
+        self.inner.close()
+
+
+def open_backend(name):
+    if name == "recording":
+        return RecordingBackend()
+    return TimedBackend(create_backend(name))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def timing_stats(timestamps, period):
+    # Jitter is how far each gap between events is from the intended period
+    period_ns = period * 1_000_000_000
+    jitter = sorted(abs((b - a) - period_ns) / 1_000_000 for a, b in zip(timestamps, timestamps[1:]))
+    span = (timestamps[-1] - timestamps[0]) / 1_000_000_000 if len(timestamps) > 1 else 0
+    return {
+        "events": len(timestamps),
+        "events_per_s": (len(timestamps) - 1) / span if span else 0.0,
+        "target_per_s": 1 / period,
+        "jitter_p50_ms": percentile(jitter, 0.50),
+        "jitter_p99_ms": percentile(jitter, 0.99),
+        "jitter_max_ms": jitter[-1] if jitter else 0.0,
+    }
+
+
+def run_engine(engine, duration):
+    # Runs the engine on its own thread for duration seconds, then measures
+    # how long stop() takes to get the thread out
+    thread = threading.Thread(target=engine.run)
+    cpu_start = time.process_time()
+    thread.start()
+    time.sleep(duration)
+    stop_start = time.perf_counter()
+    engine.stop()
+    thread.join()
+    stop_latency = time.perf_counter() - stop_start
+    return time.process_time() - cpu_start, stop_latency
+
+
+def under_load(run, *args):
+    # Calls run(*args) with LOAD_THREADS busy threads going the whole time
+    done = threading.Event()
+
+    def load():
+        while not done.is_set():
+            sum(i * i for i in range(1000))
+
+    threads = [threading.Thread(target=load) for _ in range(LOAD_THREADS)]
+    for thread in threads:
+        thread.start()
+    try:
+        return run(*args)
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+
+def finish(result, timestamps, period, cpu, stop_latency):
+    result.update(timing_stats(timestamps, period))
+    result["cpu_us_per_event"] = cpu * 1_000_000 / len(timestamps) if timestamps else 0.0
+    result["stop_latency_ms"] = stop_latency * 1000
+    return result
+
+
+def bench_click(interval, duration, backend_name):
+    backend = open_backend(backend_name)
+    engine = ClickEngine(backend, interval, "Seconds")
+    cpu, stop_latency = run_engine(engine, duration)
+    result = {"engine": "click", "interval_s": interval}
+    return finish(result, backend.timestamps('click'), interval, cpu, stop_latency)
+
+
+def bench_burst(interval, duration, backend_name):
+    # interval is the time per click; they go out BURST_SIZE at a time, so
+    # jitter is measured between batches
+    backend = open_backend(backend_name)
+    engine = ClickEngine(backend, interval, "Seconds", burst=BURST_SIZE)
+    cpu, stop_latency = run_engine(engine, duration)
+    clicks = backend.timestamps('click')
+    batches = sorted(set(clicks))
+    result = finish({"engine": "burst", "interval_s": interval}, batches, interval * BURST_SIZE, cpu, stop_latency)
+    result.update(
+        burst=BURST_SIZE,
+        events=len(clicks),
+        events_per_s=result["events_per_s"] * BURST_SIZE,
+        target_per_s=1 / interval,
+        cpu_us_per_event=cpu * 1_000_000 / len(clicks) if clicks else 0.0,
+    )
+    return result
+
+
+def bench_path(interval, duration, backend_name):
+    # interval is the sample period; also reports what planning the path
+    # cost per sample
+    import numpy as np
+    from trajectory import PathEngine, plan_path
+    points = np.random.default_rng(1).integers(0, (1920, 1080), (PATH_TARGETS, 2)).tolist()
+    plan_start = time.perf_counter()
+    path = plan_path(points, sample_rate=1 / interval, closed=True, seed=1)
+    plan_time = time.perf_counter() - plan_start
+    backend = open_backend(backend_name)
+    engine = PathEngine(backend, path, loops=0)
+    cpu, stop_latency = run_engine(engine, duration)
+    result = {"engine": "path", "interval_s": interval, "plan_us_per_sample": plan_time * 1_000_000 / len(path)}
+    return finish(result, backend.timestamps('move'), interval, cpu, stop_latency)
+
+
+def bench_gil(interval, duration, backend_name):
+    # The click scenario while other threads in this process want the GIL,
+    # as everything in the GUI's process does. CPU is the engine thread's
+    # own, the load's isn't counted.
+    backend = open_backend(backend_name)
+    engine = ClickEngine(backend, interval, "Seconds")
+    cpu = []
+    run = engine.run
+
+    def timed_run():
+        run()
+        cpu.append(time.thread_time())
+
+    engine.run = timed_run
+    _, stop_latency = under_load(run_engine, engine, duration)
+    result = {"engine": "gil", "interval_s": interval, "load_threads": LOAD_THREADS}
+    return finish(result, backend.timestamps('click'), interval, cpu[0], stop_latency)
+
+
+def bench_worker(interval, duration, backend_name):
+    # The gil scenario with the clicker in a worker process. The worker
+    # opens its own backend, so this always uses a recording one; the run
+    # starts once the worker is up, the time that takes is start_ms.
+    from workers import ProcessEngine
+    if backend_name != "recording":
+        print(f"worker: using the recording backend, not {backend_name}", file=sys.stderr)
+    engine = ProcessEngine(ClickEngine, "recording", {"interval": interval, "time_unit": "Seconds"})
+    start = time.perf_counter()
+
+    def run(engine, duration):
+        thread = threading.Thread(target=engine.run)
+        thread.start()
+        while not engine.metrics.events_sent:
+            time.sleep(0.001)
+        start_ms = (time.perf_counter() - start) * 1000
+        time.sleep(duration)
+        stop_start = time.perf_counter()
+        engine.stop()
+        thread.join()
+        return start_ms, time.perf_counter() - stop_start
+
+    start_ms, stop_latency = under_load(run, engine, duration)
+    clicks = [at for at, action, args in engine.recorded if action == 'click']
+    result = {"engine": "worker", "interval_s": interval, "load_threads": LOAD_THREADS, "start_ms": start_ms}
+    return finish(result, clicks, interval, engine.cpu_time, stop_latency)
+
+
+def bench_sim(interval, duration, backend_name):
+    # The clicker on a virtual clock, SIM_EVENTS clicks as fast as they
+    # go, checked for exactly the right count at exactly the right times.
+    # Always on a recording backend; duration isn't used.
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    engine = ClickEngine(backend, interval, "Seconds", clock=clock)
+    virtual_s = SIM_EVENTS * interval
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    simulate(engine, clock, virtual_s)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    clicks = backend.timestamps('click')
+    period_ns = engine.scheduler.period_ns
+    exact = len(clicks) == SIM_EVENTS and all(t == i * period_ns for i, t in enumerate(clicks))
+    return {
+        "engine": "sim",
+        "interval_s": interval,
+        "events": len(clicks),
+        "expected": SIM_EVENTS,
+        "exact": exact,
+        "virtual_s": virtual_s,
+        "speedup": virtual_s / elapsed,
+        "events_per_s": len(clicks) / elapsed,
+        "cpu_us_per_event": cpu * 1_000_000 / len(clicks) if clicks else 0.0,
+    }
+
+
+class CountingWindow:
+    # A client window of our own, on a connection of its own, that counts
+    # the events it's sent and notes when each button press arrived
+    def __init__(self):
+        from Xlib import X, display
+        self.X = X
+        self.display = display.Display()
+        screen = self.display.screen()
+        self.window = screen.root.create_window(
+            0, 0, 200, 100, 0, screen.root_depth,
+            event_mask=X.ButtonPressMask | X.ButtonReleaseMask | X.KeyPressMask | X.KeyReleaseMask
+        )
+        self.window.map()
+        self.display.sync()
+        self.counts = {}
+        self.presses = []
+        self.closing = False
+        self.thread = threading.Thread(target=self.read, daemon=True)
+        self.thread.start()
+
+    def read(self):
+        clock = time.perf_counter_ns
+        while not self.closing:
+            select.select([self.display], [], [], 0.05)
+            while self.display.pending_events():
+                event = self.display.next_event()
+                self.counts[event.type] = self.counts.get(event.type, 0) + 1
+                if event.type == self.X.ButtonPress:
+                    self.presses.append(clock())
+
+    def received(self, sent, timeout=2.0):
+        # Waits up to timeout for `sent` presses to turn up
+        deadline = time.perf_counter() + timeout
+        while len(self.presses) < sent and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        return len(self.presses)
+
+    def close(self):
+        self.closing = True
+        self.thread.join()
+        self.window.destroy()
+        self.display.close()
+
+
+def bench_window(interval, duration, backend_name):
+    # Clicks into WINDOWS stub windows at once, each from its own engine
+    # with its own window backend, and checks every click got to its
+    # window and the real pointer never moved. Latency is from the click
+    # going out to the window reading it. Needs an X server (Xvfb will do)
+    # and always uses the window backend.
+    from backends import X11WindowBackend
+    if not os.environ.get('DISPLAY'):
+        sys.exit("window: needs an X display; try xvfb-run python benchmark.py --scenarios window")
+    windows = [CountingWindow() for _ in range(WINDOWS)]
+    root = windows[0].display.screen().root
+    pointer = root.query_pointer()
+    backends = [TimedBackend(X11WindowBackend(window.window.id)) for window in windows]
+    engines = [ClickEngine(backend, interval, "Seconds") for backend in backends]
+    threads = [threading.Thread(target=engine.run) for engine in engines]
+    try:
+        cpu_start = time.process_time()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop_start = time.perf_counter()
+        for engine in engines:
+            engine.stop()
+        for thread in threads:
+            thread.join()
+        stop_latency = time.perf_counter() - stop_start
+        cpu = time.process_time() - cpu_start
+
+        sent = [backend.timestamps('click') for backend in backends]
+        received = [window.received(len(clicks)) for window, clicks in zip(windows, sent)]
+        latency = sorted(
+            (arrived - clicked) / 1_000_000
+            for window, clicks in zip(windows, sent)
+            for clicked, arrived in zip(clicks, window.presses)
+        )
+        after = root.query_pointer()
+    finally:
+        for window in windows:
+            window.close()
+
+    result = {
+        "engine": "window",
+        "interval_s": interval,
+        "windows": WINDOWS,
+        "sent": sum(len(clicks) for clicks in sent),
+        "received": sum(received),
+        "pointer_moved": (pointer.root_x, pointer.root_y) != (after.root_x, after.root_y),
+        "latency_p50_ms": percentile(latency, 0.50),
+        "latency_p99_ms": percentile(latency, 0.99),
+    }
+    # Timing is the first window's; the CPU is spread over every click sent
+    finish(result, sent[0], interval, cpu, stop_latency)
+    result["cpu_us_per_event"] = cpu * 1_000_000 / result["sent"] if result["sent"] else 0.0
+    return result
+
+
+def bench_paste(interval, duration, backend_name):
+    # PASTE_PAYLOAD typed key by key and then pasted, each for duration
+    # seconds, in characters a second. interval is the delay between keys,
+    # standing in for what each key costs a real backend. Pastes go to a
+    # MemoryClipboard, so this runs anywhere; the chords go to the backend.
+    from paste import KEYS, PASTE, MemoryClipboard
+    result = {"engine": "paste", "interval_s": interval, "payload_chars": len(PASTE_PAYLOAD)}
+    for strategy in (KEYS, PASTE):
+        backend = open_backend(backend_name)
+        engine = TypeEngine(backend, 0, "Second", PASTE_PAYLOAD, 0, key_delay=interval,
+                            strategy=strategy, clipboard=MemoryClipboard())
+        start = time.perf_counter()
+        cpu, stop_latency = run_engine(engine, duration)
+        elapsed = time.perf_counter() - start - stop_latency
+        chars = engine.metrics.events_sent
+        name = strategy.lower()
+        result[f"{name}_chars_per_s"] = chars / elapsed
+        result[f"{name}_cpu_us_per_char"] = cpu * 1_000_000 / chars if chars else 0.0
+    keys = result["keys_chars_per_s"]
+    result["speedup"] = result["paste_chars_per_s"] / keys if keys else float('inf')
+    return result
+
+
+def bench_type(interval, duration, backend_name):
+    # A single character per repetition, so one key per interval
+    backend = open_backend(backend_name)
+    engine = TypeEngine(backend, interval, "Second", "a", 0, key_delay=TYPE_KEY_DELAY)
+    cpu, stop_latency = run_engine(engine, duration)
+    result = {"engine": "type", "interval_s": interval}
+    return finish(result, backend.timestamps('key_down'), interval + TYPE_KEY_DELAY, cpu, stop_latency)
+
+
+def bench_ipc(interval, duration, backend_name):
+    # Control socket throughput while a clicker runs at interval, then how
+    # long it takes from sending "start" to the first click, and for "stop"
+    # to come back (it answers once the clicker thread is gone)
+    from control import ControlClient, ControlServer, EngineController
+
+    backends = []
+
+    def backend_factory():
+        backends.append(open_backend(backend_name))
+        return backends[-1]
+
+    controller = EngineController(backend_factory)
+    path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    server = ControlServer(controller, path)
+    try:
+        with ControlClient(path) as client:
+            client.request("start", job="clicker", interval=interval, unit="Seconds")
+            counts = [0] * IPC_CLIENTS
+            deadline = time.perf_counter() + duration / 2
+
+            def hammer(index):
+                with ControlClient(path) as own:
+                    while time.perf_counter() < deadline:
+                        own.request("status")
+                        counts[index] += 1
+
+            threads = [threading.Thread(target=hammer, args=(i,)) for i in range(IPC_CLIENTS)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            commands_per_s = sum(counts) / (time.perf_counter() - start)
+            client.request("stop", job="clicker")
+
+            effect = []
+            stop = []
+            for _ in range(IPC_ROUNDS):
+                sent = time.perf_counter_ns()
+                client.request("start", job="clicker", interval=interval, unit="Seconds")
+                backend = backends[-1]
+                while not backend.count('click'):
+                    time.sleep(0.0001)
+                effect.append((backend.timestamps('click')[0] - sent) / 1_000_000)
+                stop_start = time.perf_counter_ns()
+                client.request("stop", job="clicker")
+                stop.append((time.perf_counter_ns() - stop_start) / 1_000_000)
+    finally:
+        server.close()
+        controller.close()
+        os.rmdir(os.path.dirname(path))
+
+    effect.sort()
+    stop.sort()
+    return {
+        "engine": "ipc",
+        "interval_s": interval,
+        "clients": IPC_CLIENTS,
+        "commands_per_s": commands_per_s,
+        "effect_p50_ms": percentile(effect, 0.50),
+        "effect_p99_ms": percentile(effect, 0.99),
+        "stop_p50_ms": percentile(stop, 0.50),
+        "stop_p99_ms": percentile(stop, 0.99),
+    }
+
+
+SCENARIOS = {
+    "click": bench_click,
+    "burst": bench_burst,
+    "path": bench_path,
+    "type": bench_type,
+    "ipc": bench_ipc,
+    "gil": bench_gil,
+    "worker": bench_worker,
+    "sim": bench_sim,
+    "window": bench_window,
+    "paste": bench_paste,
+}
+
+
+def describe(result):
+    # One line per result for stderr
+    head = f"{result['engine']:>6} {result['interval_s'] * 1000:>8g} ms  "
+    if "virtual_s" in result:
+        return (head + f"{result['events']:10d} of {result['expected']} clicks "
+                f"{'exactly on time' if result['exact'] else 'NOT EXACT'}  "
+                f"{result['virtual_s']:10.0f} virtual s at {result['speedup']:.0f}x, "
+                f"{result['events_per_s']:.0f} clicks/s  cpu {result['cpu_us_per_event']:.1f} us/event")
+    if "paste_chars_per_s" in result:
+        return (head + f"keys {result['keys_chars_per_s']:12,.0f} chars/s  "
+                f"paste {result['paste_chars_per_s']:12,.0f} chars/s  ({result['speedup']:.1f}x)  "
+                f"cpu {result['keys_cpu_us_per_char']:.2f} / {result['paste_cpu_us_per_char']:.2f} us/char")
+    if "commands_per_s" in result:
+        return (head + f"{result['commands_per_s']:10.1f} commands/s from {result['clients']} clients  "
+                f"start to first click p50 {result['effect_p50_ms']:.3f} p99 {result['effect_p99_ms']:.3f} ms  "
+                f"stop p50 {result['stop_p50_ms']:.3f} p99 {result['stop_p99_ms']:.3f} ms")
+    line = (head + f"{result['events_per_s']:10.1f}/s of {result['target_per_s']:10.1f}/s  "
+            f"jitter p50 {result['jitter_p50_ms']:7.3f} p99 {result['jitter_p99_ms']:7.3f} "
+            f"max {result['jitter_max_ms']:7.3f} ms  "
+            f"cpu {result['cpu_us_per_event']:7.1f} us/event  "
+            f"stop {result['stop_latency_ms']:.3f} ms")
+    if "plan_us_per_sample" in result:
+        line += f"  planning {result['plan_us_per_sample']:.3f} us/sample"
+    if "start_ms" in result:
+        line += f"  worker up in {result['start_ms']:.0f} ms"
+    if "received" in result:
+        line += (f"  {result['received']} of {result['sent']} clicks reached {result['windows']} windows, "
+                 f"latency p50 {result['latency_p50_ms']:.3f} p99 {result['latency_p99_ms']:.3f} ms, "
+                 f"pointer {'MOVED' if result['pointer_moved'] else 'untouched'}")
+    return line
+
+
+def compare(results, baseline):
+    # Prints how each row moved against an earlier run
+    old = {(row["engine"], row["interval_s"]): row for row in baseline["results"]}
+    for row in results:
+        before = old.get((row["engine"], row["interval_s"]))
+        if not before:
+            continue
+        if "commands_per_s" in row:
+            print(f"{row['engine']:>6} {row['interval_s'] * 1000:>8g} ms  "
+                  f"commands/s {before['commands_per_s']:10.1f} -> {row['commands_per_s']:10.1f}  "
+                  f"p99 start to click {before['effect_p99_ms']:8.3f} -> {row['effect_p99_ms']:8.3f} ms",
+                  file=sys.stderr)
+            continue
+        if "paste_chars_per_s" in row:
+            print(f"{row['engine']:>6} {row['interval_s'] * 1000:>8g} ms  "
+                  f"keys chars/s {before['keys_chars_per_s']:12,.0f} -> {row['keys_chars_per_s']:12,.0f}  "
+                  f"paste chars/s {before['paste_chars_per_s']:12,.0f} -> {row['paste_chars_per_s']:12,.0f}",
+                  file=sys.stderr)
+            continue
+        if "virtual_s" in row:
+            print(f"{row['engine']:>6} {row['interval_s'] * 1000:>8g} ms  "
+                  f"simulated clicks/s {before['events_per_s']:10.0f} -> {row['events_per_s']:10.0f}  "
+                  f"exact {before['exact']} -> {row['exact']}", file=sys.stderr)
+            continue
+        print(f"{row['engine']:>6} {row['interval_s'] * 1000:>8g} ms  "
+              f"events/s {before['events_per_s']:10.1f} -> {row['events_per_s']:10.1f}  "
+              f"p99 jitter {before['jitter_p99_ms']:8.3f} -> {row['jitter_p99_ms']:8.3f} ms", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auto Clicker throughput and jitter benchmark")
+    parser.add_argument("--scenarios", default="click,type",
+                        help=f"comma separated, any of {', '.join(SCENARIOS)}")
+    parser.add_argument("--intervals", default=",".join(str(i) for i in DEFAULT_INTERVALS),
+                        help="comma separated intervals in seconds")
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds per run")
+    parser.add_argument("--backend", default="recording",
+                        help="input backend; anything but recording really sends input")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    intervals = [float(i) for i in args.intervals.split(",")]
+    results = []
+    for name in args.scenarios.split(","):
+        scenario = SCENARIOS[name]
+        for interval in intervals:
+            # Long intervals need long enough runs to see a few events
+            duration = max(args.duration, interval * 5)
+            result = scenario(interval, duration, args.backend)
+            print(describe(result), file=sys.stderr)
+            results.append(result)
+
+    report = {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
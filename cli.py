@@ -0,0 +1,445 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+from backends import BACKEND_NAMES, BUTTONS, create_backend, find_window, list_windows
+from engines import DEFAULT_KEY_DELAY, ClickEngine, JobEngine, StreamTypeEngine, TypeEngine, check_burst, check_interval
+from eventtrace import STALL_MS, EventTrace, analyze, format_report, read_trace, write_trace
+from paste import KEYS, PASTE_THRESHOLD, STRATEGIES
+from timing import CATCH_UP, CLICKS_PER_SECOND, MISSED_POLICIES, interval_to_seconds
+
+# Runs the clicker/typer engines without the GUI (and without importing Qt)
+#
+#   python cli.py click --interval 100 --unit Milliseconds --duration 60
+#   python cli.py click --interval 5000 --unit Clicks/s --burst 10
+#   python cli.py type --text "hello" --interval 2 --unit Second
+#   python cli.py type --file script.txt --key-delay 0
+#   python cli.py --daemon --pidfile /tmp/autoclicker.pid run jobs.json
+#   python cli.py --daemon serve
+#   python cli.py click --interval 5 --duration 30 --trace run.trace
+#   python cli.py analyze run.trace
+#   python cli.py windows
+#   python cli.py click --window 0x3a00007 --x 40 --y 60 --interval 20
+#
+# A job file is JSON like
+#
+#   {"jobs": [
+#       {"type": "click", "x": 100, "y": 200, "interval": 50, "unit": "Milliseconds"},
+#       {"type": "click", "interval": 1, "unit": "Seconds"},
+#       {"type": "click", "x": 300, "y": 200, "interval": 80,
+#        "humanize": {"distribution": "Log-normal", "spread": 0.3, "offset": 4, "seed": 1}},
+#       {"type": "type", "text": "hi", "interval": 5, "unit": "Second"},
+#       {"type": "type", "text": "...", "strategy": "Paste", "interval": 1, "unit": "Minute"},
+#       {"type": "file", "path": "notes.txt"},
+#       {"type": "path", "points": [[100, 100], [400, 120], [250, 300]],
+#        "curve": "Bezier", "speed": 1500, "rate": 240, "loops": 0},
+#       {"type": "click", "window": "Untitled - Editor", "x": 40, "y": 60, "interval": 20}
+#   ]}
+#
+# Click jobs with x/y all share one thread; a click job without them clicks
+# wherever the cursor is, like the GUI clicker. A job with a "window" (an id
+# or part of its title, see the windows command) sends its events straight
+# to that X11 window instead, without moving the cursor, from a thread of
+# its own; its x/y are relative to the window and default to the middle.
+#
+# A type job's "strategy" is Keys (the default), Paste (through the
+# clipboard, see paste.py) or Auto, which pastes text of at least
+# "paste_threshold" characters. A path job moves the cursor
+# through its points in order and clicks at each (loops 0 is forever).
+#
+# serve starts nothing by itself and waits for commands on a Unix socket
+# instead; see control.py for what to send.
+#
+# --trace records when every click or key was due and when it went out,
+# and analyze reports on the file afterwards; see eventtrace.py.
+
+
+class JobFileError(ValueError):
+    pass
+
+
+def human_schedule(job):
+    # The job's "humanize" settings as a HumanSchedule, or None
+    settings = job.get("humanize")
+    if not settings:
+        return None
+    from humanize import NORMAL, HumanSchedule
+    return HumanSchedule(
+        settings.get("distribution", NORMAL),
+        settings.get("spread", 0.2),
+        settings.get("offset", 0),
+        settings.get("seed")
+    )
+
+
+def job_backend(job, backend_name):
+    if "window" in job:
+        try:
+            return create_backend("window", window=find_window(job["window"]), x=job.get("x"), y=job.get("y"))
+        except ValueError:
+            raise
+        except Exception as e:
+            # Xlib's errors for there being no display at all
+            raise RuntimeError(f"Couldn't reach window {job['window']}: {e}")
+    return create_backend(backend_name)
+
+
+def build_job_engines(jobs, backend_name):
+    # If a job can't be built, the backends already opened for the others
+    # are closed before the error goes on up
+    backends = []
+
+    def open_backend(job=None):
+        backend = job_backend(job, backend_name) if job else create_backend(backend_name)
+        backends.append(backend)
+        return backend
+
+    try:
+        engines = []
+        positioned = [job for job in jobs if job.get("type", "click") == "click" and "x" in job and "window" not in job]
+        if positioned:
+            job_engine = JobEngine(open_backend())
+            for job in positioned:
+                job_engine.add_job(
+                    job["x"], job["y"],
+                    interval_to_seconds(job.get("interval", 100), job.get("unit", "Milliseconds")),
+                    job.get("button", "left"),
+                    human_schedule(job)
+                )
+            engines.append(job_engine)
+
+        for job in jobs:
+            kind = job.get("type", "click")
+            if job in positioned:
+                continue
+            if kind == "click":
+                engines.append(ClickEngine(
+                    open_backend(job),
+                    job.get("interval", 100),
+                    job.get("unit", "Milliseconds"),
+                    job.get("missed", CATCH_UP),
+                    burst=job.get("burst", 1),
+                    humanize=human_schedule(job)
+                ))
+            elif kind == "type":
+                engines.append(TypeEngine(
+                    open_backend(job),
+                    job.get("interval", 1),
+                    job.get("unit", "Second"),
+                    job["text"],
+                    job.get("duration", 0),
+                    job.get("key_delay", DEFAULT_KEY_DELAY * 1000) / 1000,
+                    strategy=job.get("strategy", KEYS),
+                    paste_threshold=job.get("paste_threshold", PASTE_THRESHOLD)
+                ))
+            elif kind == "file":
+                engines.append(StreamTypeEngine(
+                    open_backend(job),
+                    job["path"],
+                    job.get("key_delay", DEFAULT_KEY_DELAY * 1000) / 1000,
+                    job.get("resume", True)
+                ))
+            elif kind == "path":
+                from trajectory import BEZIER, SAMPLE_RATE, SPEED, PathEngine, plan_path
+                loops = job.get("loops", 1)
+                path = plan_path(
+                    job["points"],
+                    job.get("rate", SAMPLE_RATE),
+                    job.get("speed", SPEED),
+                    job.get("curve", BEZIER),
+                    closed=loops != 1,
+                    seed=job.get("seed")
+                )
+                engines.append(PathEngine(open_backend(job), path, loops, job.get("button", "left")))
+            else:
+                raise JobFileError(f"Unknown job type {kind!r}")
+        return engines
+
+    except BaseException:
+        for backend in backends:
+            try:
+                backend.close()
+            except Exception:
+                pass
+        raise
+
+
+def load_job_file(path, backend_name):
+    with open(path, 'r') as f:
+        try:
+            jobs = json.load(f)
+        except ValueError as e:
+            raise JobFileError(f"{path} is not valid JSON: {e}")
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs", [])
+    try:
+        return build_job_engines(jobs, backend_name)
+    except KeyError as e:
+        raise JobFileError(f"A job in {path} is missing {e}")
+
+
+def daemonize(pidfile=None):
+    # Classic double fork so the engines keep running after the shell exits
+    if os.fork():
+        os._exit(0)
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    if pidfile:
+        with open(pidfile, 'w') as f:
+            f.write(f"{os.getpid()}\n")
+
+
+def wait_for_stop(duration=0, stop_key=None, done=None):
+    # Blocks until the duration is up, the stop key is pressed, we get
+    # SIGINT/SIGTERM, or done is set
+    done = done or threading.Event()
+
+    def stop(*args):
+        done.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, stop)
+
+    dispatcher = None
+    if stop_key:
+        from hotkeys import HotkeyDispatcher
+        dispatcher = HotkeyDispatcher()
+        dispatcher.bind(stop_key, stop)
+        try:
+            dispatcher.start()
+        except Exception as e:
+            dispatcher = None
+            print(f"Stop key unavailable, use Ctrl+C instead: {e}", file=sys.stderr)
+
+    # Event.wait() in short slices so signals get handled promptly
+    remaining = duration if duration > 0 else None
+    while not done.is_set():
+        slice_time = 0.5 if remaining is None else min(0.5, remaining)
+        done.wait(slice_time)
+        if remaining is not None:
+            remaining -= slice_time
+            if remaining <= 0:
+                break
+
+    if dispatcher:
+        dispatcher.stop()
+
+
+def run_engines(engines, duration=0, stop_key=None):
+    # Runs every engine on its own thread until wait_for_stop() returns or
+    # they all finish by themselves. An engine that raises stops the rest;
+    # returns what was raised.
+    done = threading.Event()
+    errors = []
+
+    def run(engine):
+        try:
+            engine.run()
+        except Exception as e:
+            errors.append(e)
+            done.set()
+
+    threads = []
+    for engine in engines:
+        thread = threading.Thread(target=run, args=(engine,), daemon=True)
+        threads.append(thread)
+
+    def watch():
+        for thread in threads:
+            thread.join()
+        done.set()
+
+    for thread in threads:
+        thread.start()
+    threading.Thread(target=watch, daemon=True).start()
+    wait_for_stop(duration, stop_key, done)
+
+    for engine in engines:
+        engine.stop()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def check_args(parser, args):
+    # Catches what would otherwise only go wrong once the engines are
+    # running, through parser.error() like argparse's own checks
+    if args.duration < 0:
+        parser.error("--duration can't be negative")
+    try:
+        if args.command == "click":
+            check_interval(args.interval)
+            check_burst(args.burst)
+        elif args.command == "type" and args.text is not None:
+            check_interval(args.interval)
+    except ValueError as e:
+        parser.error(f"--{e}")
+    if args.command == "type":
+        if args.key_delay < 0:
+            parser.error("--key-delay can't be negative")
+        if args.paste_threshold < 1:
+            parser.error("--paste-threshold must be at least 1")
+
+
+def serve_control(path, backend_name, duration=0, stop_key=None):
+    # Runs whatever the control socket's clients ask for until wait_for_stop()
+    # returns
+    from control import ControlServer, EngineController
+    controller = EngineController(lambda: create_backend(backend_name))
+    server = ControlServer(controller, path)
+    try:
+        wait_for_stop(duration, stop_key)
+    finally:
+        server.close()
+        controller.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Auto Clicker & Typer without the GUI")
+    parser.add_argument("--backend", choices=BACKEND_NAMES, default="auto", help="input backend")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = never)")
+    parser.add_argument("--stop-key", default="q", help="emergency stop key, empty to disable")
+    parser.add_argument("--daemon", action="store_true", help="detach and run in the background (POSIX only)")
+    parser.add_argument("--pidfile", help="with --daemon, write the process id here")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    click = commands.add_parser("click", help="click repeatedly wherever the cursor is, or at --x/--y")
+    click.add_argument("--interval", type=float, default=100, help="time between clicks")
+    click.add_argument("--unit", choices=["Milliseconds", "Seconds", "Minutes", CLICKS_PER_SECOND], default="Milliseconds")
+    click.add_argument("--missed", choices=MISSED_POLICIES, default=CATCH_UP, help="what to do when clicks fall behind")
+    click.add_argument("--x", type=int)
+    click.add_argument("--y", type=int)
+    click.add_argument("--button", choices=BUTTONS, default="left")
+    click.add_argument("--burst", type=int, default=1, help="clicks sent together per wakeup")
+    click.add_argument("--humanize", choices=["Normal", "Log-normal", "Uniform"],
+                       help="vary the intervals with this distribution (needs numpy)")
+    click.add_argument("--spread", type=float, default=0.2, help="with --humanize, how much intervals vary")
+    click.add_argument("--offset", type=int, default=0, help="with --humanize and --x/--y, pixels to stray")
+    click.add_argument("--seed", type=int, help="with --humanize, repeat the same sequence as another run")
+    click.add_argument("--window", help="send the clicks to this X11 window (id or part of its title); "
+                                        "--x/--y are then relative to it")
+    click.add_argument("--trace", help="without --x/--y, write a timing trace here when stopped (.csv for CSV)")
+
+    type_ = commands.add_parser("type", help="type text repeatedly, or a file once")
+    source = type_.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text")
+    source.add_argument("--file")
+    type_.add_argument("--interval", type=float, default=1, help="time between repetitions of --text")
+    type_.add_argument("--unit", choices=["Second", "Minute"], default="Second")
+    type_.add_argument("--key-delay", type=float, default=DEFAULT_KEY_DELAY * 1000, help="milliseconds between keys")
+    type_.add_argument("--no-resume", action="store_true", help="with --file, start over instead of resuming")
+    type_.add_argument("--strategy", choices=STRATEGIES, default=KEYS,
+                       help="with --text, type key by key, paste through the clipboard, or paste long text")
+    type_.add_argument("--paste-threshold", type=int, default=PASTE_THRESHOLD,
+                       help="with --strategy Auto, paste text at least this many characters long")
+    type_.add_argument("--window", help="send the keys to this X11 window (id or part of its title)")
+    type_.add_argument("--trace", help="with --text, write a timing trace here when stopped (.csv for CSV)")
+
+    run = commands.add_parser("run", help="run the jobs in a job file")
+    run.add_argument("job_file")
+
+    serve = commands.add_parser("serve", help="take start/stop/retime/status commands on a Unix socket")
+    serve.add_argument("--socket", help="socket path (default: autoclicker-<uid>.sock in the temp directory)")
+
+    analyze_ = commands.add_parser("analyze", help="report drift, jitter and stalls from a --trace file")
+    analyze_.add_argument("trace_file")
+    analyze_.add_argument("--stall-ms", type=float, default=STALL_MS, help="how late an event must be to count as a stall")
+    analyze_.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    commands.add_parser("windows", help="list the X11 windows --window and job files can send to")
+
+    args = parser.parse_args(argv)
+    if args.daemon and not hasattr(os, "fork"):
+        parser.error("--daemon needs a POSIX system")
+    check_args(parser, args)
+
+    if args.command == "analyze":
+        try:
+            report = analyze(read_trace(args.trace_file), args.stall_ms)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        print(json.dumps(report, indent=2) if args.json else format_report(report, args.stall_ms))
+        return 0
+
+    if args.command == "windows":
+        try:
+            windows = list_windows()
+        except Exception as e:
+            print(f"Error: couldn't list windows: {e}", file=sys.stderr)
+            return 1
+        for window_id, title in windows:
+            print(f"0x{window_id:08x}  {title}")
+        return 0
+
+    if args.command == "serve":
+        from control import ControlError, available
+        if not available():
+            parser.error("serve needs Unix domain sockets")
+        if args.daemon:
+            daemonize(args.pidfile)
+        try:
+            serve_control(args.socket, args.backend, args.duration, None if args.daemon else args.stop_key)
+        except (OSError, ControlError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    try:
+        if args.command == "click":
+            job = {"type": "click", "interval": args.interval, "unit": args.unit,
+                   "missed": args.missed, "button": args.button, "burst": args.burst}
+            if args.humanize:
+                job["humanize"] = {"distribution": args.humanize, "spread": args.spread,
+                                   "offset": args.offset, "seed": args.seed}
+            if args.x is not None and args.y is not None:
+                job.update(x=args.x, y=args.y)
+            if args.window:
+                job["window"] = args.window
+            engines = build_job_engines([job], args.backend)
+        elif args.command == "type":
+            if args.file:
+                job = {"type": "file", "path": args.file, "resume": not args.no_resume}
+            else:
+                job = {"type": "type", "text": args.text, "interval": args.interval, "unit": args.unit,
+                       "strategy": args.strategy, "paste_threshold": args.paste_threshold}
+            job["key_delay"] = args.key_delay
+            if args.window:
+                job["window"] = args.window
+            engines = build_job_engines([job], args.backend)
+        else:
+            engines = load_job_file(args.job_file, args.backend)
+    except (OSError, JobFileError, ValueError, ImportError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    trace_path = getattr(args, "trace", None)
+    if trace_path:
+        if not hasattr(engines[0], "trace"):
+            parser.error("--trace only works for clicking without --x/--y (or with --window) and typing --text")
+        engines[0].trace = EventTrace()
+
+    if args.daemon:
+        daemonize(args.pidfile)
+    # A daemon has no keyboard of its own to watch
+    errors = run_engines(engines, args.duration, None if args.daemon else args.stop_key)
+    for e in errors:
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+    if trace_path:
+        try:
+            write_trace(trace_path, engines[0].trace)
+        except OSError as e:
+            print(f"Error: couldn't save the trace: {e}", file=sys.stderr)
+            return 1
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+
+from backends import create_backend
+from engines import DEFAULT_KEY_DELAY, ClickEngine, TypeEngine, check_burst, check_interval
+from timing import CATCH_UP, CLICKS_PER_SECOND, MISSED_POLICIES, UNIT_SECONDS
+
+# Lets other programs on the same machine drive the clicker and typer over
+# a Unix domain socket. Each request is one line of JSON and gets one line
+# of JSON back:
+#
+#   {"cmd": "start", "job": "clicker", "interval": 50, "unit": "Milliseconds"}
+#   {"ok": true, "result": {}}
+#
+#   {"cmd": "start", "job": "clicker", "interval": 5000, "unit": "Clicks/s", "burst": 10}
+#
+#   {"cmd": "retime", "job": "typer", "text": "hi", "interval": 2}
+#   {"cmd": "stop", "job": "clicker"}        (no job stops everything)
+#   {"cmd": "status"}
+#   {"cmd": "ping"}
+#
+# Failures come back as {"ok": false, "error": "..."}. An "id" in the request
+# is copied into the response. Settings use the same names as cli.py's job
+# files; key_delay is in milliseconds.
+#
+# The server runs an asyncio loop on a background thread and hands each
+# request to a controller, which does the work: EngineController runs the
+# engines itself (cli.py serve), the GUI has its own that goes through its
+# widgets. asyncio is only imported once a server starts, it's slow to load.
+
+JOBS = ["clicker", "typer"]
+
+# Longest request line, a long text for the typer has to fit
+MAX_LINE = 1024 * 1024
+
+
+class ControlError(Exception):
+    pass
+
+
+def default_socket_path():
+    user = os.getuid() if hasattr(os, "getuid") else os.getpid()
+    return os.path.join(tempfile.gettempdir(), f"autoclicker-{user}.sock")
+
+
+def available():
+    # No Unix sockets on Windows
+    return hasattr(socket, "AF_UNIX")
+
+
+def _is_number(value):
+    # JSON true/false come through as bools, which are ints to Python
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def engine_settings(job, request):
+    # The request's settings as keyword arguments for the job's engine, for
+    # either starting it or reconfigure(). Missing ones come back as None.
+    interval = request.get("interval")
+    if interval is not None:
+        try:
+            check_interval(interval)
+        except ValueError as e:
+            raise ControlError(str(e))
+    unit = request.get("unit")
+    units = list(UNIT_SECONDS) + [CLICKS_PER_SECOND]
+    if unit is not None and unit not in units:
+        raise ControlError(f"unit must be one of {', '.join(units)}")
+
+    if job == "clicker":
+        missed = request.get("missed")
+        if missed is not None and missed not in MISSED_POLICIES:
+            raise ControlError(f"missed must be one of {', '.join(MISSED_POLICIES)}")
+        burst = request.get("burst")
+        if burst is not None:
+            try:
+                check_burst(burst)
+            except ValueError as e:
+                raise ControlError(str(e))
+        return {"interval": interval, "time_unit": unit, "missed_policy": missed, "burst": burst}
+
+    text = request.get("text")
+    if text is not None and not isinstance(text, str):
+        raise ControlError("text must be a string")
+    duration = request.get("duration")
+    if duration is not None and (not _is_number(duration) or duration < 0):
+        raise ControlError("duration must be a number of seconds, 0 or more")
+    key_delay = request.get("key_delay")
+    if key_delay is not None and (not _is_number(key_delay) or key_delay < 0):
+        raise ControlError("key_delay must be a number of milliseconds, 0 or more")
+    return {
+        "interval": interval,
+        "time_unit": unit,
+        "text_to_type": text,
+        "duration": duration,
+        "key_delay": None if key_delay is None else key_delay / 1000,
+    }
+
+
+class Controller:
+    # Turns requests into calls to start(), stop(), retime() and status(),
+    # which subclasses provide. Raise ControlError for anything the client
+    # got wrong.
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        if cmd == "ping":
+            return {}
+        if cmd == "status":
+            return self.status()
+
+        job = request.get("job")
+        if cmd == "stop":
+            for name in ([job] if job else JOBS):
+                self._check_job(name)
+                self.stop(name)
+            return {}
+        self._check_job(job)
+        if cmd == "start":
+            self.start(job, engine_settings(job, request))
+        elif cmd == "retime":
+            self.retime(job, engine_settings(job, request))
+        else:
+            raise ControlError(f"Unknown command {cmd!r}")
+        return {}
+
+    @staticmethod
+    def _check_job(job):
+        if job not in JOBS:
+            raise ControlError(f"job must be one of {', '.join(JOBS)}")
+
+
+class EngineController(Controller):
+    # Runs the engines on plain threads, for when there's no GUI
+    def __init__(self, backend_factory=create_backend):
+        self.backend_factory = backend_factory
+        self._running = {}  # job -> (engine, thread)
+        self._lock = threading.Lock()
+
+    def _build(self, job, settings):
+        backend = self.backend_factory()
+        if job == "clicker":
+            return ClickEngine(
+                backend,
+                settings["interval"] or 100,
+                settings["time_unit"] or "Milliseconds",
+                settings["missed_policy"] or CATCH_UP,
+                burst=settings["burst"] or 1
+            )
+        if not settings["text_to_type"]:
+            backend.close()
+            raise ControlError("the typer needs some text")
+        return TypeEngine(
+            backend,
+            settings["interval"] or 1,
+            settings["time_unit"] or "Second",
+            settings["text_to_type"],
+            settings["duration"] or 0,
+            DEFAULT_KEY_DELAY if settings["key_delay"] is None else settings["key_delay"]
+        )
+
+    def _engine(self, job):
+        engine, thread = self._running.get(job, (None, None))
+        return engine if thread and thread.is_alive() else None
+
+    def start(self, job, settings):
+        with self._lock:
+            if self._engine(job):
+                raise ControlError(f"the {job} is already running")
+            engine = self._build(job, settings)
+            thread = threading.Thread(target=engine.run, daemon=True)
+            self._running[job] = (engine, thread)
+            thread.start()
+
+    def stop(self, job):
+        with self._lock:
+            engine, thread = self._running.pop(job, (None, None))
+        if engine:
+            engine.stop()
+            thread.join()
+
+    def retime(self, job, settings):
+        with self._lock:
+            engine = self._engine(job)
+        if not engine:
+            raise ControlError(f"the {job} isn't running")
+        engine.reconfigure(**settings)
+
+    def status(self):
+        with self._lock:
+            status = {}
+            for job in JOBS:
+                engine = self._engine(job)
+                status[job] = {"running": engine is not None}
+                if engine:
+                    status[job].update(
+                        interval=engine.interval,
+                        unit=engine.time_unit,
+                        events_sent=engine.metrics.events_sent,
+                    )
+            return status
+
+    def engines(self):
+        with self._lock:
+            return [engine for engine, thread in self._running.values()]
+
+    def close(self):
+        for job in JOBS:
+            self.stop(job)
+
+
+class ControlServer:
+    # Listens on path until close(). Clients are served concurrently; the
+    # controller is called from a small thread pool so a slow command (the
+    # GUI waiting on its own thread) doesn't hold up everyone else.
+    def __init__(self, controller, path=None, workers=4):
+        if not available():
+            raise ControlError("Unix domain sockets aren't available on this system")
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self.asyncio = asyncio
+        self.controller = controller
+        self.path = path or default_socket_path()
+        self._remove_stale_socket()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="control")
+        self._loop = asyncio.new_event_loop()
+        self._clients = set()
+        self._server = None
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            self._thread.join()
+            self._executor.shutdown()
+            raise self._error
+
+    def _remove_stale_socket(self):
+        # Left behind by a run that didn't get to clean up
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+        else:
+            raise ControlError(f"Something is already listening on {self.path}")
+        finally:
+            probe.close()
+
+    def _serve(self):
+        asyncio = self.asyncio
+        asyncio.set_event_loop(self._loop)
+        try:
+            # Only this user may connect
+            old_umask = os.umask(0o177)
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_unix_server(self._client, path=self.path, limit=MAX_LINE)
+                )
+            finally:
+                os.umask(old_umask)
+        except Exception as e:
+            self._error = e
+            self._loop.close()
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def _respond(self, line):
+        response = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ControlError("a request must be a JSON object")
+            if "id" in request:
+                response["id"] = request["id"]
+            response["result"] = self.controller.handle(request)
+            response["ok"] = True
+        except ControlError as e:
+            response.update(ok=False, error=str(e))
+        except ValueError as e:
+            response.update(ok=False, error=f"not valid JSON: {e}")
+        except Exception as e:
+            response.update(ok=False, error=f"{type(e).__name__}: {e}")
+        return json.dumps(response).encode('utf-8') + b'\n'
+
+    async def _client(self, reader, writer):
+        task = self.asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than MAX_LINE
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                response = await self._loop.run_in_executor(self._executor, self._respond, line)
+                writer.write(response)
+                await writer.drain()
+        except (ConnectionError, self.asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    async def _shutdown(self):
+        self._server.close()
+        clients = list(self._clients)
+        for task in clients:
+            task.cancel()
+        await self.asyncio.gather(*clients, return_exceptions=True)
+        self._loop.stop()
+
+    def close(self):
+        self.asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        self._thread.join()
+        # Not waiting: a request that's waiting on the GUI thread would never
+        # finish if close() is called from that thread
+        self._executor.shutdown(wait=False)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class ControlClient:
+    # Blocking client, one request at a time
+    #
+    #   with ControlClient() as client:
+    #       client.request("start", job="clicker", interval=20)
+    #       print(client.request("status"))
+    def __init__(self, path=None, timeout=10):
+        self.path = path or default_socket_path()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(self.path)
+        self._file = self._sock.makefile('rb')
+
+    def request(self, cmd, **settings):
+        # Returns the result, raises ControlError if the server said no
+        settings["cmd"] = cmd
+        self._sock.sendall(json.dumps(settings).encode('utf-8') + b'\n')
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("the control server closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise ControlError(response.get("error", "unknown error"))
+        return response.get("result")
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
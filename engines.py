@@ -0,0 +1,590 @@
+import heapq
+import itertools
+import math
+import os
+import queue
+import threading
+
+from keyplan import compile_plan, compile_text, play_plan
+from paste import KEYS, PASTE, PASTE_THRESHOLD, PasteUnavailable, paste_text, system_clipboard, use_paste
+from telemetry import EngineMetrics
+from textstream import Checkpoints, read_lines, typeable
+from timing import DeadlineScheduler, CATCH_UP, REAL_CLOCK, interval_to_seconds
+
+# The clicker and typer loops, without any Qt. The GUI threads, the
+# benchmarks and anything else that wants to click or type wraps one of
+# these. Progress is reported through plain callbacks.
+
+
+def _ignore(*args):
+    pass
+
+
+def check_interval(interval):
+    # Raises ValueError unless interval is a positive, finite number. Zero,
+    # negative or infinite ones (infinite clicks a second is no time at
+    # all) would have the engine click as fast as the backend allows.
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)) \
+            or not (interval > 0 and math.isfinite(interval)):
+        raise ValueError(f"interval must be a positive number, not {interval!r}")
+
+
+def check_burst(burst):
+    if isinstance(burst, bool) or not isinstance(burst, int) or burst < 1:
+        raise ValueError(f"burst must be a whole number of at least 1, not {burst!r}")
+
+
+def check_settings(engine_class, settings):
+    # Raises ValueError for any setting the engine can't change while
+    # running, or a value it won't take
+    unknown = sorted(set(settings) - set(engine_class.RECONFIGURABLE))
+    if unknown:
+        raise ValueError(f"{engine_class.__name__} can't reconfigure {', '.join(unknown)}")
+    engine_class.check_values(settings)
+
+
+class Reconfigurable:
+    # Lets another thread change a running engine's settings. Changes go
+    # through a queue and wake the engine, which applies them before its
+    # next event; the engine keeps running, nothing restarts.
+    #
+    # wake is set by stop() and by reconfigure(); stopped only by stop().
+    # Only the settings named in RECONFIGURABLE can be changed; anything
+    # else is refused before it gets near the engine's thread.
+    RECONFIGURABLE = ()
+
+    @staticmethod
+    def check_values(settings):
+        # Raises ValueError for a setting the engine can't run with; None
+        # means leave it as it is
+        pass
+
+    def _init_commands(self):
+        self._commands = queue.SimpleQueue()
+        self.running = True
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+
+    def reconfigure(self, **settings):
+        check_settings(type(self), settings)
+        self._commands.put(settings)
+        self.wake.set()
+
+    def _apply_commands(self):
+        # Returns True if any setting changed
+        self.wake.clear()
+        changed = False
+        while True:
+            try:
+                settings = self._commands.get_nowait()
+            except queue.Empty:
+                return changed
+            for name, value in settings.items():
+                if value is not None and name in self.RECONFIGURABLE:
+                    setattr(self, name, value)
+                    changed = True
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+        self.wake.set()
+
+
+class ClickEngine(Reconfigurable):
+    # reconfigure() takes interval, time_unit, missed_policy and burst
+    #
+    # With burst above 1, each wakeup sends that many clicks in one batch
+    # and wakeups come burst times further apart, so interval/time_unit
+    # still set the overall rate.
+    #
+    # humanize is a humanize.HumanSchedule that varies each interval. There
+    # is no target position, so its offsets aren't used.
+    #
+    # trace is an eventtrace.EventTrace to record every wakeup in. clock is
+    # a timing.VirtualClock to simulate with, see timing.simulate().
+
+    RECONFIGURABLE = ("interval", "time_unit", "missed_policy", "burst")
+
+    @staticmethod
+    def check_values(settings):
+        if settings.get("interval") is not None:
+            check_interval(settings["interval"])
+        if settings.get("burst") is not None:
+            check_burst(settings["burst"])
+
+    def __init__(self, backend, interval, time_unit, missed_policy=CATCH_UP,
+                 countdown=0, on_countdown=None, on_stats=None, burst=1, humanize=None, trace=None,
+                 clock=REAL_CLOCK):
+        check_interval(interval)
+        check_burst(burst)
+        self.backend = backend
+        self.interval = interval
+        self.time_unit = time_unit
+        self.missed_policy = missed_policy
+        self.burst = burst
+        self.humanize = humanize
+        self.trace = trace
+        self.clock = clock
+        self.feed = None
+        self.countdown = countdown
+        self.on_countdown = on_countdown or _ignore
+        self.on_stats = on_stats or _ignore  # achieved clicks/s, jitter in ms, missed clicks
+        self.metrics = EngineMetrics("clicker")
+        self.scheduler = None
+        self._init_commands()
+
+    def run(self):
+        try:
+            self.click_loop()
+        finally:
+            if self.feed:
+                self.feed.close()
+            self.backend.close()
+
+    def click_loop(self):
+        # Countdown before the first click
+        for i in range(self.countdown, 0, -1):
+            if not self.running:
+                return
+            self.on_countdown(i)
+            self.clock.wait(self.stopped, 1)
+        if not self.running:
+            return
+        self._apply_commands()
+
+        # Clicks are scheduled against absolute deadlines so the time spent
+        # clicking doesn't stretch the interval
+        self.scheduler = scheduler = DeadlineScheduler(self.period(), self.missed_policy, clock=self.clock)
+
+        # Signal that countdown is done
+        self.on_countdown(0)
+
+        factors = None
+        if self.humanize:
+            self.feed = self.humanize.feed()
+            factors = self.feed.take()[0]
+            index = 0
+
+        click = self.backend.click
+        click_batch = self.backend.click_batch
+        burst = self.burst
+        metrics = self.metrics
+        trace = self.trace
+        clock = self.clock.now_ns
+        next_report = scheduler.start() + 1_000_000_000
+        while self.running:
+            if not scheduler.wait(self.wake):
+                if not self.running:
+                    break
+                if self._apply_commands():
+                    burst = self.burst
+                    scheduler.policy = self.missed_policy
+                    scheduler.retime(self.period())
+                continue
+            start = clock()
+            if burst > 1:
+                click_batch(burst)
+            else:
+                click()
+            now = clock()
+            metrics.record(start, now, burst)
+            if trace is not None:
+                trace.record(scheduler.deadline, start, now)
+            if factors is None:
+                scheduler.mark(now)
+            else:
+                if index == len(factors):
+                    factors = self.feed.take()[0]
+                    index = 0
+                scheduler.mark(now, int(scheduler.period_ns * factors[index]))
+                index += 1
+            metrics.missed_deadlines = scheduler.missed * burst
+            # Report roughly once a second, not on every click
+            if now >= next_report:
+                self.on_stats(scheduler.achieved_rate() * burst, scheduler.jitter_ms(), scheduler.missed * burst)
+                next_report = now + 1_000_000_000
+
+    def period(self):
+        # Time between wakeups
+        return interval_to_seconds(self.interval, self.time_unit) * self.burst
+
+
+# What the typer always waited between keys
+DEFAULT_KEY_DELAY = 0.05
+
+
+class TypeEngine(Reconfigurable):
+    # reconfigure() takes interval, time_unit, text_to_type, duration,
+    # key_delay, strategy and paste_threshold; they apply from the next
+    # repetition of the text. trace is an eventtrace.EventTrace to record
+    # every key in, clock a timing.VirtualClock to simulate with.
+    #
+    # strategy is paste.KEYS to type key by key, paste.PASTE to paste the
+    # text through the clipboard, or paste.AUTO to paste text at least
+    # paste_threshold characters long. If the clipboard can't be used the
+    # rest of the run types instead. clipboard is anything with pyperclip's
+    # copy() and paste(), pyperclip itself by default.
+
+    RECONFIGURABLE = ("interval", "time_unit", "text_to_type", "duration", "key_delay",
+                      "strategy", "paste_threshold")
+
+    def __init__(self, backend, interval, time_unit, text_to_type, duration,
+                 key_delay=DEFAULT_KEY_DELAY, on_finished=None, trace=None, clock=REAL_CLOCK,
+                 strategy=KEYS, paste_threshold=PASTE_THRESHOLD, clipboard=None, on_throughput=None):
+        self.backend = backend
+        self.interval = interval
+        self.time_unit = time_unit
+        self.text_to_type = text_to_type
+        self.duration = duration
+        self.key_delay = key_delay
+        self.strategy = strategy
+        self.paste_threshold = paste_threshold
+        self.clipboard = clipboard
+        # Why pasting was given up on, once it has been
+        self.paste_error = None
+        # Called when the duration runs out, not when stopped
+        self.on_finished = on_finished or _ignore
+        # Called after each repetition with the strategy it used and that
+        # strategy's characters a second over the whole run so far
+        self.on_throughput = on_throughput or _ignore
+        self.trace = trace
+        self.clock = clock
+        self.metrics = EngineMetrics("typer")
+        # strategy -> [characters, nanoseconds]
+        self.typed = {KEYS: [0, 0], PASTE: [0, 0]}
+        self._init_commands()
+
+    def chars_per_second(self, strategy):
+        chars, elapsed_ns = self.typed[strategy]
+        return chars * 1_000_000_000 / elapsed_ns if elapsed_ns else 0.0
+
+    def run(self):
+        try:
+            self.type_loop()
+        finally:
+            self.backend.close()
+
+    def type_loop(self):
+        clock = self.clock
+        start_time = clock.now_ns()
+        next_time = start_time
+
+        while self.running:
+            self._apply_commands()
+            # Check duration if set
+            now = clock.now_ns()
+            end_time = start_time + int(self.duration * 1_000_000_000) if self.duration > 0 else None
+            if end_time is not None and now >= end_time:
+                self.running = False
+                self.on_finished()
+                break
+
+            # Changes wake the wait below but never cut a repetition short.
+            # The duration running out does, so a long interval doesn't
+            # keep us going past it.
+            if now < next_time:
+                wait_end = next_time if end_time is None else min(next_time, end_time)
+                clock.wait(self.wake, (wait_end - now) / 1_000_000_000)
+                continue
+
+            if not self.type_text(self.text_to_type):
+                return
+            next_time = clock.now_ns() + int(interval_to_seconds(self.interval, self.time_unit) * 1_000_000_000)
+
+    def type_text(self, text):
+        # One repetition, by whichever strategy applies. Stops between keys
+        # or pastes, not just between repetitions; returns False if it did.
+        strategy = KEYS
+        if self.paste_error is None and use_paste(self.strategy, text, self.paste_threshold):
+            strategy = PASTE
+        sent = self.metrics.events_sent
+        start = self.clock.now_ns()
+        if strategy == PASTE:
+            try:
+                done = paste_text(
+                    text, self.backend, self.clipboard or system_clipboard(), self.stopped,
+                    self.metrics, self.trace, self.clock
+                )
+            except PasteUnavailable as e:
+                self.paste_error = str(e)
+                self._measure(PASTE, sent, start)
+                # Whatever didn't get pasted gets typed
+                text = text[e.typed:]
+                strategy = KEYS
+                sent = self.metrics.events_sent
+                start = self.clock.now_ns()
+        if strategy == KEYS:
+            plan = compile_plan(text)
+            done = play_plan(plan, self.backend, self.key_delay, self.stopped, self.metrics, self.trace, self.clock)
+        self._measure(strategy, sent, start)
+        if done:
+            self.on_throughput(strategy, self.chars_per_second(strategy))
+        return done
+
+    def _measure(self, strategy, sent, start):
+        # Every character typed counts as one event in the metrics
+        typed = self.typed[strategy]
+        typed[0] += self.metrics.events_sent - sent
+        typed[1] += self.clock.now_ns() - start
+
+
+class StreamTypeEngine:
+    # Types a whole file once, line by line, reading it lazily. Progress is
+    # reported as (bytes done, total bytes, lines done) at most every
+    # progress_interval seconds, and a checkpoint is saved about once a
+    # second and when stopped so the next run can resume. clock is a
+    # timing.VirtualClock to simulate with.
+
+    def __init__(self, backend, source, key_delay=DEFAULT_KEY_DELAY, resume=True,
+                 checkpoints=None, progress_interval=0.1, on_progress=None, on_finished=None,
+                 clock=REAL_CLOCK):
+        self.backend = backend
+        self.clock = clock
+        self.source = source
+        self.key_delay = key_delay
+        self.resume = resume
+        self.checkpoints = checkpoints or Checkpoints()
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress or _ignore
+        # Called when the whole file has been typed, not when stopped
+        self.on_finished = on_finished or _ignore
+        self.metrics = EngineMetrics("stream")
+        self.offset = 0
+        self.lines = 0
+        self.running = True
+        # Set by stop() to cut any wait short
+        self.wake = threading.Event()
+
+    def run(self):
+        try:
+            self.stream_loop()
+        finally:
+            self.backend.close()
+
+    def stream_loop(self):
+        total = os.path.getsize(self.source)
+        if self.resume:
+            self.offset, self.lines = self.checkpoints.get(self.source)
+        self.on_progress(self.offset, total, self.lines)
+
+        now_ns = self.clock.now_ns
+        progress_ns = int(self.progress_interval * 1_000_000_000)
+        next_progress = next_checkpoint = now_ns()
+        for line, size in read_lines(self.source, self.offset):
+            if not play_plan(compile_text(typeable(line)), self.backend, self.key_delay, self.wake, self.metrics,
+                             clock=self.clock):
+                # Stopped part way through the line; it gets typed again
+                # from the start next time
+                self.checkpoints.save(self.source, self.offset, self.lines)
+                return
+            self.offset += size
+            if line.endswith('\n'):
+                self.lines += 1
+
+            now = now_ns()
+            if now >= next_progress:
+                self.on_progress(self.offset, total, self.lines)
+                next_progress = now + progress_ns
+            if now >= next_checkpoint:
+                self.checkpoints.save(self.source, self.offset, self.lines)
+                next_checkpoint = now + 1_000_000_000
+
+        self.on_progress(self.offset, total, self.lines)
+        self.checkpoints.clear(self.source)
+        self.running = False
+        self.on_finished()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+
+class ClickJob:
+    def __init__(self, job_id, x, y, interval, button="left", feed=None):
+        self.id = job_id
+        self.x = x
+        self.y = y
+        self.button = button
+        # A humanize.ScheduleFeed, and the block of it being used up
+        self.feed = feed
+        self.block = ([], [], [])
+        self.index = 0
+        self.period_ns = max(1, int(interval * 1_000_000_000))
+        self.deadline = 0
+        # Bumped on every retime so stale heap entries can be told apart
+        self.generation = 0
+        self.clicks = 0
+        self.missed = 0
+
+    @property
+    def interval(self):
+        return self.period_ns / 1_000_000_000
+
+    def humanized(self):
+        # The next (interval factor, x offset, y offset) from the feed
+        if self.index == len(self.block[0]):
+            self.block = self.feed.take()
+            self.index = 0
+        i = self.index
+        self.index += 1
+        factors, dxs, dys = self.block
+        return factors[i], dxs[i], dys[i]
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "x": self.x,
+            "y": self.y,
+            "interval": self.interval,
+            "button": self.button,
+            "clicks": self.clicks,
+            "missed": self.missed,
+        }
+
+
+class JobEngine:
+    # Runs any number of click jobs, each with its own position, rate and
+    # button, on one thread. Deadlines sit in a heap; the thread waits for
+    # the earliest one, clicks, and pushes the job back with its next
+    # deadline. Jobs can be added, removed and retimed from any thread while
+    # it runs. Deadlines that have already passed are skipped, not caught up.
+    # A job given a humanize.HumanSchedule gets varied intervals and lands
+    # within its offset of x/y. clock is a timing.VirtualClock to simulate
+    # with.
+
+    def __init__(self, backend, clock=REAL_CLOCK):
+        self.backend = backend
+        self.clock = clock
+        self._jobs = {}
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.metrics = EngineMetrics("jobs")
+        self.running = True
+        # Set once run() has started; feeds of jobs added before that are
+        # started then, after any fork
+        self._started = False
+        # Set whenever the earliest deadline may have changed, and by stop()
+        self.wake = threading.Event()
+
+    def add_job(self, x, y, interval, button="left", humanize=None):
+        check_interval(interval)
+        with self._lock:
+            job_id = next(self._ids)
+            feed = humanize.feed(stream=job_id) if humanize else None
+            if feed and self._started:
+                feed.start()
+            job = ClickJob(job_id, x, y, interval, button, feed)
+            job.deadline = self.clock.now_ns()
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.deadline, job.id, job.generation))
+        self.wake.set()
+        return job.id
+
+    def remove_job(self, job_id):
+        # Its heap entry is dropped when it comes up
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job and job.feed:
+            job.feed.close()
+        self.wake.set()
+        return job is not None
+
+    def retime_job(self, job_id, interval):
+        check_interval(interval)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            previous = job.deadline - job.period_ns
+            job.period_ns = max(1, int(interval * 1_000_000_000))
+            job.generation += 1
+            # The new rate counts from the last click, not from now
+            job.deadline = max(previous + job.period_ns, self.clock.now_ns()) if job.clicks else job.deadline
+            heapq.heappush(self._heap, (job.deadline, job.id, job.generation))
+        self.wake.set()
+        return True
+
+    def jobs(self):
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    def _next_entry(self):
+        # Earliest heap entry that still belongs to a live job
+        heap = self._heap
+        while heap:
+            deadline, job_id, generation = heap[0]
+            job = self._jobs.get(job_id)
+            if job is not None and job.generation == generation:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def run(self):
+        with self._lock:
+            self._started = True
+            for job in self._jobs.values():
+                if job.feed:
+                    job.feed.start()
+        try:
+            self.job_loop()
+        finally:
+            with self._lock:
+                for job in self._jobs.values():
+                    if job.feed:
+                        job.feed.close()
+            self.backend.close()
+
+    def job_loop(self):
+        click = self.backend.click
+        metrics = self.metrics
+        clock = self.clock.now_ns
+        wait_until = self.clock.wait_until
+        while self.running:
+            with self._lock:
+                entry = self._next_entry()
+            if entry is None:
+                # Looks again every second even if nothing changed; a
+                # virtual clock needs a wait with an end to move on
+                self.clock.wait(self.wake, 1)
+                self.wake.clear()
+                continue
+            if not wait_until(entry[0], self.wake):
+                # Stopped, or the jobs changed; look again
+                self.wake.clear()
+                continue
+
+            with self._lock:
+                if self._next_entry() is not entry:
+                    continue
+                heapq.heappop(self._heap)
+                job = self._jobs[entry[1]]
+                x, y, button = job.x, job.y, job.button
+                factor = 1
+                if job.feed:
+                    factor, dx, dy = job.humanized()
+                    x = max(0, x + dx)
+                    y = max(0, y + dy)
+
+            start = clock()
+            click(x, y, button)
+            now = clock()
+            metrics.record(start, now)
+
+            with self._lock:
+                if job.generation != entry[2]:
+                    continue
+                job.clicks += 1
+                period_ns = int(job.period_ns * factor)
+                job.deadline += period_ns
+                behind = now - job.deadline
+                if behind >= 0:
+                    missed = behind // period_ns + 1
+                    job.missed += missed
+                    metrics.missed_deadlines += missed
+                    job.deadline += missed * period_ns
+                heapq.heappush(self._heap, (job.deadline, job.id, job.generation))
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
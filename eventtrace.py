@@ -0,0 +1,307 @@
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# A record of when every event was meant to go out and when it did, for
+# working out afterwards why a run misbehaved.
+#
+# An EventTrace keeps the last `size` events in preallocated arrays: the
+# deadline, the time the backend call started and how long it took, all in
+# perf_counter_ns. Recording just stores three numbers, nothing grows. A
+# MarkTrace is the same idea for things happening elsewhere, mostly the
+# GUI's heartbeat: a timer that marks every HEARTBEAT_MS, so a gap between
+# heartbeats is a stretch where the GUI thread was busy.
+#
+# write_trace() saves both to a compact binary file, or CSV if the name
+# ends in .csv; analyze() reads one back and reports drift, the jitter
+# distribution and stalls, with whatever the GUI was doing at the time:
+#
+#   python cli.py analyze ~/.autoclicker/traces/clicker-20240101-120000.trace
+
+DEFAULT_EVENTS = 65536
+DEFAULT_MARKS = 65536
+
+HEARTBEAT = "heartbeat"
+HEARTBEAT_MS = 20
+
+# An event this late counts towards a stall
+STALL_MS = 5.0
+
+# Bucket upper bounds for the jitter distribution, in milliseconds
+JITTER_BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+MAGIC = b"ACTRACE1"
+# magic, events kept, events recorded in all, marks kept, length of the labels JSON
+HEADER = struct.Struct("<8sQQQQ")
+
+
+def _ring(typecode, size):
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+
+def _ordered(column, count, size):
+    # A ring's contents, oldest first
+    if count <= size:
+        return column[:count]
+    start = count % size
+    return column[start:] + column[:start]
+
+
+class EventTrace:
+    def __init__(self, size=DEFAULT_EVENTS):
+        self.size = size
+        self.deadlines = _ring('q', size)
+        self.sent = _ring('q', size)
+        self.durations = _ring('q', size)
+        self.count = 0
+
+    def record(self, deadline_ns, start_ns, end_ns):
+        index = self.count % self.size
+        self.deadlines[index] = deadline_ns
+        self.sent[index] = start_ns
+        self.durations[index] = end_ns - start_ns
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def columns(self):
+        # (deadlines, sent, durations) arrays, oldest first
+        return tuple(_ordered(column, self.count, self.size) for column in (self.deadlines, self.sent, self.durations))
+
+
+class MarkTrace:
+    # Written from one thread (the GUI's) while another may be saving it;
+    # a save can catch the newest mark half written, nothing worse
+    def __init__(self, size=DEFAULT_MARKS):
+        self.size = size
+        self.times = _ring('q', size)
+        self.codes = _ring('H', size)
+        self.labels = []
+        self._codes = {}
+        self.count = 0
+
+    def mark(self, label, now_ns=None):
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self.labels)
+            self.labels.append(label)
+        index = self.count % self.size
+        self.times[index] = time.perf_counter_ns() if now_ns is None else now_ns
+        self.codes[index] = code
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def columns(self):
+        # (times, codes) arrays, oldest first
+        return tuple(_ordered(column, self.count, self.size) for column in (self.times, self.codes))
+
+
+class TraceData:
+    # A trace as read back from a file
+    def __init__(self, deadlines, sent, durations, recorded, mark_times, mark_labels):
+        self.deadlines = deadlines
+        self.sent = sent
+        self.durations = durations
+        self.recorded = recorded       # events recorded, including ones the ring lost
+        self.mark_times = mark_times
+        self.mark_labels = mark_labels
+
+
+def _little_endian(column):
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def write_trace(path, trace, marks=None):
+    # Written to a temporary file and renamed, like the settings
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    events = trace.columns()
+    mark_columns = marks.columns() if marks else (array('q'), array('H'))
+    labels = list(marks.labels) if marks else []
+    tmp_path = path + '.tmp'
+    if path.endswith('.csv'):
+        with open(tmp_path, 'w') as f:
+            f.write("kind,deadline_ns,sent_ns,duration_ns,label\n")
+            for deadline, sent, duration in zip(*events):
+                f.write(f"event,{deadline},{sent},{duration},\n")
+            for at, code in zip(*mark_columns):
+                f.write(f"mark,,{at},,{labels[code]}\n")
+            # Events the ring had already lost, so the analysis can say so
+            f.write(f"recorded,,,,{trace.count}\n")
+    else:
+        label_bytes = json.dumps(labels).encode('utf-8')
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(events[0]), trace.count, len(mark_columns[0]), len(label_bytes)))
+            f.write(label_bytes)
+            for column in events + mark_columns:
+                _little_endian(column).tofile(f)
+    os.replace(tmp_path, path)
+
+
+def read_trace(path):
+    with open(path, 'rb') as f:
+        head = f.read(len(MAGIC))
+        if head != MAGIC:
+            return _read_csv(path)
+        f.seek(0)
+        _, count, recorded, mark_count, label_length = HEADER.unpack(f.read(HEADER.size))
+        labels = json.loads(f.read(label_length).decode('utf-8'))
+        columns = []
+        for typecode, length in (('q', count), ('q', count), ('q', count), ('q', mark_count), ('H', mark_count)):
+            column = array(typecode)
+            column.fromfile(f, length)
+            columns.append(_little_endian(column))
+    deadlines, sent, durations, mark_times, codes = columns
+    return TraceData(deadlines, sent, durations, recorded, mark_times, [labels[code] for code in codes])
+
+
+def _read_csv(path):
+    deadlines, sent, durations = array('q'), array('q'), array('q')
+    mark_times, mark_labels = array('q'), []
+    recorded = None
+    with open(path, 'r') as f:
+        if not f.readline().startswith("kind,"):
+            raise ValueError(f"{path} isn't an event trace")
+        for line in f:
+            kind, deadline, at, duration, label = line.rstrip('\n').split(',', 4)
+            if kind == "event":
+                deadlines.append(int(deadline))
+                sent.append(int(at))
+                durations.append(int(duration))
+            elif kind == "mark":
+                mark_times.append(int(at))
+                mark_labels.append(label)
+            elif kind == "recorded":
+                recorded = int(label)
+    return TraceData(deadlines, sent, durations, len(sent) if recorded is None else recorded, mark_times, mark_labels)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def _heartbeat_gap(heartbeats, start_ns, end_ns):
+    # Longest gap between heartbeats overlapping start_ns..end_ns, in ns
+    first = max(0, bisect_right(heartbeats, start_ns) - 1)
+    last = min(len(heartbeats) - 1, bisect_left(heartbeats, end_ns))
+    return max((b - a for a, b in zip(heartbeats[first:last], heartbeats[first + 1:last + 1])), default=0)
+
+
+def analyze(data, stall_ms=STALL_MS):
+    # The report as a dict; times are in milliseconds, and seconds from the
+    # first event for where stalls happened
+    deadlines, sent, durations = data.deadlines, data.sent, data.durations
+    n = len(sent)
+    report = {"events": n, "lost": data.recorded - n}
+    if n < 2:
+        return report
+    origin = sent[0]
+    lateness = [(s - d) / 1_000_000 for s, d in zip(sent, deadlines)]
+
+    # Drift: the trend in lateness over the run, by least squares
+    times = [(s - origin) / 1_000_000_000 for s in sent]
+    mean_t = sum(times) / n
+    mean_l = sum(lateness) / n
+    spread = sum((t - mean_t) ** 2 for t in times)
+    slope = sum((t - mean_t) * (l - mean_l) for t, l in zip(times, lateness)) / spread if spread else 0.0
+    report.update(
+        span_s=times[-1],
+        events_per_s=(n - 1) / times[-1] if times[-1] else 0.0,
+        drift_ms_per_min=slope * 60,
+        lateness_first_ms=lateness[0],
+        lateness_last_ms=lateness[-1],
+    )
+    ordered = sorted(lateness)
+    report["lateness_ms"] = {q: _percentile(ordered, f) for q, f in (("p50", 0.5), ("p99", 0.99), ("max", 1.0))}
+
+    # Jitter: how far each gap between sends was from the gap between their
+    # deadlines
+    jitter = sorted(abs((b - a) - (db - da)) / 1_000_000
+                    for a, b, da, db in zip(sent, sent[1:], deadlines, deadlines[1:]))
+    report["jitter_ms"] = {q: _percentile(jitter, f)
+                           for q, f in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p99.9", 0.999), ("max", 1.0))}
+    buckets = [0] * (len(JITTER_BUCKETS_MS) + 1)
+    for value in jitter:
+        buckets[bisect_left(JITTER_BUCKETS_MS, value)] += 1
+    report["jitter_buckets"] = buckets
+    ordered = sorted(d / 1_000_000 for d in durations)
+    report["backend_ms"] = {q: _percentile(ordered, f) for q, f in (("p50", 0.5), ("p99", 0.99), ("max", 1.0))}
+
+    # Stalls: runs of events later than stall_ms, with the longest the GUI
+    # went without a heartbeat around then and any other marks nearby
+    heartbeats = [at for at, label in zip(data.mark_times, data.mark_labels) if label == HEARTBEAT]
+    others = [(at, label) for at, label in zip(data.mark_times, data.mark_labels) if label != HEARTBEAT]
+    stalls = []
+    i = 0
+    while i < n:
+        if lateness[i] <= stall_ms:
+            i += 1
+            continue
+        j = i
+        while j + 1 < n and lateness[j + 1] > stall_ms:
+            j += 1
+        start_ns, end_ns = deadlines[i], sent[j]
+        stall = {
+            "at_s": (start_ns - origin) / 1_000_000_000,
+            "events": j - i + 1,
+            "worst_ms": max(lateness[i:j + 1]),
+        }
+        if heartbeats:
+            stall["gui_gap_ms"] = _heartbeat_gap(heartbeats, start_ns, end_ns) / 1_000_000
+        nearby = sorted({label for at, label in others if start_ns - stall_ms * 1_000_000 <= at <= end_ns})
+        if nearby:
+            stall["gui_marks"] = nearby
+        stalls.append(stall)
+        i = j + 1
+    report["stalls"] = stalls
+    if heartbeats:
+        # The GUI counts as busy if it missed at least one heartbeat
+        busy = [s for s in stalls if s["gui_gap_ms"] >= 2 * HEARTBEAT_MS]
+        report["stalls_with_gui_busy"] = len(busy)
+    return report
+
+
+def format_report(report, stall_ms=STALL_MS, max_stalls=20):
+    lines = [f"{report['events']} events" + (f", {report['lost']} older ones lost" if report['lost'] else "")]
+    if report['events'] < 2:
+        return '\n'.join(lines)
+    lines[0] += f" over {report['span_s']:.3f} s ({report['events_per_s']:.1f}/s)"
+    late = report["lateness_ms"]
+    lines.append(f"drift {report['drift_ms_per_min']:+.3f} ms/min, late by {report['lateness_first_ms']:.3f} ms "
+                 f"at the start and {report['lateness_last_ms']:.3f} ms at the end")
+    lines.append(f"lateness  p50 {late['p50']:.3f}  p99 {late['p99']:.3f}  max {late['max']:.3f} ms")
+    jitter = report["jitter_ms"]
+    lines.append("jitter    " + "  ".join(f"{q} {v:.3f}" for q, v in jitter.items()) + " ms")
+    total = sum(report["jitter_buckets"])
+    bounds = [f"<={b:g}" for b in JITTER_BUCKETS_MS] + [f">{JITTER_BUCKETS_MS[-1]:g}"]
+    for bound, count in zip(bounds, report["jitter_buckets"]):
+        if count:
+            lines.append(f"  {bound:>6} ms {count:9d}  {count * 100 / total:6.2f}%")
+    backend = report["backend_ms"]
+    lines.append(f"backend   p50 {backend['p50']:.3f}  p99 {backend['p99']:.3f}  max {backend['max']:.3f} ms")
+
+    stalls = report["stalls"]
+    line = f"{len(stalls)} stalls over {stall_ms:g} ms"
+    if "stalls_with_gui_busy" in report:
+        line += f", {report['stalls_with_gui_busy']} while the GUI missed heartbeats"
+    lines.append(line)
+    worst = sorted(stalls, key=lambda s: s["worst_ms"], reverse=True)[:max_stalls]
+    for stall in sorted(worst, key=lambda s: s["at_s"]):
+        line = f"  at {stall['at_s']:9.3f} s  {stall['events']:5d} events  up to {stall['worst_ms']:8.3f} ms late"
+        if "gui_gap_ms" in stall:
+            line += f"  GUI quiet for {stall['gui_gap_ms']:.1f} ms"
+        if "gui_marks" in stall:
+            line += f"  ({', '.join(stall['gui_marks'])})"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -0,0 +1,142 @@
+from concurrent.futures import Future
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QSpinBox
+
+from control import ControlError, Controller
+
+# The control socket's commands for the GUI, kept out of AutoClicker.py so
+# control is only imported once the socket is switched on.
+
+# Leeway for values that went through a unit conversion, 0.007 * 1000 is
+# 7.000000000000001
+EPSILON = 1e-9
+
+
+def widget_number(name, widget, value, suffix=""):
+    # value as widget (a QSpinBox or QDoubleSpinBox) would hold it, or
+    # ControlError if it would have to change to fit
+    precision = 0 if isinstance(widget, QSpinBox) else widget.decimals()
+    rounded = round(value, precision)
+    if abs(rounded - value) > EPSILON:
+        places = "a whole number" if precision == 0 else f"a number with at most {precision} decimal places"
+        raise ControlError(f"{name} must be {places} here, not {value}")
+    if not widget.minimum() <= rounded <= widget.maximum():
+        raise ControlError(f"{name} must be between {widget.minimum():g} and {widget.maximum():g}{suffix}")
+    return int(rounded) if precision == 0 else rounded
+
+
+class GuiController(QObject, Controller):
+    # Runs control socket commands on the GUI thread, through the same
+    # widgets a person would use, so the window always shows what's going on
+    call = pyqtSignal(object, object)
+
+    def __init__(self, gui):
+        QObject.__init__(self)
+        self.gui = gui
+        self.call.connect(self.on_call)
+
+    def handle(self, request):
+        # Called on one of the server's threads
+        future = Future()
+        self.call.emit(request, future)
+        return future.result(timeout=10)
+
+    def on_call(self, request, future):
+        try:
+            future.set_result(Controller.handle(self, request))
+        except Exception as e:
+            future.set_exception(e)
+
+    def set_widgets(self, job, settings):
+        # Everything is checked before any widget changes, so a request
+        # that's refused leaves the window as it was
+        for setter, value in self.widget_values(job, settings):
+            setter(value)
+
+    def widget_values(self, job, settings):
+        # (setter, value) for each setting given. Numbers have to fit their
+        # widget as they are, rather than be rounded or clamped into it.
+        gui = self.gui
+        if job == "clicker":
+            unit_combo = gui.time_unit
+            numbers = [
+                ("interval", gui.click_interval, settings["interval"], ""),
+                ("burst", gui.click_burst, settings["burst"], ""),
+            ]
+            others = [(gui.missed_policy.setCurrentText, settings["missed_policy"])]
+        else:
+            unit_combo = gui.type_time_unit
+            key_delay = settings["key_delay"]
+            numbers = [
+                ("interval", gui.type_interval, settings["interval"], ""),
+                ("duration", gui.type_duration, settings["duration"], " seconds"),
+                # Back to the milliseconds the request had it in
+                ("key_delay", gui.type_key_delay, None if key_delay is None else key_delay * 1000, " ms"),
+            ]
+            text = settings["text_to_type"]
+            if text is not None and len(text) > gui.text_to_type.maxLength():
+                raise ControlError(f"text can be at most {gui.text_to_type.maxLength()} characters")
+            others = [(gui.text_to_type.setText, text)]
+        unit = settings["time_unit"]
+        if unit is not None:
+            units = [unit_combo.itemText(i) for i in range(unit_combo.count())]
+            if unit not in units:
+                raise ControlError(f"the {job} takes units {', '.join(units)}")
+        values = [(widget.setValue, widget_number(name, widget, value, suffix))
+                  for name, widget, value, suffix in numbers if value is not None]
+        values += [(setter, value) for setter, value in others if value is not None]
+        if unit is not None:
+            values.append((unit_combo.setCurrentText, unit))
+        return values
+
+    def toggle(self, job):
+        gui = self.gui
+        return gui.clicker_toggle if job == "clicker" else gui.typer_toggle
+
+    def start(self, job, settings):
+        gui = self.gui
+        if self.toggle(job).isChecked():
+            raise ControlError(f"the {job} is already running")
+        self.set_widgets(job, settings)
+        if job == "clicker":
+            gui.clicker_toggle.setChecked(True)
+            gui.toggle_clicker()
+        else:
+            if not gui.text_to_type.text():
+                raise ControlError("the typer needs some text")
+            # Commands only drive the text typer
+            gui.type_file.clear()
+            gui.typer_toggle.setChecked(True)
+            gui.toggle_typer()
+
+    def stop(self, job):
+        if self.toggle(job).isChecked():
+            self.toggle(job).setChecked(False)
+            if job == "clicker":
+                self.gui.toggle_clicker()
+            else:
+                self.gui.toggle_typer()
+
+    def retime(self, job, settings):
+        if not self.toggle(job).isChecked():
+            raise ControlError(f"the {job} isn't running")
+        # The widgets pass it on to the running engine
+        self.set_widgets(job, settings)
+
+    def status(self):
+        gui = self.gui
+        status = {}
+        for job, thread, interval, unit in (
+            ("clicker", gui.clicker_thread, gui.click_interval, gui.time_unit),
+            ("typer", gui.typer_thread, gui.type_interval, gui.type_time_unit),
+        ):
+            running = bool(thread and thread.isRunning())
+            status[job] = {"running": running}
+            if running:
+                status[job].update(
+                    interval=interval.value(),
+                    unit=unit.currentText(),
+                    events_sent=thread.engine.metrics.events_sent,
+                )
+        return status
@@ -0,0 +1,186 @@
+import os
+import selectors
+import sys
+import threading
+
+# Hotkeys are driven by key events pushed from a hook instead of polling
+# keyboard.is_pressed(), so nothing has to sit in a loop asking about keys.
+# A source delivers (key, pressed) pairs to the dispatcher, which fires the
+# callbacks bound to that key on the key-down edge only.
+
+
+class HotkeyDispatcher:
+    def __init__(self):
+        self._bindings = {}
+        self._down = set()
+        self._lock = threading.Lock()
+        self.source = None
+
+    def bind(self, key, callback):
+        key = key.lower()
+        with self._lock:
+            callbacks = list(self._bindings.get(key, ()))
+            callbacks.append(callback)
+            self._bindings[key] = callbacks
+
+    def unbind(self, key, callback=None):
+        key = key.lower()
+        with self._lock:
+            if callback is None:
+                self._bindings.pop(key, None)
+                return
+            callbacks = [cb for cb in self._bindings.get(key, ()) if cb != callback]
+            if callbacks:
+                self._bindings[key] = callbacks
+            else:
+                self._bindings.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._bindings = {}
+
+    def on_key(self, key, pressed):
+        key = key.lower()
+        if not pressed:
+            self._down.discard(key)
+            return
+        # Held keys auto-repeat; only the first press counts
+        if key in self._down:
+            return
+        self._down.add(key)
+        # The bindings dict is replaced, never mutated, so this read is safe
+        for callback in self._bindings.get(key, ()):
+            callback(key)
+
+    def start(self, source=None):
+        if self.source:
+            return
+        if source:
+            source.start(self.on_key)
+            self.source = source
+        else:
+            self.source = start_source(self.on_key)
+
+    def stop(self):
+        if self.source:
+            self.source.stop()
+            self.source = None
+        self._down.clear()
+
+
+class KeyboardHookSource:
+    # Global hook from the keyboard library (Windows, and Linux as root)
+    def __init__(self):
+        import keyboard
+        self.keyboard = keyboard
+        self._hook = None
+
+    def start(self, on_key):
+        def handle(event):
+            if event.name:
+                on_key(event.name, event.event_type == self.keyboard.KEY_DOWN)
+        self._hook = self.keyboard.hook(handle)
+
+    def stop(self):
+        if self._hook:
+            self.keyboard.unhook(self._hook)
+            self._hook = None
+
+
+class EvdevSource:
+    # Reads every keyboard under /dev/input directly on a single thread
+    def __init__(self, devices=None):
+        import evdev
+        self.evdev = evdev
+        if devices is None:
+            devices = []
+            for path in evdev.list_devices():
+                device = evdev.InputDevice(path)
+                keys = device.capabilities().get(evdev.ecodes.EV_KEY, [])
+                if evdev.ecodes.KEY_A in keys:
+                    devices.append(device)
+                else:
+                    device.close()
+        if not devices:
+            raise RuntimeError("No readable keyboards under /dev/input")
+        self.devices = devices
+        self._thread = None
+        self._wake_r, self._wake_w = os.pipe()
+
+    def start(self, on_key):
+        self._thread = threading.Thread(target=self._read, args=(on_key,), daemon=True)
+        self._thread.start()
+
+    def _read(self, on_key):
+        ecodes = self.evdev.ecodes
+        selector = selectors.DefaultSelector()
+        for device in self.devices:
+            selector.register(device, selectors.EVENT_READ)
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj == self._wake_r:
+                    selector.close()
+                    return
+                for event in key.fileobj.read():
+                    # value 2 is auto-repeat
+                    if event.type != ecodes.EV_KEY or event.value == 2:
+                        continue
+                    name = ecodes.KEY.get(event.code)
+                    if isinstance(name, list):
+                        name = name[0]
+                    if name and name.startswith('KEY_'):
+                        on_key(name[4:], event.value == 1)
+
+    def stop(self):
+        os.write(self._wake_w, b'x')
+        if self._thread:
+            self._thread.join()
+        for device in self.devices:
+            device.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+class SyntheticSource:
+    # Key events come from whoever calls press()/release(), for tests
+    def __init__(self):
+        self.on_key = None
+
+    def start(self, on_key):
+        self.on_key = on_key
+
+    def stop(self):
+        self.on_key = None
+
+    def press(self, key):
+        if self.on_key:
+            self.on_key(key, True)
+
+    def release(self, key):
+        if self.on_key:
+            self.on_key(key, False)
+
+    def tap(self, key):
+        self.press(key)
+        self.release(key)
+
+
+def start_source(on_key):
+    # The keyboard hook if it starts, else on Linux evdev. keyboard imports
+    # fine on Linux without root and only fails once the hook is started,
+    # so starting it is the only way to know.
+    try:
+        source = KeyboardHookSource()
+        source.start(on_key)
+        return source
+    except Exception as e:
+        if not sys.platform.startswith('linux'):
+            raise
+        hook_error = e
+    try:
+        source = EvdevSource()
+        source.start(on_key)
+        return source
+    except Exception as e:
+        raise RuntimeError(f"No way to read the keyboard: keyboard hook: {hook_error}; evdev: {e}") from e
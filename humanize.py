@@ -0,0 +1,116 @@
+import math
+import queue
+import threading
+
+# Random-looking timing and cursor offsets, drawn in big blocks with NumPy
+# on a background thread so the click loops only index into lists.
+#
+# Intervals are drawn as factors with a mean of 1, which the engine scales
+# by its own interval; spread is how far they stray (the standard deviation
+# for the normal and log-normal, the half width for uniform). Offsets are
+# whole pixels within offset_px of the target and only matter where there
+# is a target, i.e. positioned click jobs. The same seed gives the same
+# sequence every run; numpy is only imported once a schedule is made.
+
+NORMAL = "Normal"
+LOGNORMAL = "Log-normal"
+UNIFORM = "Uniform"
+DISTRIBUTIONS = [NORMAL, LOGNORMAL, UNIFORM]
+
+BLOCK_SIZE = 4096
+
+# No interval ever shrinks below this fraction of the set one
+MIN_FACTOR = 0.1
+
+
+class HumanSchedule:
+    def __init__(self, distribution=NORMAL, spread=0.2, offset_px=0, seed=None, block_size=BLOCK_SIZE):
+        import numpy as np
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {', '.join(DISTRIBUTIONS)}")
+        self.np = np
+        self.distribution = distribution
+        self.spread = spread
+        self.offset_px = offset_px
+        self.seed = seed
+        self.block_size = block_size
+
+    def __reduce__(self):
+        # Pickled by its settings, not the numpy module it holds, so it can
+        # be handed to a worker process
+        return HumanSchedule, (self.distribution, self.spread, self.offset_px, self.seed, self.block_size)
+
+    def rng(self, stream=0):
+        # Each stream (one per click job) gets its own reproducible sequence
+        if self.seed is None:
+            return self.np.random.default_rng()
+        return self.np.random.default_rng([self.seed, stream])
+
+    def generate(self, rng):
+        # One block as (interval factors, x offsets, y offsets) lists
+        np = self.np
+        n = self.block_size
+        spread = self.spread
+        if self.distribution == NORMAL:
+            factors = rng.normal(1.0, spread, n)
+        elif self.distribution == LOGNORMAL:
+            # Parameters that give a mean of 1 and a standard deviation of spread
+            sigma2 = math.log1p(spread * spread)
+            factors = rng.lognormal(-sigma2 / 2, math.sqrt(sigma2), n)
+        else:
+            spread = min(spread, 1.0)
+            factors = rng.uniform(1.0 - spread, 1.0 + spread, n)
+        np.maximum(factors, MIN_FACTOR, out=factors)
+
+        if self.offset_px:
+            offsets = rng.normal(0.0, self.offset_px / 2, (2, n))
+            np.clip(offsets, -self.offset_px, self.offset_px, out=offsets)
+            offsets = np.rint(offsets).astype(np.int32)
+        else:
+            offsets = np.zeros((2, n), dtype=np.int32)
+        return factors.tolist(), offsets[0].tolist(), offsets[1].tolist()
+
+    def feed(self, stream=0):
+        return ScheduleFeed(self, stream)
+
+
+class ScheduleFeed:
+    # Keeps the next couple of blocks ready on its own thread. take() only
+    # waits if the consumer gets through a whole block before the next one
+    # is done, which would take a very fast clicker.
+    #
+    # The thread isn't started until start() or the first take(), and is
+    # started again if it has gone, so a feed made before a fork (cli.py
+    # --daemon) still fills in the child, where only the forking thread
+    # survives.
+    def __init__(self, schedule, stream=0, depth=2):
+        self.schedule = schedule
+        self._rng = schedule.rng(stream)
+        self._blocks = queue.Queue(depth)
+        self._closed = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._closed.is_set() or (self._thread and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._fill, daemon=True)
+            self._thread.start()
+
+    def _fill(self):
+        while not self._closed.is_set():
+            block = self.schedule.generate(self._rng)
+            while not self._closed.is_set():
+                try:
+                    self._blocks.put(block, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+
+    def take(self):
+        self.start()
+        return self._blocks.get()
+
+    def close(self):
+        self._closed.set()
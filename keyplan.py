@@ -0,0 +1,77 @@
+from functools import lru_cache
+
+from backends import split_char
+from timing import REAL_CLOCK
+
+# Text is turned into a flat plan of key operations once, instead of
+# resolving every character to a key and modifiers on every repetition.
+# Shift is only pressed and released where it changes, so "HELLO" holds
+# shift once around all five keys.
+
+PRESS = 0      # down and up of one key, the per-key delay follows it
+DOWN = 1
+UP = 2
+
+
+def compile_text(text):
+    plan = []
+    shifted = False
+    for char in text:
+        key, shift = split_char(char)
+        if shift != shifted:
+            plan.append((DOWN if shift else UP, 'shift'))
+            shifted = shift
+        plan.append((PRESS, key))
+    if shifted:
+        plan.append((UP, 'shift'))
+    return tuple(plan)
+
+
+@lru_cache(maxsize=64)
+def compile_plan(text):
+    # Cached, for text that gets typed over and over
+    return compile_text(text)
+
+
+def play_plan(plan, backend, key_delay, wake, metrics=None, trace=None, clock=REAL_CLOCK):
+    # Sends a plan through the backend, waiting key_delay seconds after each
+    # key, and records each key in metrics and trace (an EventTrace) if
+    # given. Returns False if wake got set part way; anything still held
+    # down is released first.
+    #
+    # A key is due key_delay after the previous one finished, the first one
+    # when the plan starts.
+    press = backend.press
+    now_ns = clock.now_ns
+    held = []
+    due = now_ns()
+    delay_ns = int(key_delay * 1_000_000_000)
+    try:
+        for op, key in plan:
+            if op == PRESS:
+                if metrics is None and trace is None:
+                    press(key)
+                else:
+                    start = now_ns()
+                    press(key)
+                    end = now_ns()
+                    if metrics is not None:
+                        metrics.record(start, end)
+                    if trace is not None:
+                        trace.record(due, start, end)
+                        due = end + delay_ns
+                if key_delay:
+                    if clock.wait(wake, key_delay):
+                        return False
+                elif wake.is_set():
+                    return False
+            elif op == DOWN:
+                backend.key_down(key)
+                held.append(key)
+            else:
+                backend.key_up(key)
+                held.remove(key)
+    finally:
+        for key in held:
+            backend.key_up(key)
+    return True
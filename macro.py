@@ -0,0 +1,278 @@
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from backends import BUTTONS
+from telemetry import EngineMetrics
+from timing import REAL_CLOCK
+
+# Recorded input lives in parallel arrays (one column per field) rather than
+# a list of objects, and is saved as a small header followed by the raw
+# columns, so hours of mouse movement stay a few MB.
+
+MOVE = 0          # a, b = x, y
+MOUSE_DOWN = 1    # a = index into BUTTONS
+MOUSE_UP = 2
+KEY_DOWN = 3      # a = index into the log's key names
+KEY_UP = 4
+
+MAGIC = b'ACM1'
+# magic, format version, event count, size of the key name table in bytes
+HEADER = struct.Struct('<4sHIQ')
+VERSION = 1
+
+
+class MacroFormatError(ValueError):
+    pass
+
+
+class EventLog:
+    def __init__(self):
+        self.times = array('q')   # ns since the start of the recording
+        self.kinds = array('B')
+        self.a = array('i')
+        self.b = array('i')
+        self.keys = []
+        self._key_index = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def duration(self):
+        return self.times[-1] / 1_000_000_000 if self.times else 0.0
+
+    def key_index(self, name):
+        index = self._key_index.get(name)
+        if index is None:
+            index = self._key_index[name] = len(self.keys)
+            self.keys.append(name)
+        return index
+
+    def append(self, t_ns, kind, a=0, b=0):
+        self.times.append(t_ns)
+        self.kinds.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+
+    def save(self, path):
+        keys = '\n'.join(self.keys).encode('utf-8')
+        columns = [self.times, self.kinds, self.a, self.b]
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self), len(keys)))
+            f.write(keys)
+            for column in columns:
+                if sys.byteorder == 'big':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        log = cls()
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise MacroFormatError(f"{path} is not a macro file")
+            magic, version, count, keys_size = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise MacroFormatError(f"{path} is not a macro file")
+            if version != VERSION:
+                raise MacroFormatError(f"{path} has unsupported macro version {version}")
+            keys = f.read(keys_size).decode('utf-8')
+            for name in keys.split('\n') if keys else []:
+                log.key_index(name)
+            try:
+                for column in [log.times, log.kinds, log.a, log.b]:
+                    column.fromfile(f, count)
+                    if sys.byteorder == 'big':
+                        column.byteswap()
+            except EOFError:
+                raise MacroFormatError(f"{path} is truncated")
+        return log
+
+
+class MacroRecorder:
+    # Sources call on_move/on_button/on_key; timestamps are taken here
+    # unless the source passes its own (t_ns, on the perf_counter_ns clock)
+    def __init__(self, log=None, min_move_interval=0.0):
+        self.log = log if log is not None else EventLog()
+        # Mice can report at 1000 Hz; this thins out the moves
+        self.min_move_ns = int(min_move_interval * 1_000_000_000)
+        self.start_ns = None
+        self._last_move = -self.min_move_ns
+        self._lock = threading.Lock()
+        self.source = None
+
+    def start(self, source=None):
+        self.start_ns = time.perf_counter_ns()
+        self.source = source or HookRecordSource()
+        self.source.start(self)
+
+    def stop(self):
+        if self.source:
+            self.source.stop()
+            self.source = None
+        return self.log
+
+    def _stamp(self, t_ns):
+        return (t_ns if t_ns is not None else time.perf_counter_ns()) - self.start_ns
+
+    def on_move(self, x, y, t_ns=None):
+        t = self._stamp(t_ns)
+        if t - self._last_move < self.min_move_ns:
+            return
+        self._last_move = t
+        with self._lock:
+            self.log.append(t, MOVE, int(x), int(y))
+
+    def on_button(self, button, pressed, t_ns=None):
+        if button not in BUTTONS:
+            return
+        t = self._stamp(t_ns)
+        with self._lock:
+            self.log.append(t, MOUSE_DOWN if pressed else MOUSE_UP, BUTTONS.index(button))
+
+    def on_key(self, name, pressed, t_ns=None):
+        t = self._stamp(t_ns)
+        with self._lock:
+            self.log.append(t, KEY_DOWN if pressed else KEY_UP, self.log.key_index(name))
+
+
+class HookRecordSource:
+    # Global hooks from the keyboard and mouse libraries
+    def __init__(self):
+        import keyboard
+        import mouse
+        self.keyboard = keyboard
+        self.mouse = mouse
+        self._hooks = None
+
+    def start(self, recorder):
+        def on_key(event):
+            if event.name:
+                recorder.on_key(event.name, event.event_type == self.keyboard.KEY_DOWN)
+
+        def on_mouse(event):
+            if isinstance(event, self.mouse.MoveEvent):
+                recorder.on_move(event.x, event.y)
+            elif isinstance(event, self.mouse.ButtonEvent) and event.event_type in (self.mouse.DOWN, self.mouse.UP):
+                recorder.on_button(event.button, event.event_type == self.mouse.DOWN)
+
+        self._hooks = (self.keyboard.hook(on_key), on_mouse)
+        self.mouse.hook(on_mouse)
+
+    def stop(self):
+        if self._hooks:
+            key_hook, mouse_hook = self._hooks
+            self.keyboard.unhook(key_hook)
+            self.mouse.unhook(mouse_hook)
+            self._hooks = None
+
+
+class SyntheticRecordSource:
+    # Events come from whoever calls these methods, for tests
+    def __init__(self):
+        self.recorder = None
+
+    def start(self, recorder):
+        self.recorder = recorder
+
+    def stop(self):
+        self.recorder = None
+
+    def move(self, x, y, t_ns=None):
+        self.recorder.on_move(x, y, t_ns)
+
+    def button(self, button, pressed, t_ns=None):
+        self.recorder.on_button(button, pressed, t_ns)
+
+    def key(self, name, pressed, t_ns=None):
+        self.recorder.on_key(name, pressed, t_ns)
+
+
+def _ignore(*args):
+    pass
+
+
+class ReplayEngine:
+    # Plays an EventLog back against absolute deadlines, so timing errors
+    # don't add up over a long macro. loops=0 repeats until stopped. clock
+    # is a timing.VirtualClock to simulate with.
+    def __init__(self, backend, log, speed=1.0, loops=1, on_finished=None, clock=REAL_CLOCK):
+        self.backend = backend
+        self.clock = clock
+        self.log = log
+        self.speed = speed
+        self.loops = loops
+        # Called when all loops are done, not when stopped
+        self.on_finished = on_finished or _ignore
+        self.metrics = EngineMetrics("replay")
+        self.events_sent = 0
+        self.running = True
+        # Set by stop() to cut any wait short
+        self.wake = threading.Event()
+
+    def run(self):
+        try:
+            self.replay_loop()
+        finally:
+            self.backend.close()
+
+    def replay_loop(self):
+        backend = self.backend
+        log = self.log
+        keys = log.keys
+        # What's down right now, released whenever the loop ends so stopping
+        # part way through doesn't leave a key or button stuck. Dicts, as
+        # sets that keep the order things went down in.
+        held_buttons = {}
+        held_keys = {}
+
+        def mouse_down(a, b):
+            backend.mouse_down(BUTTONS[a])
+            held_buttons[BUTTONS[a]] = True
+
+        def mouse_up(a, b):
+            backend.mouse_up(BUTTONS[a])
+            held_buttons.pop(BUTTONS[a], None)
+
+        def key_down(a, b):
+            backend.key_down(keys[a])
+            held_keys[keys[a]] = True
+
+        def key_up(a, b):
+            backend.key_up(keys[a])
+            held_keys.pop(keys[a], None)
+
+        # Handlers by event kind, each taking the event's a and b
+        handlers = [backend.move, mouse_down, mouse_up, key_down, key_up]
+        metrics = self.metrics
+        clock = self.clock.now_ns
+        wait_until = self.clock.wait_until
+        scale = 1 / self.speed
+        loop = 0
+        try:
+            while self.running and (self.loops == 0 or loop < self.loops):
+                start = clock()
+                for t, kind, a, b in zip(log.times, log.kinds, log.a, log.b):
+                    if not wait_until(start + int(t * scale), self.wake):
+                        return
+                    sent = clock()
+                    handlers[kind](a, b)
+                    metrics.record(sent, clock())
+                    self.events_sent += 1
+                loop += 1
+        finally:
+            for key in reversed(list(held_keys)):
+                backend.key_up(key)
+            for button in reversed(list(held_buttons)):
+                backend.mouse_up(button)
+        if self.running:
+            self.running = False
+            self.on_finished()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
@@ -0,0 +1,107 @@
+import sys
+
+from timing import REAL_CLOCK
+
+# Typing by pasting: the text goes onto the clipboard a chunk at a time and
+# each chunk is pasted with the paste chord, so a long text costs a few
+# keystrokes instead of one per character. The clipboard's old contents are
+# put back afterwards.
+#
+# Whether it worked can only be seen from our side as far as the clipboard:
+# if that can't be written the typer falls back to keys, but a program that
+# ignores the paste chord just gets nothing, so KEYS is the default and
+# PASTE and AUTO have to be asked for.
+
+AUTO = "Auto"
+KEYS = "Keys"
+PASTE = "Paste"
+STRATEGIES = [AUTO, KEYS, PASTE]
+
+# AUTO pastes text at least this long and types anything shorter, where a
+# paste's settle time would cost more than it saves
+PASTE_THRESHOLD = 200
+
+# Characters per paste. Some programs truncate or choke on huge pastes.
+CHUNK_SIZE = 4096
+
+# Seconds to leave each paste before the clipboard changes again. The
+# target reads the clipboard when it gets round to handling the chord, and
+# anything written before then is what it pastes instead.
+SETTLE = 0.05
+
+PASTE_CHORD = ('command', 'v') if sys.platform == 'darwin' else ('ctrl', 'v')
+
+
+class PasteUnavailable(RuntimeError):
+    # The clipboard couldn't be written; typed is how much of the text had
+    # been pasted by then
+    def __init__(self, message, typed=0):
+        super().__init__(message)
+        self.typed = typed
+
+
+def use_paste(strategy, text, threshold=PASTE_THRESHOLD):
+    return strategy == PASTE or (strategy == AUTO and len(text) >= threshold)
+
+
+class MemoryClipboard:
+    # A clipboard of our own, for benchmarks and tests; pasted keeps
+    # everything copied to it
+    def __init__(self, text=""):
+        self.text = text
+        self.pasted = []
+
+    def copy(self, text):
+        self.text = text
+        self.pasted.append(text)
+
+    def paste(self):
+        return self.text
+
+
+def system_clipboard():
+    # pyperclip comes with pyautogui; only imported when first pasting
+    try:
+        import pyperclip
+    except ImportError as e:
+        raise PasteUnavailable(f"Pasting needs pyperclip: {e}")
+    return pyperclip
+
+
+def paste_text(text, backend, clipboard, wake, metrics=None, trace=None, clock=REAL_CLOCK,
+               chunk_size=CHUNK_SIZE, settle=SETTLE):
+    # Pastes text through the clipboard and backend, SETTLE seconds apart,
+    # and records each paste in metrics (as one event per character) and
+    # trace if given. Returns False if wake got set part way. Raises
+    # PasteUnavailable if the clipboard can't be written.
+    now_ns = clock.now_ns
+    try:
+        saved = clipboard.paste()
+    except Exception:
+        saved = None
+    settle_ns = int(settle * 1_000_000_000)
+    due = now_ns()
+    try:
+        for offset in range(0, len(text), chunk_size):
+            chunk = text[offset:offset + chunk_size]
+            start = now_ns()
+            try:
+                clipboard.copy(chunk)
+            except Exception as e:
+                raise PasteUnavailable(f"Couldn't write the clipboard: {e}", offset)
+            backend.hotkey(*PASTE_CHORD)
+            end = now_ns()
+            if metrics is not None:
+                metrics.record(start, end, len(chunk))
+            if trace is not None:
+                trace.record(due, start, end)
+                due = end + settle_ns
+            if clock.wait(wake, settle):
+                return False
+    finally:
+        if saved is not None:
+            try:
+                clipboard.copy(saved)
+            except Exception:
+                pass
+    return True
@@ -0,0 +1,259 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# Settings on disk, split in two:
+#
+#   ~/.autoclicker/settings.json         {"version": 2, "active_profile": "Default",
+#                                         "global": {"dark_mode": false, ...}}
+#   ~/.autoclicker/profiles/<name>.json  {"version": 1, "values": {"interval": 100, ...}}
+#
+# Global settings are read at startup; a profile is only read when it's
+# first asked for, so startup costs one small file however many profiles
+# there are. Changes are kept in memory and written by a background thread
+# once they've stopped coming for `delay` seconds, each file to a temporary
+# name first and then renamed over the old one, so a crash mid-write leaves
+# the previous version intact.
+#
+# Older layouts are brought up to date by MIGRATIONS when read, starting
+# with the single ~/.autoclicker_config.json the app used to keep.
+
+SCHEMA_VERSION = 2
+PROFILE_VERSION = 1
+DEFAULT_PROFILE = "Default"
+
+# Profile names become file names
+PROFILE_NAME = re.compile(r"^[\w][\w \-]{0,63}$")
+
+
+def _from_v1(data):
+    # The old flat file: just the global settings
+    data = dict(data)
+    data.pop("version", None)
+    return {"version": 2, "active_profile": DEFAULT_PROFILE, "global": data}
+
+
+# version -> function turning a document of that version into the next one
+MIGRATIONS = {1: _from_v1}
+PROFILE_MIGRATIONS = {}
+
+
+def migrate(data, migrations, version):
+    # Files from before versioning count as version 1
+    while data.get("version", 1) < version:
+        data = migrations[data.get("version", 1)](data)
+    return data
+
+
+def _report(message):
+    print(message, file=sys.stderr)
+
+
+class SettingsStore:
+    def __init__(self, directory=None, legacy_path=None, delay=0.5, on_error=None):
+        home = os.path.expanduser("~")
+        self.directory = directory or os.path.join(home, ".autoclicker")
+        self.legacy_path = legacy_path or os.path.join(home, ".autoclicker_config.json")
+        self.delay = delay
+        # Called with a message when a file can't be read or written; from
+        # the writer thread for writes
+        self.on_error = on_error or _report
+        self.globals = {}
+        self.active_profile = DEFAULT_PROFILE
+        self._profiles = {}     # name -> values, only the ones read so far
+        self._dirty = set()     # None for settings.json, else profile names
+        self._deleted = set()
+        self._lock = threading.Condition()
+        self._due = None
+        self._closed = False
+        self._writer = None
+        # Held while files are being written, by the writer thread or flush()
+        self._io = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, "settings.json")
+
+    def profile_path(self, name):
+        return os.path.join(self.directory, "profiles", name + ".json")
+
+    def _read(self, path, move_aside=True):
+        # None if it isn't there; a file that won't parse is moved aside to
+        # .bad unless move_aside is off
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.on_error(f"Couldn't read {path}, starting from defaults: {e}")
+            if move_aside:
+                try:
+                    os.replace(path, path + ".bad")
+                except OSError:
+                    pass
+            return None
+
+    def load(self):
+        data = self._read(self.path)
+        if data is None:
+            # Moved over to the new layout; the old file is left alone,
+            # even when it can't be read
+            data = self._read(self.legacy_path, move_aside=False)
+        with self._lock:
+            if data is None:
+                data = {"version": SCHEMA_VERSION}
+            elif data.get("version", 1) < SCHEMA_VERSION:
+                data = migrate(data, MIGRATIONS, SCHEMA_VERSION)
+                self._mark(None)
+            self.globals = data.get("global", {})
+            self.active_profile = data.get("active_profile", DEFAULT_PROFILE)
+        return self
+
+    # -- global settings
+
+    def get(self, key, default=None):
+        return self.globals.get(key, default)
+
+    def update(self, **values):
+        with self._lock:
+            self.globals.update(values)
+            self._mark(None)
+
+    # -- profiles
+
+    def profile_names(self):
+        # Listed, not read
+        names = set(self._profiles)
+        try:
+            for entry in os.listdir(os.path.join(self.directory, "profiles")):
+                if entry.endswith(".json"):
+                    names.add(entry[:-5])
+        except FileNotFoundError:
+            pass
+        names -= self._deleted
+        names.add(DEFAULT_PROFILE)
+        return sorted(names)
+
+    def profile(self, name=None):
+        # The profile's values, read from disk the first time
+        name = name or self.active_profile
+        with self._lock:
+            values = self._profiles.get(name)
+            if values is None:
+                data = None if name in self._deleted else self._read(self.profile_path(name))
+                if data is not None:
+                    data = migrate(data, PROFILE_MIGRATIONS, PROFILE_VERSION)
+                values = self._profiles[name] = (data or {}).get("values", {})
+            return dict(values)
+
+    def save_profile(self, values, name=None):
+        name = name or self.active_profile
+        if not PROFILE_NAME.match(name):
+            raise ValueError(f"{name!r} can't be used as a profile name")
+        with self._lock:
+            self._profiles[name] = dict(values)
+            self._deleted.discard(name)
+            self._mark(name)
+
+    def set_active(self, name):
+        with self._lock:
+            self.active_profile = name
+            self._mark(None)
+
+    def delete_profile(self, name):
+        if name == DEFAULT_PROFILE:
+            raise ValueError("The default profile can't be deleted")
+        with self._lock:
+            self._profiles.pop(name, None)
+            self._dirty.discard(name)
+            self._deleted.add(name)
+            if self.active_profile == name:
+                self.active_profile = DEFAULT_PROFILE
+            self._mark(None)
+
+    # -- writing
+
+    def _mark(self, name):
+        # Caller holds the lock
+        self._dirty.add(name)
+        self._due = time.monotonic() + self.delay
+        if self._writer is None and not self._closed:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+        self._lock.notify()
+
+    def _write_loop(self):
+        with self._lock:
+            while not self._closed:
+                if not self._dirty and not self._deleted:
+                    self._lock.wait()
+                    continue
+                remaining = self._due - time.monotonic()
+                if remaining > 0:
+                    # Pushed back by every change that comes in meanwhile
+                    self._lock.wait(remaining)
+                    continue
+                self._write_pending()
+
+    def _snapshot(self):
+        # Everything pending as (path, text or None to delete); lock held
+        files = []
+        for name in self._dirty:
+            if name is None:
+                data = {"version": SCHEMA_VERSION, "active_profile": self.active_profile, "global": self.globals}
+                files.append((self.path, json.dumps(data, indent=2)))
+            else:
+                data = {"version": PROFILE_VERSION, "values": self._profiles[name]}
+                files.append((self.profile_path(name), json.dumps(data, indent=2)))
+        files += [(self.profile_path(name), None) for name in self._deleted]
+        self._dirty.clear()
+        self._deleted.clear()
+        return files
+
+    def _write_pending(self):
+        # Called with the lock held; the disk work happens without it
+        files = self._snapshot()
+        self._lock.release()
+        try:
+            with self._io:
+                self._write_files(files)
+        finally:
+            self._lock.acquire()
+
+    def _write_files(self, files):
+        for path, text in files:
+            try:
+                if text is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    self._write_file(path, text)
+            except OSError as e:
+                self.on_error(f"Couldn't save {path}: {e}")
+
+    @staticmethod
+    def _write_file(path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        # Writes whatever is pending now, on the calling thread
+        with self._lock:
+            self._write_pending()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._writer:
+            self._writer.join()
+        self.flush()
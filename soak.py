@@ -0,0 +1,410 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from backends import RecordingBackend
+from engines import ClickEngine, JobEngine, TypeEngine
+from hotkeys import HotkeyDispatcher, SyntheticSource
+
+# Runs the engines for millions of events against counting-only recording
+# backends and watches for the process slowly going bad: memory creeping
+# up, threads piling up, each event costing more CPU than it used to.
+#
+#   python soak.py --events 5000000
+#   python soak.py --duration 86400 --sample 60 --output soak.json
+#   QT_QPA_PLATFORM=offscreen python soak.py --qt
+#
+# Every --sample seconds it records RSS, the memory tracemalloc sees, the
+# OS thread count and the CPU time per event since the last sample. The
+# first sample after --warmup seconds is the baseline; at the end the run
+# fails (exit status 1) if, against it,
+#
+#   RSS grew by more than --max-rss-growth MB
+#   traced memory grew by more than --max-heap-growth MB
+#   there were ever more than --max-thread-growth extra threads
+#   CPU per event in the last third of the samples was more than
+#   --max-cpu-growth times what it was in the first third
+#
+# and lists the lines whose allocations grew the most since the baseline.
+#
+# Besides the engines, a hotkey dispatcher is fed synthetic key taps the
+# whole time. With --qt everything runs inside the GUI's own thread and
+# listener classes, with their signals delivered through a Qt event loop.
+
+ENGINES = ["click", "type", "jobs", "hotkeys"]
+
+EVENTS = 2_000_000
+SAMPLE_INTERVAL = 5.0
+WARMUP = 10.0
+
+# The clicker sends BURST clicks per wakeup, so it alone goes well past
+# one event a millisecond
+CLICK_INTERVAL = 0.001
+BURST = 10
+TYPE_INTERVAL = 0.01
+TYPE_TEXT = "soak test "
+JOBS = 3
+JOB_INTERVAL = 0.005
+HOTKEY_RATE = 1000  # taps a second
+
+MAX_RSS_GROWTH_MB = 20.0
+MAX_HEAP_GROWTH_MB = 5.0
+MAX_THREAD_GROWTH = 0
+MAX_CPU_GROWTH = 1.5
+
+TOP_ALLOCATORS = 10
+
+
+def rss_bytes():
+    # Resident set size now, or None where we can't tell. Outside Linux
+    # the peak is the best there is, which still shows growth.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def thread_count():
+    # Threads the OS sees, so QThreads and anything started outside Python
+    # count as well
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+class EngineThread(threading.Thread):
+    # Stands in for the GUI's QThread wrappers without Qt
+    def __init__(self, engine):
+        super().__init__(target=engine.run, daemon=True)
+        self.engine = engine
+
+    def stop(self):
+        self.engine.stop()
+
+    def wait(self):
+        self.join()
+
+
+class HotkeyFeed:
+    # Taps a key at HOTKEY_RATE from a thread of its own and counts what
+    # comes out the other end
+    def __init__(self, listener=None):
+        self.source = SyntheticSource()
+        self.delivered = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.feed, daemon=True)
+        if listener:
+            # The GUI's listener: callbacks arrive as Qt signals
+            self.listener = listener
+            listener.bind("f9")
+            listener.hotkey_pressed.connect(self.count)
+            listener.source = self.source
+        else:
+            self.listener = HotkeyDispatcher()
+            self.listener.bind("f9", self.count)
+
+    def count(self, key):
+        self.delivered += 1
+
+    def start(self):
+        if isinstance(self.listener, HotkeyDispatcher):
+            self.listener.start(self.source)
+        else:
+            self.listener.start()
+        self.thread.start()
+
+    def feed(self):
+        # In slices of 10 ms, since sleeping any less isn't reliable
+        taps = max(1, HOTKEY_RATE // 100)
+        while self.running:
+            for _ in range(taps):
+                self.source.tap("f9")
+            time.sleep(0.01)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.listener.stop()
+
+
+class Soak:
+    def __init__(self, names, qt=False):
+        self.names = names
+        self.app = None
+        self.runners = []   # objects with start(), stop() and an engine
+        self.hotkeys = None
+        if qt:
+            self._build_qt()
+        else:
+            self._build()
+
+    def _engines(self):
+        backend = lambda: RecordingBackend(keep=False)
+        engines = []
+        if "click" in self.names:
+            engines.append(ClickEngine(backend(), CLICK_INTERVAL, "Seconds", burst=BURST))
+        if "type" in self.names:
+            engines.append(TypeEngine(backend(), TYPE_INTERVAL, "Second", TYPE_TEXT, 0, key_delay=0))
+        if "jobs" in self.names:
+            jobs = JobEngine(backend())
+            for i in range(JOBS):
+                jobs.add_job(100 + i * 50, 100, JOB_INTERVAL)
+            engines.append(jobs)
+        return engines
+
+    def _build(self):
+        self.runners = [EngineThread(engine) for engine in self._engines()]
+        if "hotkeys" in self.names:
+            self.hotkeys = HotkeyFeed()
+
+    def _build_qt(self):
+        # Qt is only imported for --qt
+        from PyQt5.QtCore import QCoreApplication
+        from AutoClicker import ClickerThread, HotkeyListener, JobEngineThread, TyperThread
+        self.app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+        self.signals = 0
+        if "click" in self.names:
+            thread = ClickerThread(RecordingBackend(keep=False), CLICK_INTERVAL, "Seconds", burst=BURST)
+            thread.stats.connect(self._signal)
+            thread.countdown.connect(self._signal)
+            self.runners.append(thread)
+        if "type" in self.names:
+            self.runners.append(TyperThread(
+                RecordingBackend(keep=False), TYPE_INTERVAL, "Second", TYPE_TEXT, 0, 0
+            ))
+        if "jobs" in self.names:
+            thread = JobEngineThread(RecordingBackend(keep=False))
+            for i in range(JOBS):
+                thread.engine.add_job(100 + i * 50, 100, JOB_INTERVAL)
+            self.runners.append(thread)
+        if "hotkeys" in self.names:
+            self.hotkeys = HotkeyFeed(HotkeyListener())
+
+    def _signal(self, *args):
+        self.signals += 1
+
+    def start(self):
+        for runner in self.runners:
+            runner.start()
+        if self.hotkeys:
+            self.hotkeys.start()
+
+    def stop(self):
+        for runner in self.runners:
+            runner.stop()
+        for runner in self.runners:
+            runner.wait()
+        if self.hotkeys:
+            self.hotkeys.stop()
+        if self.app:
+            self.app.processEvents()
+
+    def events(self):
+        total = sum(runner.engine.metrics.events_sent for runner in self.runners)
+        if self.hotkeys:
+            total += self.hotkeys.delivered
+        return total
+
+    def churn(self):
+        # Pokes the paths that only run now and then, so they get soaked
+        # too: reconfiguring the clicker and typer, retiming a job
+        for runner in self.runners:
+            engine = runner.engine
+            if isinstance(engine, ClickEngine):
+                engine.reconfigure(interval=CLICK_INTERVAL, time_unit="Seconds", burst=BURST)
+            elif isinstance(engine, TypeEngine):
+                engine.reconfigure(interval=TYPE_INTERVAL, time_unit="Second")
+            elif isinstance(engine, JobEngine):
+                jobs = engine.jobs()
+                if jobs:
+                    engine.retime_job(jobs[0]["id"], JOB_INTERVAL)
+
+    def wait(self, seconds):
+        # Sleeps, or with Qt keeps its event loop turning meanwhile
+        if not self.app:
+            time.sleep(max(0, seconds))
+            return
+        deadline = time.perf_counter() + seconds
+        while True:
+            self.app.processEvents()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.01))
+
+
+def take_sample(start, events, cpu, last):
+    sample = {
+        "t": time.perf_counter() - start,
+        "events": events,
+        "cpu_s": cpu,
+        "rss_mb": None,
+        "heap_mb": None,
+        "threads": thread_count(),
+        "cpu_us_per_event": None,
+    }
+    rss = rss_bytes()
+    if rss is not None:
+        sample["rss_mb"] = rss / 2**20
+    if tracemalloc.is_tracing():
+        sample["heap_mb"] = tracemalloc.get_traced_memory()[0] / 2**20
+    if last and events > last["events"]:
+        sample["cpu_us_per_event"] = (cpu - last["cpu_s"]) * 1_000_000 / (events - last["events"])
+    return sample
+
+
+def describe(sample):
+    def value(key, form):
+        return format(sample[key], form) if sample[key] is not None else "n/a"
+    return (f"{sample['t']:9.1f} s  {sample['events']:12,d} events  "
+            f"rss {value('rss_mb', '8.1f')} MB  heap {value('heap_mb', '8.2f')} MB  "
+            f"threads {sample['threads']:3d}  cpu {value('cpu_us_per_event', '7.2f')} us/event")
+
+
+def check(samples, baseline, bounds):
+    # What went past its bound, as messages
+    failures = []
+    after = samples[samples.index(baseline):]
+    if len(after) < 3:
+        return ["Too few samples after the warmup to judge; run longer or sample more often"]
+    last = after[-1]
+    if baseline["rss_mb"] is not None:
+        growth = last["rss_mb"] - baseline["rss_mb"]
+        if growth > bounds["max_rss_growth_mb"]:
+            failures.append(f"RSS grew {growth:.1f} MB (bound {bounds['max_rss_growth_mb']:g} MB)")
+    if baseline["heap_mb"] is not None:
+        growth = last["heap_mb"] - baseline["heap_mb"]
+        if growth > bounds["max_heap_growth_mb"]:
+            failures.append(f"Traced memory grew {growth:.2f} MB (bound {bounds['max_heap_growth_mb']:g} MB)")
+    extra = max(sample["threads"] for sample in after) - baseline["threads"]
+    if extra > bounds["max_thread_growth"]:
+        failures.append(f"{extra} more threads than at the baseline (bound {bounds['max_thread_growth']})")
+    # The baseline's own window includes the warmup, so it's left out
+    costs = [sample["cpu_us_per_event"] for sample in after[1:] if sample["cpu_us_per_event"] is not None]
+    third = max(1, len(costs) // 3)
+    if len(costs) >= 2:
+        early = sum(costs[:third]) / third
+        late = sum(costs[-third:]) / third
+        if early and late / early > bounds["max_cpu_growth"]:
+            failures.append(f"CPU per event went from {early:.2f} to {late:.2f} us "
+                            f"(bound {bounds['max_cpu_growth']:g}x)")
+    return failures
+
+
+def top_allocators(before, after, limit=TOP_ALLOCATORS):
+    # Only what grew; compare_to() sorts by the size of the change either way
+    stats = [stat for stat in after.compare_to(before, "lineno") if stat.size_diff > 0][:limit]
+    return [
+        {"where": str(stat.traceback[0]), "size_diff_kb": stat.size_diff / 1024, "count_diff": stat.count_diff}
+        for stat in stats
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="soak.py", description="Long-running memory and CPU stability test")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"comma separated, any of {', '.join(ENGINES)}")
+    parser.add_argument("--events", type=int, default=EVENTS, help="stop after this many events (0 = no limit)")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = no limit)")
+    parser.add_argument("--sample", type=float, default=SAMPLE_INTERVAL, help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=WARMUP, help="seconds before the baseline sample")
+    parser.add_argument("--max-rss-growth", type=float, default=MAX_RSS_GROWTH_MB, help="MB")
+    parser.add_argument("--max-heap-growth", type=float, default=MAX_HEAP_GROWTH_MB, help="MB, as tracemalloc sees it")
+    parser.add_argument("--max-thread-growth", type=int, default=MAX_THREAD_GROWTH)
+    parser.add_argument("--max-cpu-growth", type=float, default=MAX_CPU_GROWTH,
+                        help="how many times the early CPU per event the late one may be")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="don't trace allocations (they slow every event down)")
+    parser.add_argument("--qt", action="store_true", help="run through the GUI's QThreads and hotkey listener")
+    parser.add_argument("--output", help="write the samples and verdict to this JSON file")
+    args = parser.parse_args(argv)
+
+    names = args.engines.split(",")
+    unknown = set(names) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+    if not args.events and not args.duration:
+        parser.error("give --events or --duration, or it would never end")
+    bounds = {
+        "max_rss_growth_mb": args.max_rss_growth,
+        "max_heap_growth_mb": args.max_heap_growth,
+        "max_thread_growth": args.max_thread_growth,
+        "max_cpu_growth": args.max_cpu_growth,
+    }
+
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    soak = Soak(names, args.qt)
+    samples = []
+    baseline = None
+    baseline_snapshot = None
+    start = time.perf_counter()
+    soak.start()
+    try:
+        while True:
+            soak.wait(start + (len(samples) + 1) * args.sample - time.perf_counter())
+            sample = take_sample(start, soak.events(), time.process_time(), samples[-1] if samples else None)
+            samples.append(sample)
+            print(describe(sample), file=sys.stderr)
+            if baseline is None and sample["t"] >= args.warmup:
+                baseline = sample
+                if tracemalloc.is_tracing():
+                    baseline_snapshot = tracemalloc.take_snapshot()
+            soak.churn()
+            if args.events and sample["events"] >= args.events:
+                break
+            if args.duration and sample["t"] >= args.duration:
+                break
+    except KeyboardInterrupt:
+        print("Interrupted, judging what there is", file=sys.stderr)
+    finally:
+        soak.stop()
+
+    if baseline is None:
+        failures = ["Stopped before the warmup was over; run longer or shorten --warmup"]
+    else:
+        failures = check(samples, baseline, bounds)
+    allocators = []
+    if baseline_snapshot is not None:
+        allocators = top_allocators(baseline_snapshot, tracemalloc.take_snapshot())
+        print("Allocations grown most since the baseline:", file=sys.stderr)
+        for allocator in allocators:
+            print(f"  {allocator['size_diff_kb']:+10.1f} KB {allocator['count_diff']:+8d} blocks  {allocator['where']}",
+                  file=sys.stderr)
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print(f"OK: {samples[-1]['events']:,} events in {samples[-1]['t']:.0f} s within bounds", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "version": 1,
+                "engines": names,
+                "qt": args.qt,
+                "bounds": bounds,
+                "samples": samples,
+                "baseline_t": baseline["t"] if baseline else None,
+                "top_allocators": allocators,
+                "failures": failures,
+            }, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
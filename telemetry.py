@@ -0,0 +1,179 @@
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+# Counters and fixed-bucket histograms the engines update on every event.
+# Each EngineMetrics is written by exactly one engine thread; readers (the
+# stats panel, exporters) just read the numbers, so there are no locks and
+# no Qt signals on the hot path. A reader may see a histogram mid-update,
+# which is off by one event at most.
+
+# Bucket upper bounds, in microseconds; anything slower lands in +Inf
+BUCKETS_US = (
+    10, 25, 50, 100, 250, 500,
+    1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000,
+    1_000_000, 2_500_000, 5_000_000, 10_000_000, 60_000_000,
+)
+
+
+class Histogram:
+    def __init__(self, bounds_us=BUCKETS_US):
+        self.bounds_us = bounds_us
+        self.bounds_ns = [bound * 1000 for bound in bounds_us]
+        self.counts = array('Q', [0]) * (len(bounds_us) + 1)
+        self.count = 0
+        self.sum_ns = 0
+
+    def observe(self, value_ns):
+        self.counts[bisect_left(self.bounds_ns, value_ns)] += 1
+        self.count += 1
+        self.sum_ns += value_ns
+
+    def mean_ms(self):
+        return self.sum_ns / self.count / 1_000_000 if self.count else 0.0
+
+    def quantile_ms(self, fraction):
+        # Upper bound of the bucket the quantile falls in
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                if index == len(self.bounds_us):
+                    return float('inf')
+                return self.bounds_us[index] / 1000
+        return float('inf')
+
+
+class EngineMetrics:
+    def __init__(self, engine):
+        self.engine = engine
+        self.events_sent = 0
+        self.missed_deadlines = 0
+        self.interval = Histogram()       # time between consecutive events
+        self.backend_call = Histogram()   # time spent inside the backend
+        self._last_start = 0
+
+    def record(self, start_ns, end_ns, count=1):
+        # One backend call, sending count events, that ran from start_ns to
+        # end_ns
+        if self._last_start:
+            self.interval.observe(start_ns - self._last_start)
+        self._last_start = start_ns
+        self.backend_call.observe(end_ns - start_ns)
+        self.events_sent += count
+
+    def values(self):
+        # Every number as one flat list of VALUE_COUNT ints, for copying
+        # into shared memory (workers.py)
+        values = [self.events_sent, self.missed_deadlines]
+        for histogram in (self.interval, self.backend_call):
+            values += histogram.counts
+            values += [histogram.count, histogram.sum_ns]
+        return values
+
+    @classmethod
+    def from_values(cls, engine, values):
+        metrics = cls(engine)
+        metrics.events_sent, metrics.missed_deadlines = values[0], values[1]
+        index = 2
+        for histogram in (metrics.interval, metrics.backend_call):
+            end = index + len(histogram.counts)
+            histogram.counts = array('Q', values[index:end])
+            histogram.count, histogram.sum_ns = values[end], values[end + 1]
+            index = end + 2
+        return metrics
+
+
+# Length of EngineMetrics.values()
+VALUE_COUNT = 2 + 2 * (len(BUCKETS_US) + 3)
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    counts = list(histogram.counts)
+    for bound, count in zip(histogram.bounds_us, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound / 1_000_000:g}"}} {cumulative}')
+    cumulative += counts[-1]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum_ns / 1_000_000_000:.9f}')
+    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+    return lines
+
+
+def prometheus_text(metrics):
+    # Prometheus text exposition format for a list of EngineMetrics
+    lines = [
+        '# HELP autoclicker_events_sent_total Events sent through the input backend.',
+        '# TYPE autoclicker_events_sent_total counter',
+    ]
+    lines += [f'autoclicker_events_sent_total{{engine="{m.engine}"}} {m.events_sent}' for m in metrics]
+    lines += [
+        '# HELP autoclicker_missed_deadlines_total Scheduled events that were skipped or fired late.',
+        '# TYPE autoclicker_missed_deadlines_total counter',
+    ]
+    lines += [f'autoclicker_missed_deadlines_total{{engine="{m.engine}"}} {m.missed_deadlines}' for m in metrics]
+    lines += [
+        '# HELP autoclicker_event_interval_seconds Time between consecutive events.',
+        '# TYPE autoclicker_event_interval_seconds histogram',
+    ]
+    for m in metrics:
+        lines += _histogram_lines('autoclicker_event_interval_seconds', f'engine="{m.engine}"', m.interval)
+    lines += [
+        '# HELP autoclicker_backend_call_seconds Time spent inside the input backend per event.',
+        '# TYPE autoclicker_backend_call_seconds histogram',
+    ]
+    for m in metrics:
+        lines += _histogram_lines('autoclicker_backend_call_seconds', f'engine="{m.engine}"', m.backend_call)
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_file(path, metrics):
+    # Written to a temporary file and renamed, so a scraper (e.g. the node
+    # exporter's textfile collector) never reads half a file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text(metrics))
+    os.replace(tmp_path, path)
+
+
+class MetricsServer:
+    # Serves GET /metrics on localhost from a background thread. provider()
+    # returns the list of EngineMetrics to report and is called per request.
+    def __init__(self, provider, port=9464, host='127.0.0.1'):
+        # http.server takes a while to import and only this needs it
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.provider = provider
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] != '/metrics':
+                    handler.send_error(404)
+                    return
+                body = prometheus_text(self.provider()).encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+import cli
+from backends import RecordingBackend
+
+
+class ClosingBackend(RecordingBackend):
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_a_bad_job_closes_the_backends_already_opened(monkeypatch):
+    opened = []
+
+    def create_backend(name="auto", **options):
+        opened.append(ClosingBackend())
+        return opened[-1]
+
+    monkeypatch.setattr(cli, "create_backend", create_backend)
+    jobs = [
+        {"x": 10, "y": 20, "interval": 100},
+        {"type": "type", "text": "hello"},
+        {"type": "nonsense"},
+    ]
+    with pytest.raises(cli.JobFileError):
+        cli.build_job_engines(jobs, "recording")
+    assert len(opened) == 2
+    assert all(backend.closed for backend in opened)
+
+
+def test_a_missing_key_closes_them_too(monkeypatch):
+    opened = []
+
+    def create_backend(name="auto", **options):
+        opened.append(ClosingBackend())
+        return opened[-1]
+
+    monkeypatch.setattr(cli, "create_backend", create_backend)
+    with pytest.raises(KeyError):
+        cli.build_job_engines([{"type": "type", "text": "hi"}, {"type": "type"}], "recording")
+    assert len(opened) == 2 and all(backend.closed for backend in opened)
+
+
+@pytest.mark.parametrize("args", [
+    ["click", "--interval", "0", "--unit", "Clicks/s"],
+    ["click", "--interval", "-100"],
+    ["click", "--burst", "0"],
+    ["type", "--text", "hi", "--interval", "0"],
+    ["type", "--text", "hi", "--key-delay", "-1"],
+    ["--duration", "-1", "click"],
+])
+def test_bad_arguments_are_refused_before_anything_runs(monkeypatch, args):
+    monkeypatch.setattr(cli, "run_engines", lambda *a: pytest.fail("engines started"))
+    with pytest.raises(SystemExit) as exit:
+        cli.main(["--backend", "recording", "--stop-key", ""] + args)
+    assert exit.value.code == 2
+
+
+class FailingEngine:
+    def run(self):
+        raise ZeroDivisionError("division by zero")
+
+    def stop(self):
+        pass
+
+
+class IdleEngine:
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def run(self):
+        self.stopped.wait()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def test_an_engine_that_raises_stops_the_rest_and_fails_the_run(monkeypatch, capsys):
+    idle = IdleEngine()
+    monkeypatch.setattr(cli, "build_job_engines", lambda jobs, backend: [idle, FailingEngine()])
+    assert cli.main(["--backend", "recording", "--stop-key", "", "click"]) == 1
+    assert idle.stopped.is_set()
+    assert "ZeroDivisionError: division by zero" in capsys.readouterr().err
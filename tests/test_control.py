@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from backends import RecordingBackend
+from control import ControlError, EngineController
+
+
+@pytest.fixture
+def controller():
+    controller = EngineController(RecordingBackend)
+    controller.handle({"cmd": "start", "job": "typer", "text": "hi", "interval": 1, "key_delay": 0})
+    yield controller
+    controller.close()
+
+
+@pytest.mark.parametrize("settings", [
+    {"duration": "x"},
+    {"duration": -1},
+    {"duration": True},
+    {"text": 5},
+    {"text": ["a"]},
+    {"key_delay": "fast"},
+    {"key_delay": -10},
+])
+def test_bad_typer_settings_are_refused(controller, settings):
+    with pytest.raises(ControlError):
+        controller.handle(dict({"cmd": "retime", "job": "typer"}, **settings))
+    # Nothing got through to kill the typer
+    time.sleep(0.05)
+    assert controller.status()["typer"]["running"]
+
+
+@pytest.mark.parametrize("settings", [{"duration": "x"}, {"text": 5}, {"key_delay": "fast"}])
+def test_bad_typer_settings_refused_on_start(settings):
+    controller = EngineController(RecordingBackend)
+    try:
+        with pytest.raises(ControlError):
+            controller.handle(dict({"cmd": "start", "job": "typer", "text": "hi"}, **settings))
+    finally:
+        controller.close()
+
+
+def test_good_typer_settings_are_taken(controller):
+    controller.handle({"cmd": "retime", "job": "typer", "duration": 0, "text": "ok", "key_delay": 5})
+    time.sleep(0.05)
+    assert controller.status()["typer"]["running"]
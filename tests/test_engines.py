@@ -0,0 +1,101 @@
+import pytest
+
+from backends import RecordingBackend
+from engines import ClickEngine, JobEngine, StreamTypeEngine, TypeEngine
+from textstream import Checkpoints
+from timing import VirtualClock, simulate
+
+
+@pytest.mark.parametrize("name", ["running", "backend", "clock", "_commands", "metrics", "wake"])
+def test_reconfigure_refuses_internals(name):
+    engine = ClickEngine(RecordingBackend(), 100, "Milliseconds")
+    before = getattr(engine, name)
+    with pytest.raises(ValueError):
+        engine.reconfigure(**{name: None if name != "running" else False})
+    engine._apply_commands()
+    assert getattr(engine, name) is before
+
+
+def test_reconfigure_applies_allowed_settings():
+    engine = TypeEngine(RecordingBackend(), 1, "Second", "a", 0)
+    engine.reconfigure(interval=2, text_to_type="b", strategy="Paste")
+    assert engine._apply_commands()
+    assert (engine.interval, engine.text_to_type, engine.strategy) == (2, "b", "Paste")
+
+
+def test_job_engine_runs_on_a_virtual_clock():
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    engine = JobEngine(backend, clock=clock)
+    engine.add_job(1, 2, 0.1)
+    engine.add_job(3, 4, 0.25)
+    added = []
+    simulate(engine, clock, 600, at=[(300, lambda: added.append(engine.add_job(5, 6, 1)))])
+    clicks = [(args[0], args[1]) for _, action, args in backend.events if action == "click"]
+    # The first click of each job is at 0 and the last at exactly 600 may
+    # or may not make it in before the stop
+    assert 6000 <= clicks.count((1, 2)) <= 6001
+    assert 2400 <= clicks.count((3, 4)) <= 2401
+    assert 300 <= clicks.count((5, 6)) <= 301
+    assert engine.metrics.missed_deadlines == 0
+
+
+def test_job_engine_idles_on_a_virtual_clock():
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    engine = JobEngine(backend, clock=clock)
+    simulate(engine, clock, 3600)
+    assert backend.events == []
+    assert clock.now_ns() == 3600 * 1_000_000_000
+
+
+def test_stream_typer_runs_on_a_virtual_clock(tmp_path):
+    source = tmp_path / "lines.txt"
+    source.write_text("ab\n" * 50)
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    progress = []
+    engine = StreamTypeEngine(backend, str(source), key_delay=0.01,
+                              checkpoints=Checkpoints(str(tmp_path / "checkpoints.json")),
+                              on_progress=lambda *args: progress.append((clock.now_ns(), args)), clock=clock)
+    simulate(engine, clock, 3600)
+    assert not engine.running
+    assert engine.lines == 50
+    # 150 keys 10 ms apart, all on virtual time
+    assert clock.now_ns() == pytest.approx(1.5e9, rel=0.02)
+    assert progress[-1][1] == (150, 150, 50)
+    assert len(progress) < 20
+
+
+@pytest.mark.parametrize("interval, unit, burst", [
+    (0, "Milliseconds", 1),
+    (-100, "Milliseconds", 1),
+    (0, "Clicks/s", 1),
+    (float("inf"), "Clicks/s", 1),
+    (float("nan"), "Milliseconds", 1),
+    (100, "Milliseconds", 0),
+    (100, "Milliseconds", -3),
+    (100, "Milliseconds", 1.5),
+])
+def test_click_engine_refuses_click_storms(interval, unit, burst):
+    with pytest.raises(ValueError):
+        ClickEngine(RecordingBackend(), interval, unit, burst=burst)
+
+
+@pytest.mark.parametrize("settings", [{"interval": 0}, {"interval": -1}, {"burst": 0}])
+def test_click_engine_reconfigure_refuses_click_storms(settings):
+    engine = ClickEngine(RecordingBackend(), 100, "Milliseconds")
+    with pytest.raises(ValueError):
+        engine.reconfigure(**settings)
+    assert not engine._apply_commands()
+    assert (engine.interval, engine.burst) == (100, 1)
+
+
+def test_job_engine_refuses_click_storms():
+    engine = JobEngine(RecordingBackend())
+    with pytest.raises(ValueError):
+        engine.add_job(1, 2, 0)
+    job_id = engine.add_job(1, 2, 0.1)
+    with pytest.raises(ValueError):
+        engine.retime_job(job_id, -0.1)
+    assert engine.jobs()[0]["interval"] == pytest.approx(0.1)
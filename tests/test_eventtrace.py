@@ -0,0 +1,141 @@
+import pytest
+
+from backends import RecordingBackend
+from engines import ClickEngine
+from eventtrace import (HEARTBEAT, HEARTBEAT_MS, EventTrace, MarkTrace, TraceData, analyze, format_report, read_trace,
+                        write_trace)
+from timing import VirtualClock, simulate
+
+MS = 1_000_000
+
+
+def steady(trace, count, period_ms=10, late_ms=0, start=0):
+    for i in range(start, start + count):
+        deadline = i * period_ms * MS
+        trace.record(deadline, deadline + late_ms * MS, deadline + late_ms * MS + 50_000)
+
+
+def as_read(trace, marks):
+    # What read_trace() would give back for trace and marks
+    deadlines, sent, durations = trace.columns()
+    times, codes = marks.columns()
+    return TraceData(deadlines, sent, durations, trace.count, times, [marks.labels[code] for code in codes])
+
+
+def test_ring_is_preallocated_and_keeps_the_newest():
+    trace = EventTrace(size=4)
+    assert len(trace.deadlines) == len(trace.sent) == len(trace.durations) == 4
+    assert len(trace) == 0
+    steady(trace, 3)
+    assert list(trace.columns()[0]) == [0, 10 * MS, 20 * MS]
+    steady(trace, 7, start=3)
+    # Recording never grows the arrays, it writes over the oldest
+    assert len(trace.deadlines) == 4
+    assert (trace.count, len(trace)) == (10, 4)
+    deadlines, sent, durations = trace.columns()
+    assert list(deadlines) == [6 * 10 * MS, 7 * 10 * MS, 8 * 10 * MS, 9 * 10 * MS]
+    assert list(sent) == list(deadlines)
+    assert list(durations) == [50_000] * 4
+
+
+def test_marks_wrap_and_keep_their_labels():
+    marks = MarkTrace(size=3)
+    for i, label in enumerate([HEARTBEAT, "save", HEARTBEAT, "resize", HEARTBEAT]):
+        marks.mark(label, now_ns=i * MS)
+    times, codes = marks.columns()
+    assert list(times) == [2 * MS, 3 * MS, 4 * MS]
+    assert [marks.labels[code] for code in codes] == [HEARTBEAT, "resize", HEARTBEAT]
+
+
+@pytest.mark.parametrize("name", ["run.trace", "run.csv"])
+def test_write_and_read_back(tmp_path, name):
+    trace = EventTrace(size=8)
+    steady(trace, 12, late_ms=1)
+    marks = MarkTrace(size=8)
+    marks.mark(HEARTBEAT, now_ns=5 * MS)
+    marks.mark("save", now_ns=7 * MS)
+    path = str(tmp_path / "traces" / name)
+    write_trace(path, trace, marks)
+    assert not (tmp_path / "traces" / (name + ".tmp")).exists()
+    data = read_trace(path)
+    assert [list(c) for c in (data.deadlines, data.sent, data.durations)] == [list(c) for c in trace.columns()]
+    assert data.recorded == 12
+    assert list(data.mark_times) == [5 * MS, 7 * MS]
+    assert data.mark_labels == [HEARTBEAT, "save"]
+
+
+def test_write_without_marks(tmp_path):
+    trace = EventTrace(size=4)
+    steady(trace, 2)
+    path = str(tmp_path / "run.trace")
+    write_trace(path, trace)
+    data = read_trace(path)
+    assert (len(data.sent), data.recorded, list(data.mark_times), data.mark_labels) == (2, 2, [], [])
+
+
+def test_reading_something_else_fails(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not a trace\n")
+    with pytest.raises(ValueError):
+        read_trace(str(path))
+
+
+def test_analyze_a_steady_run(tmp_path):
+    trace = EventTrace(size=1000)
+    steady(trace, 1001, late_ms=1)
+    path = str(tmp_path / "run.trace")
+    write_trace(path, trace)
+    report = analyze(read_trace(path))
+    assert (report["events"], report["lost"]) == (1000, 1)
+    assert report["span_s"] == pytest.approx(9.99)
+    assert report["events_per_s"] == pytest.approx(100)
+    assert report["drift_ms_per_min"] == pytest.approx(0)
+    assert report["lateness_ms"] == {"p50": 1, "p99": 1, "max": 1}
+    assert report["jitter_ms"]["max"] == 0
+    assert report["jitter_buckets"][0] == 999
+    assert report["backend_ms"]["max"] == pytest.approx(0.05)
+    assert report["stalls"] == []
+    assert "1 older ones lost" in format_report(report)
+
+
+def test_analyze_finds_drift_and_stalls_with_the_gui_busy():
+    trace = EventTrace()
+    marks = MarkTrace()
+    # 10 s at 100/s, getting 0.1 ms later every second, with a 30 ms stall
+    # at 5 s while the GUI missed its heartbeats and was saving
+    for i in range(1000):
+        deadline = i * 10 * MS
+        late = i // 100 * 100_000
+        if 500 <= i < 503:
+            late = 30 * MS
+        trace.record(deadline, deadline + late, deadline + late + 10_000)
+    for at in range(0, 10_000, HEARTBEAT_MS):
+        if not 4980 <= at <= 5040:
+            marks.mark(HEARTBEAT, now_ns=at * MS)
+    marks.mark("save", now_ns=4999 * MS)
+    report = analyze(as_read(trace, marks))
+    assert report["drift_ms_per_min"] == pytest.approx(6, abs=1)
+    assert len(report["stalls"]) == 1
+    stall = report["stalls"][0]
+    assert stall["at_s"] == pytest.approx(5)
+    assert stall["events"] == 3
+    assert stall["worst_ms"] == pytest.approx(30)
+    assert stall["gui_gap_ms"] >= 2 * HEARTBEAT_MS
+    assert stall["gui_marks"] == ["save"]
+    assert report["stalls_with_gui_busy"] == 1
+    text = format_report(report)
+    assert "1 stalls over 5 ms, 1 while the GUI missed heartbeats" in text
+    assert "(save)" in text
+
+
+def test_click_engine_fills_the_trace_on_a_virtual_clock():
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    trace = EventTrace(size=100)
+    simulate(ClickEngine(backend, 100, "Milliseconds", trace=trace, clock=clock), clock, 60)
+    assert trace.count == backend.count("click")
+    assert len(trace) == 100
+    deadlines, sent, _ = trace.columns()
+    # On a virtual clock every click goes out exactly when it's due
+    assert list(sent) == list(deadlines)
+    assert deadlines[-1] - deadlines[0] == 99 * 100 * MS
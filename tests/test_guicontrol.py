@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+from control import ControlError, engine_settings
+from guicontrol import GuiController
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class Gui:
+    # The widgets GuiController drives, set up like AutoClicker's
+    def __init__(self):
+        def spin(cls, low, high, value):
+            box = cls()
+            box.setRange(low, high)
+            box.setValue(value)
+            return box
+
+        def combo(items):
+            box = QtWidgets.QComboBox()
+            box.addItems(items)
+            return box
+
+        self.click_interval = spin(QtWidgets.QSpinBox, 1, 10000, 100)
+        self.click_burst = spin(QtWidgets.QSpinBox, 1, 1000, 1)
+        self.missed_policy = combo(["Catch up", "Skip"])
+        self.time_unit = combo(["Milliseconds", "Seconds", "Minutes", "Clicks/s"])
+        self.type_interval = spin(QtWidgets.QDoubleSpinBox, 0.1, 10000, 1.0)
+        self.type_duration = spin(QtWidgets.QSpinBox, 0, 3600, 0)
+        self.type_key_delay = spin(QtWidgets.QSpinBox, 0, 10000, 50)
+        self.type_time_unit = combo(["Second", "Minute"])
+        self.text_to_type = QtWidgets.QLineEdit()
+
+
+def set_widgets(gui, job, **request):
+    GuiController(gui).set_widgets(job, engine_settings(job, request))
+
+
+def test_values_that_fit_go_in(app):
+    gui = Gui()
+    set_widgets(gui, "clicker", interval=250, unit="Seconds", burst=4)
+    assert (gui.click_interval.value(), gui.time_unit.currentText(), gui.click_burst.value()) == (250, "Seconds", 4)
+    set_widgets(gui, "typer", interval=2.5, duration=30, key_delay=7, text="hi")
+    assert gui.type_interval.value() == 2.5
+    assert (gui.type_duration.value(), gui.type_key_delay.value(), gui.text_to_type.text()) == (30, 7, "hi")
+
+
+@pytest.mark.parametrize("job, request_", [
+    ("clicker", {"interval": 0.5}),
+    ("clicker", {"interval": 20000}),
+    ("clicker", {"burst": 5000}),
+    ("typer", {"interval": 0.05}),
+    ("typer", {"interval": 1.125}),
+    ("typer", {"duration": 2.5}),
+    ("typer", {"duration": 7200}),
+    ("typer", {"key_delay": 0.5}),
+    ("typer", {"key_delay": 20000}),
+    ("typer", {"text": "x" * 40000}),
+])
+def test_values_that_would_be_rounded_or_clamped_are_refused(app, job, request_):
+    gui = Gui()
+    with pytest.raises(ControlError):
+        set_widgets(gui, job, **request_)
+
+
+def test_a_bad_unit_changes_nothing(app):
+    gui = Gui()
+    with pytest.raises(ControlError):
+        set_widgets(gui, "clicker", interval=250, burst=4, unit="Fortnights")
+    with pytest.raises(ControlError):
+        set_widgets(gui, "typer", interval=3, text="hi", unit="Milliseconds")
+    assert (gui.click_interval.value(), gui.click_burst.value(), gui.time_unit.currentText()) == (100, 1, "Milliseconds")
+    assert (gui.type_interval.value(), gui.text_to_type.text()) == (1.0, "")
@@ -0,0 +1,53 @@
+import pytest
+
+import hotkeys
+from hotkeys import HotkeyDispatcher
+
+
+class FailingHook:
+    # Like keyboard on Linux without root: imports, then fails to hook
+    def start(self, on_key):
+        raise ImportError("You must be root to use this library on linux.")
+
+
+class FakeEvdev:
+    started = None
+
+    def start(self, on_key):
+        FakeEvdev.started = on_key
+
+    def stop(self):
+        pass
+
+
+def test_falls_back_to_evdev_when_the_hook_cannot_start(monkeypatch):
+    monkeypatch.setattr(hotkeys.sys, "platform", "linux")
+    monkeypatch.setattr(hotkeys, "KeyboardHookSource", FailingHook)
+    monkeypatch.setattr(hotkeys, "EvdevSource", FakeEvdev)
+    pressed = []
+    dispatcher = HotkeyDispatcher()
+    dispatcher.bind("q", pressed.append)
+    dispatcher.start()
+    assert isinstance(dispatcher.source, FakeEvdev)
+    FakeEvdev.started("q", True)
+    assert pressed == ["q"]
+    dispatcher.stop()
+
+
+def test_hook_failure_is_raised_off_linux(monkeypatch):
+    monkeypatch.setattr(hotkeys.sys, "platform", "win32")
+    monkeypatch.setattr(hotkeys, "KeyboardHookSource", FailingHook)
+    with pytest.raises(ImportError):
+        HotkeyDispatcher().start()
+
+
+def test_both_failing_says_why(monkeypatch):
+    monkeypatch.setattr(hotkeys.sys, "platform", "linux")
+    monkeypatch.setattr(hotkeys, "KeyboardHookSource", FailingHook)
+
+    def no_keyboards():
+        raise RuntimeError("No readable keyboards under /dev/input")
+
+    monkeypatch.setattr(hotkeys, "EvdevSource", no_keyboards)
+    with pytest.raises(RuntimeError, match="root.*No readable keyboards"):
+        HotkeyDispatcher().start()
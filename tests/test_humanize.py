@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+
+import pytest
+
+from backends import RecordingBackend
+from engines import JobEngine
+
+np = pytest.importorskip("numpy")
+from humanize import HumanSchedule  # noqa: E402
+
+# Small blocks, so a run gets through far more than the feed could have
+# made before its thread went away
+BLOCK_SIZE = 4
+
+
+def humanized_engine():
+    engine = JobEngine(RecordingBackend())
+    engine.add_job(10, 10, 0.001, humanize=HumanSchedule(seed=1, block_size=BLOCK_SIZE))
+    return engine
+
+
+def run_for(engine, seconds):
+    thread = threading.Thread(target=engine.run, daemon=True)
+    thread.start()
+    time.sleep(seconds)
+    engine.stop()
+    thread.join(5)
+    return not thread.is_alive()
+
+
+def test_feed_made_on_another_thread():
+    engines = []
+    maker = threading.Thread(target=lambda: engines.append(humanized_engine()))
+    maker.start()
+    maker.join()
+    engine = engines[0]
+    assert run_for(engine, 0.3)
+    assert engine.backend.count('click') > BLOCK_SIZE * 4
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_feed_survives_fork():
+    # Built before the fork like cli.py --daemon does, run in the child
+    engine = humanized_engine()
+    pid = os.fork()
+    if pid == 0:
+        ok = run_for(engine, 0.3) and engine.backend.count('click') > BLOCK_SIZE * 4
+        os._exit(0 if ok else 1)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            assert os.waitstatus_to_exitcode(status) == 0
+            return
+        time.sleep(0.05)
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+    pytest.fail("the forked engine hung")
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from backends import RecordingBackend
+from macro import KEY_DOWN, KEY_UP, MOUSE_DOWN, MOUSE_UP, MOVE, EventLog, ReplayEngine
+from timing import VirtualClock, simulate
+
+
+def test_stopping_mid_macro_releases_what_is_held():
+    # Shift and the left button go down straight away; their ups are an
+    # hour off, so the replay is stopped in between
+    log = EventLog()
+    shift = log.key_index('shift')
+    log.append(0, KEY_DOWN, shift)
+    log.append(0, MOUSE_DOWN, 0)
+    log.append(3600 * 1_000_000_000, MOUSE_UP, 0)
+    log.append(3600 * 1_000_000_000, KEY_UP, shift)
+    backend = RecordingBackend()
+    engine = ReplayEngine(backend, log)
+    thread = threading.Thread(target=engine.run)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while engine.events_sent < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    engine.stop()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    actions = [(action, args) for t, action, args in backend.events]
+    assert actions == [
+        ('key_down', ('shift',)),
+        ('mouse_down', ('left',)),
+        ('key_up', ('shift',)),
+        ('mouse_up', ('left',)),
+    ]
+
+
+def test_finished_macro_releases_nothing_extra():
+    log = EventLog()
+    a = log.key_index('a')
+    log.append(0, KEY_DOWN, a)
+    log.append(1_000_000, KEY_UP, a)
+    backend = RecordingBackend()
+    ReplayEngine(backend, log).run()
+    assert [action for t, action, args in backend.events] == ['key_down', 'key_up']
+
+
+def test_replay_runs_on_a_virtual_clock():
+    # A minute-long macro at double speed, three times, in no real time
+    log = EventLog()
+    for second in range(61):
+        log.append(second * 1_000_000_000, MOVE, second, 0)
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    finished = []
+    engine = ReplayEngine(backend, log, speed=2, loops=3, on_finished=lambda: finished.append(clock.now_ns()), clock=clock)
+    simulate(engine, clock, 3600)
+    times = [t for t, action, args in backend.events]
+    assert len(times) == 183
+    loop = [t - times[0] for t in times[:61]]
+    assert loop == [second * 500_000_000 for second in range(61)]
+    assert finished == [90_000_000_000]
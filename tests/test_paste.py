@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+
+from backends import RecordingBackend
+from engines import TypeEngine
+from paste import (AUTO, CHUNK_SIZE, KEYS, PASTE, PASTE_CHORD, PASTE_THRESHOLD, MemoryClipboard, PasteUnavailable,
+                   paste_text, use_paste)
+from timing import VirtualClock, simulate
+
+
+class FailingClipboard(MemoryClipboard):
+    # Takes the first `works` copies, then can't be written
+    def __init__(self, text="", works=0):
+        super().__init__(text)
+        self.works = works
+
+    def copy(self, text):
+        if self.works <= 0:
+            raise OSError("no clipboard")
+        self.works -= 1
+        super().copy(text)
+
+
+def typer(text, strategy, clipboard, seconds=0.5, at=(), **kwargs):
+    # Runs a TypeEngine repeating text every second on a virtual clock, by
+    # default long enough to get through it once; returns it and what it
+    # sent
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    engine = TypeEngine(backend, 1, "Seconds", text, 0, key_delay=0, clock=clock, strategy=strategy,
+                        clipboard=clipboard, **kwargs)
+    simulate(engine, clock, seconds, at)
+    return engine, backend
+
+
+def pastes(backend):
+    return sum(1 for _, action, args in backend.events if action == "key_down" and args == (PASTE_CHORD[-1],))
+
+
+def keys_typed(backend):
+    return ''.join(args[0] for _, action, args in backend.events
+                   if action == "key_down" and args[0] not in PASTE_CHORD)
+
+
+@pytest.mark.parametrize("strategy, length, pasted", [
+    (KEYS, 10_000, False),
+    (PASTE, 1, True),
+    (AUTO, PASTE_THRESHOLD - 1, False),
+    (AUTO, PASTE_THRESHOLD, True),
+])
+def test_use_paste(strategy, length, pasted):
+    assert use_paste(strategy, "x" * length) is pasted
+
+
+def test_paste_text_chunks_and_restores_the_clipboard():
+    clipboard = MemoryClipboard("before")
+    backend = RecordingBackend()
+    assert paste_text("abcdefg", backend, clipboard, threading.Event(), chunk_size=3, settle=0)
+    assert clipboard.pasted == ["abc", "def", "g", "before"]
+    assert clipboard.text == "before"
+    assert pastes(backend) == 3
+
+
+def test_paste_text_says_how_far_it_got():
+    with pytest.raises(PasteUnavailable) as raised:
+        paste_text("abcdefg", RecordingBackend(), FailingClipboard(works=2), threading.Event(), chunk_size=3,
+                   settle=0)
+    assert raised.value.typed == 6
+
+
+def test_paste_strategy_pastes():
+    clipboard = MemoryClipboard("before")
+    engine, backend = typer("hello", PASTE, clipboard)
+    assert clipboard.pasted == ["hello", "before"]
+    assert pastes(backend) == 1
+    assert keys_typed(backend) == ""
+    assert engine.paste_error is None
+    assert engine.typed[PASTE][0] == 5
+
+
+@pytest.mark.parametrize("strategy", [PASTE, AUTO])
+def test_falls_back_to_keys_when_the_clipboard_fails(strategy):
+    text = "x" * PASTE_THRESHOLD
+    throughput = []
+    engine, backend = typer(text, strategy, FailingClipboard(), on_throughput=lambda *a: throughput.append(a))
+    assert "no clipboard" in engine.paste_error
+    assert pastes(backend) == 0
+    assert keys_typed(backend) == text
+    assert engine.typed[PASTE][0] == 0
+    assert engine.typed[KEYS][0] == len(text)
+    assert [strategy for strategy, _ in throughput] == [KEYS]
+
+
+def test_types_what_a_failed_paste_left():
+    # The first chunk goes, the clipboard fails on the second
+    text = "x" * CHUNK_SIZE + "rest"
+    engine, backend = typer(text, AUTO, FailingClipboard(works=1))
+    assert engine.paste_error is not None
+    assert pastes(backend) == 1
+    assert keys_typed(backend) == "rest"
+    assert engine.typed[PASTE][0] == CHUNK_SIZE
+    assert engine.typed[KEYS][0] == 4
+
+
+def test_keeps_typing_once_pasting_failed():
+    # Even when the clipboard comes back after the first repetition
+    clipboard = FailingClipboard()
+    engine, backend = typer("abc", PASTE, clipboard, seconds=3.5, at=[(0.5, lambda: setattr(clipboard, "works", 100))])
+    assert keys_typed(backend) == "abc" * 4
+    assert pastes(backend) == 0
+
+
+def test_auto_types_short_text_and_pastes_long():
+    clipboard = MemoryClipboard()
+    engine, backend = typer("short", AUTO, clipboard, paste_threshold=10)
+    assert (keys_typed(backend), clipboard.pasted) == ("short", [])
+    engine, backend = typer("long enough", AUTO, clipboard, paste_threshold=10)
+    assert keys_typed(backend) == ""
+    assert clipboard.pasted[0] == "long enough"
@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+
+from settings import DEFAULT_PROFILE, SCHEMA_VERSION, SettingsStore
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "settings"), str(tmp_path / "legacy.json")
+
+
+def store(paths, errors=None):
+    directory, legacy = paths
+    on_error = errors.append if errors is not None else None
+    return SettingsStore(directory, legacy, delay=0, on_error=on_error)
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_migrates_the_v1_file_and_leaves_it_alone(paths):
+    directory, legacy = paths
+    with open(legacy, "w") as f:
+        json.dump({"dark_mode": True, "ignore_tos_warnings": True}, f)
+    settings = store(paths).load()
+    assert settings.get("dark_mode") is True
+    assert settings.active_profile == DEFAULT_PROFILE
+    settings.close()
+
+    saved = read_json(os.path.join(directory, "settings.json"))
+    assert saved == {"version": SCHEMA_VERSION, "active_profile": DEFAULT_PROFILE,
+                     "global": {"dark_mode": True, "ignore_tos_warnings": True}}
+    assert read_json(legacy) == {"dark_mode": True, "ignore_tos_warnings": True}
+    # From now on the new file is the one read
+    with open(legacy, "w") as f:
+        json.dump({"dark_mode": False}, f)
+    assert store(paths).load().get("dark_mode") is True
+
+
+def test_a_corrupt_file_is_moved_aside(paths):
+    directory, _ = paths
+    os.makedirs(directory)
+    path = os.path.join(directory, "settings.json")
+    with open(path, "w") as f:
+        f.write("{not json")
+    errors = []
+    settings = store(paths, errors).load()
+    assert settings.globals == {}
+    assert len(errors) == 1
+    assert not os.path.exists(path)
+    with open(path + ".bad") as f:
+        assert f.read() == "{not json"
+
+
+def test_a_corrupt_legacy_file_is_left_alone(paths):
+    _, legacy = paths
+    with open(legacy, "w") as f:
+        f.write("{not json")
+    errors = []
+    settings = store(paths, errors).load()
+    assert settings.globals == {}
+    assert len(errors) == 1
+    with open(legacy) as f:
+        assert f.read() == "{not json"
+    assert not os.path.exists(legacy + ".bad")
+
+
+def test_writes_are_atomic(paths, monkeypatch):
+    directory, _ = paths
+    settings = store(paths).load()
+    settings.update(dark_mode=True)
+    settings.save_profile({"interval": 50})
+    settings.flush()
+    path = os.path.join(directory, "settings.json")
+    assert read_json(path)["global"] == {"dark_mode": True}
+    assert read_json(settings.profile_path(DEFAULT_PROFILE))["values"] == {"interval": 50}
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+    # A write that dies part way leaves the previous version in place
+    def crash(fd):
+        raise OSError("disk on fire")
+
+    errors = []
+    settings.on_error = errors.append
+    monkeypatch.setattr(os, "fsync", crash)
+    settings.update(dark_mode=False)
+    settings.flush()
+    assert errors
+    assert read_json(path)["global"] == {"dark_mode": True}
+    settings.close()
+
+
+def test_profiles_are_read_when_first_asked_for(paths):
+    settings = store(paths).load()
+    settings.save_profile({"interval": 50}, "Fast")
+    settings.close()
+    settings = store(paths).load()
+    assert settings._profiles == {}
+    assert "Fast" in settings.profile_names()
+    assert settings.profile("Fast") == {"interval": 50}
@@ -0,0 +1,17 @@
+from backends import RecordingBackend
+from timing import VirtualClock, simulate
+from trajectory import Path, PathEngine
+
+
+def test_path_runs_on_a_virtual_clock():
+    # Ten points at 100 Hz clicking on the last, round twice
+    path = Path(list(range(10)), [0] * 10, [9], 100)
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    engine = PathEngine(backend, path, loops=2, clock=clock)
+    simulate(engine, clock, 60)
+    moves = [t for t, action, args in backend.events if action == 'move']
+    assert moves == [i * 10_000_000 for i in range(20)]
+    assert [args for t, action, args in backend.events if action == 'click'] == [(None, None, 'left')] * 2
+    assert engine.metrics.missed_deadlines == 0
+    assert not engine.running
@@ -0,0 +1,157 @@
+import importlib.util
+import threading
+import time
+
+import pytest
+
+from backends import RecordingBackend
+from timing import VirtualClock, simulate
+from watch import CHANGE, COLOUR, TEMPLATE, RegionDetector, RegionGrabber, WatchEngine
+
+needs_numpy = pytest.mark.skipif(importlib.util.find_spec("numpy") is None, reason="needs numpy")
+
+
+class FrameGrabber:
+    # Hands out frame numbers instead of pixels
+    region = (100, 200, 40, 20)
+
+    def __init__(self):
+        self.frames = 0
+
+    def open(self):
+        pass
+
+    def grab(self):
+        self.frames += 1
+        return self.frames
+
+
+class EveryTenth:
+    def check(self, frame):
+        return frame % 10 == 0
+
+
+def test_watch_runs_on_a_virtual_clock():
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    grabber = FrameGrabber()
+    stats = []
+    engine = WatchEngine(backend, grabber, EveryTenth(), poll_rate=20, on_stats=lambda *s: stats.append(s),
+                         clock=clock)
+    simulate(engine, clock, 10)
+    # 20 frames a second for 10 seconds, and the one at 10 s on the dot
+    assert grabber.frames in (200, 201)
+    clicks = [(t, args) for t, action, args in backend.events if action == 'click']
+    assert [args for t, args in clicks] == [(120, 210, 'left')] * 20
+    assert [t for t, args in clicks] == [i * 500_000_000 - 50_000_000 for i in range(1, 21)]
+    assert len(stats) in (9, 10)
+    assert stats[-1][0] == 20
+
+
+def frame(colour, size=(20, 40)):
+    import numpy as np
+    return np.full(size + (3,), colour, dtype=np.uint8)
+
+
+@needs_numpy
+def test_change_fires_when_enough_pixels_change():
+    detector = RegionDetector(CHANGE, tolerance=16, threshold=0.1)
+    still = frame((10, 20, 30))
+    assert not detector.check(still)
+    assert not detector.check(still.copy())
+    # Within the tolerance
+    assert not detector.check(frame((20, 30, 40)))
+    blip = frame((20, 30, 40))
+    blip[:1] = 255
+    # 5% of the pixels is under the threshold, 25% isn't
+    assert not detector.check(blip)
+    blip = frame((20, 30, 40))
+    blip[:5] = 255
+    assert detector.check(blip)
+
+
+@needs_numpy
+def test_colour_fires_once_when_the_colour_shows_up():
+    detector = RegionDetector(COLOUR, tolerance=10, threshold=0.5, colour=(255, 0, 0))
+    assert not detector.check(frame((0, 0, 0)))
+    lit = frame((0, 0, 0))
+    lit[:12] = (250, 5, 0)
+    assert detector.check(lit)
+    # Still lit: no second click until it goes away and comes back
+    assert not detector.check(lit)
+    assert not detector.check(frame((0, 0, 0)))
+    assert detector.check(lit)
+
+
+@needs_numpy
+def test_template_fires_on_a_match():
+    import numpy as np
+    reference = np.arange(20 * 40 * 3, dtype=np.uint8).reshape(20, 40, 3)
+    detector = RegionDetector(TEMPLATE, tolerance=4, reference=reference)
+    assert not detector.check(frame((0, 0, 0)))
+    assert detector.check(reference.copy())
+    assert not detector.check(reference.copy())
+
+
+class FrameSequence:
+    # Black frames until the clock passes lit_at, red after
+    region = (100, 200, 40, 20)
+
+    def __init__(self, clock, lit_at):
+        self.clock = clock
+        self.lit_at = lit_at
+
+    def open(self):
+        pass
+
+    def grab(self):
+        return frame((255, 0, 0) if self.clock.now_ns() >= self.lit_at else (0, 0, 0))
+
+
+@needs_numpy
+def test_watch_clicks_when_the_region_lights_up():
+    clock = VirtualClock()
+    backend = RecordingBackend(clock)
+    grabber = FrameSequence(clock, 2_500_000_000)
+    detector = RegionDetector(COLOUR, colour=(255, 0, 0), threshold=0.5)
+    engine = WatchEngine(backend, grabber, detector, poll_rate=10, clock=clock)
+    simulate(engine, clock, 5)
+    assert [(t, action, args) for t, action, args in backend.events] == [
+        (2_500_000_000, 'click', (120, 210, 'left')),
+    ]
+
+
+@needs_numpy
+def test_watch_clicks_when_a_window_lights_up_on_x(x_display):
+    # A real window on a real (probably Xvfb) screen, grabbed with mss
+    pytest.importorskip("mss")
+    from Xlib import display
+    connection = display.Display()
+    screen = connection.screen()
+    window = screen.root.create_window(0, 0, 64, 48, 0, screen.root_depth, background_pixel=screen.black_pixel)
+    window.map()
+    connection.sync()
+    time.sleep(0.2)
+
+    backend = RecordingBackend()
+    engine = WatchEngine(backend, RegionGrabber((0, 0, 64, 48)),
+                         RegionDetector(COLOUR, tolerance=16, threshold=0.5, colour=(255, 0, 0)), poll_rate=50)
+    thread = threading.Thread(target=engine.run)
+    thread.start()
+    try:
+        time.sleep(0.3)
+        assert backend.events == []
+        red = screen.default_colormap.alloc_color(65535, 0, 0).pixel
+        window.change_attributes(background_pixel=red)
+        window.clear_area()
+        connection.sync()
+        deadline = time.monotonic() + 5
+        while not backend.events and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        engine.stop()
+        thread.join(5)
+        window.destroy()
+        connection.close()
+    assert [(action, args) for t, action, args in backend.events] == [('click', (32, 24, 'left'))]
+    assert engine.frames > 10
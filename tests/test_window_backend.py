@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from engines import ClickEngine
+
+
+@pytest.fixture
+def window(x_display):
+    # A stub client window counting every event it's sent
+    from benchmark import CountingWindow
+    window = CountingWindow()
+    yield window
+    window.close()
+
+
+def arrived(window, kind, count, timeout=2.0):
+    # How many events of kind the window has, waiting up to timeout for
+    # count of them
+    deadline = time.perf_counter() + timeout
+    while window.counts.get(kind, 0) < count and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return window.counts.get(kind, 0)
+
+
+def backend_for(window):
+    from backends import X11WindowBackend
+    return X11WindowBackend(window.window.id)
+
+
+def test_every_click_and_key_gets_to_the_window(window):
+    from Xlib import X
+    backend = backend_for(window)
+    try:
+        for _ in range(10):
+            backend.click()
+        backend.click_batch(5, 10, 20)
+        backend.press("a")
+        backend.hotkey("ctrl", "v")
+    finally:
+        backend.close()
+    assert window.received(15) == 15
+    assert arrived(window, X.ButtonRelease, 15) == 15
+    assert arrived(window, X.KeyPress, 3) == 3
+    assert arrived(window, X.KeyRelease, 3) == 3
+    assert window.counts.get(X.ButtonPress) == 15
+
+
+def test_clicking_engine_drives_the_window_without_moving_the_pointer(window):
+    root = window.display.screen().root
+    before = root.query_pointer()
+    engine = ClickEngine(backend_for(window), 5, "Milliseconds")
+    thread = threading.Thread(target=engine.run)
+    thread.start()
+    time.sleep(0.3)
+    engine.stop()
+    thread.join()
+    sent = engine.metrics.events_sent
+    assert sent > 10
+    assert window.received(sent) == sent
+    after = root.query_pointer()
+    assert (after.root_x, after.root_y) == (before.root_x, before.root_y)
+
+
+def test_refuses_a_window_that_isnt_there(x_display):
+    from backends import X11WindowBackend
+    from benchmark import CountingWindow
+    gone = CountingWindow()
+    gone.close()
+    with pytest.raises(ValueError):
+        X11WindowBackend(hex(gone.window.id))
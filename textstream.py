@@ -0,0 +1,82 @@
+import codecs
+import json
+import os
+
+# Feeds big text files to the typer a chunk at a time, so memory use
+# doesn't depend on the file size, and remembers how far it got so an
+# interrupted run can pick up where it stopped.
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_lines(path, offset=0, chunk_size=CHUNK_SIZE):
+    # Yields (line, size in bytes) starting at byte offset. The last line of
+    # a chunk may be cut short; it's yielded as is and the rest comes with
+    # the next chunk. Undecodable bytes come through as surrogates so byte
+    # sizes stay exact.
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='surrogateescape')
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            data = f.read(chunk_size)
+            text = decoder.decode(data, final=not data)
+            for line in text.splitlines(keepends=True):
+                yield line, len(line.encode('utf-8', 'surrogateescape'))
+            if not data:
+                return
+
+
+def typeable(line):
+    # Drops what read_lines smuggled through for undecodable bytes, and
+    # carriage returns so Windows line endings don't press enter twice
+    return ''.join(char for char in line if not '\ud800' <= char <= '\udfff' and char != '\r')
+
+
+class Checkpoints:
+    # Byte offset and line count per source file, in one small JSON file.
+    # A checkpoint only counts if the file hasn't changed since.
+    def __init__(self, path=None):
+        self.path = path or os.path.join(os.path.expanduser("~"), ".autoclicker_checkpoints.json")
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, checkpoints):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoints, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(source):
+        return os.path.abspath(source)
+
+    @staticmethod
+    def _stamp(source):
+        stat = os.stat(source)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, source):
+        # Returns (offset, lines) to resume from
+        checkpoint = self._load().get(self._key(source))
+        if not checkpoint or checkpoint.get('stamp') != self._stamp(source):
+            return 0, 0
+        return checkpoint['offset'], checkpoint['lines']
+
+    def save(self, source, offset, lines):
+        checkpoints = self._load()
+        checkpoints[self._key(source)] = {
+            'offset': offset,
+            'lines': lines,
+            'stamp': self._stamp(source),
+        }
+        self._write(checkpoints)
+
+    def clear(self, source):
+        checkpoints = self._load()
+        if checkpoints.pop(self._key(source), None) is not None:
+            self._write(checkpoints)
@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import time
+
+# How many seconds one "interval" is worth for every unit the GUI offers
+UNIT_SECONDS = {
+    "Milliseconds": 0.001,
+    "Seconds": 1,
+    "Minutes": 60,
+    "Second": 1,
+    "Minute": 60,
+}
+
+# A rate rather than a length: the interval is how many clicks a second
+CLICKS_PER_SECOND = "Clicks/s"
+
+# The last stretch before a deadline is spun instead of slept, because
+# time.sleep() routinely overshoots by a millisecond or more
+SPIN_NS = 2_000_000
+
+# What to do when a deadline has already passed by the time we get to it
+CATCH_UP = "Catch up"
+SKIP = "Skip"
+MISSED_POLICIES = [CATCH_UP, SKIP]
+
+
+def interval_to_seconds(interval, time_unit):
+    if time_unit == CLICKS_PER_SECOND:
+        return 1 / interval
+    return interval * UNIT_SECONDS.get(time_unit, 1)
+
+
+def wait_until(deadline_ns, wake, spin_ns=SPIN_NS):
+    # Sleeps on a threading.Event instead of time.sleep() so whoever sets
+    # it (stop(), mostly) gets us out straight away, no matter how far off
+    # the deadline is. Returns False when that happens.
+    remaining = deadline_ns - time.perf_counter_ns() - spin_ns
+    if remaining > 0 and wake.wait(remaining / 1_000_000_000):
+        return False
+    while time.perf_counter_ns() < deadline_ns:
+        if wake.is_set():
+            return False
+    return True
+
+
+class RealClock:
+    # The clock engines use unless given another. now_ns() is perf_counter_ns
+    # itself, not a method wrapping it, so the hot loops pay nothing for it.
+    def __init__(self):
+        self.now_ns = time.perf_counter_ns
+
+    def wait(self, wake, seconds):
+        # Like wake.wait(seconds): True if wake got set
+        return wake.wait(seconds)
+
+    def wait_until(self, deadline_ns, wake, spin_ns=SPIN_NS):
+        return wait_until(deadline_ns, wake, spin_ns)
+
+
+REAL_CLOCK = RealClock()
+
+
+class VirtualClock:
+    # Time that only moves when the engine waits: every wait jumps straight
+    # to its end, so hours of clicking run in however long the clicks
+    # themselves take. Functions scheduled with at() run from inside the
+    # wait that passes their time, which is how a simulation stops an
+    # engine or changes its settings part way (both set its wake event and
+    # cut the wait short, as they would for real).
+    #
+    # Meant for one engine running on the thread that drives it, see
+    # simulate().
+
+    def __init__(self, start_ns=0):
+        self.start_ns = start_ns
+        self.now = start_ns
+        self._timers = []  # heap of (time_ns, order added, function)
+        self._order = itertools.count()
+
+    def now_ns(self):
+        return self.now
+
+    def at(self, seconds, function):
+        # Calls function once the clock reaches seconds after its start
+        when = self.start_ns + int(round(seconds * 1_000_000_000))
+        heapq.heappush(self._timers, (when, next(self._order), function))
+
+    def _advance(self, target_ns, wake):
+        # Moves to target_ns, running timers on the way; False if one of
+        # them set wake, leaving the clock at that timer's time
+        while self._timers and self._timers[0][0] <= target_ns:
+            when, _, function = heapq.heappop(self._timers)
+            self.now = max(self.now, when)
+            function()
+            if wake.is_set():
+                return False
+        self.now = max(self.now, target_ns)
+        return True
+
+    def wait(self, wake, seconds):
+        if wake.is_set():
+            return True
+        return not self._advance(self.now + int(round(seconds * 1_000_000_000)), wake)
+
+    def wait_until(self, deadline_ns, wake, spin_ns=SPIN_NS):
+        if wake.is_set():
+            return False
+        return self._advance(deadline_ns, wake)
+
+
+def simulate(engine, clock, seconds, at=()):
+    # Runs engine (built with clock=clock, and a RecordingBackend(clock) to
+    # see what it sent) on this thread until seconds of virtual time have
+    # passed or it finishes by itself. at is (seconds, function) pairs to
+    # call on the way, e.g. (60, lambda: engine.reconfigure(interval=5)).
+    #
+    #   clock = VirtualClock()
+    #   backend = RecordingBackend(clock)
+    #   simulate(ClickEngine(backend, 100, "Milliseconds", clock=clock), clock, 3600)
+    #   backend.count('click')  # 36000, one every 100 ms on the dot
+    for when, function in at:
+        clock.at(when, function)
+    clock.at(seconds, engine.stop)
+    engine.run()
+
+
+class DeadlineScheduler:
+    # Hands out absolute deadlines spaced exactly one period apart, so the
+    # time spent doing the work never adds to the period.
+    #
+    # CATCH_UP fires missed deadlines back to back (at most max_catch_up of
+    # them, after that it resyncs), SKIP drops them and waits for the next
+    # deadline that is still in the future.
+
+    def __init__(self, period, policy=CATCH_UP, max_catch_up=10, spin_ns=SPIN_NS, clock=REAL_CLOCK):
+        self.period_ns = max(1, int(period * 1_000_000_000))
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.spin_ns = spin_ns
+        self.clock = clock
+        self.deadline = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.events = 0
+        self.missed = 0
+        self.first_ns = 0
+        self.last_ns = 0
+        # Welford running mean/variance of the gap between events
+        self._gap_mean = 0.0
+        self._gap_m2 = 0.0
+
+    def retime(self, period):
+        # The next deadline moves so it's one new period after the last one,
+        # which may put it in the past; then it simply fires right away,
+        # without the events a shorter period would have had meanwhile
+        period_ns = max(1, int(period * 1_000_000_000))
+        if self.deadline is not None:
+            self.deadline = max(self.deadline + period_ns - self.period_ns, self.clock.now_ns())
+        self.period_ns = period_ns
+        self.reset_stats()
+
+    def start(self):
+        # First event fires right away
+        self.deadline = self.clock.now_ns()
+        return self.deadline
+
+    def wait(self, wake):
+        # Returns False if wake got set before the deadline came up
+        return self.clock.wait_until(self.deadline, wake, self.spin_ns)
+
+    def mark(self, now=None, period_ns=None):
+        # Record that the event for the current deadline has been sent (at
+        # now, if the caller already knows) and move on to the next one,
+        # period_ns after it if given instead of the usual period
+        if period_ns is None:
+            period_ns = self.period_ns
+        if now is None:
+            now = self.clock.now_ns()
+        if self.events:
+            gap = now - self.last_ns
+            n = self.events
+            delta = gap - self._gap_mean
+            self._gap_mean += delta / n
+            self._gap_m2 += delta * (gap - self._gap_mean)
+        else:
+            self.first_ns = now
+        self.events += 1
+        self.last_ns = now
+
+        self.deadline += period_ns
+        behind = now - self.deadline
+        if behind >= 0:
+            missed = behind // period_ns + 1
+            if self.policy == SKIP or missed > self.max_catch_up:
+                self.missed += missed
+                self.deadline += missed * period_ns
+        return now
+
+    def achieved_rate(self):
+        # Events per second over the whole run
+        if self.events < 2:
+            return 0.0
+        return (self.events - 1) * 1_000_000_000 / (self.last_ns - self.first_ns)
+
+    def jitter_ms(self):
+        # Standard deviation of the gap between events
+        if self.events < 3:
+            return 0.0
+        return (self._gap_m2 / (self.events - 2)) ** 0.5 / 1_000_000
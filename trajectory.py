@@ -0,0 +1,157 @@
+import threading
+
+from telemetry import EngineMetrics
+from timing import DeadlineScheduler, CATCH_UP, REAL_CLOCK
+
+# Moves the cursor through a list of targets along smooth curves and clicks
+# at each one. The whole path is worked out up front with NumPy, one point
+# per sample at a fixed sample rate, and the engine just sends the points
+# on schedule. numpy is only imported when a path is planned.
+
+LINEAR = "Linear"
+EASE = "Ease in-out"
+BEZIER = "Bezier"
+CURVES = [LINEAR, EASE, BEZIER]
+
+SAMPLE_RATE = 240   # points a second
+SPEED = 1500        # pixels a second, on average
+MIN_SEGMENT = 0.05  # seconds, even for targets right next to each other
+
+# How far a Bezier segment may bow out sideways, as a fraction of its length
+BOW = 0.25
+
+
+class Path:
+    # Sample points as plain lists, and the samples that land on a target
+    def __init__(self, xs, ys, clicks, sample_rate):
+        self.xs = xs
+        self.ys = ys
+        self.clicks = clicks
+        self.sample_rate = sample_rate
+
+    def __len__(self):
+        return len(self.xs)
+
+    def duration(self):
+        return len(self.xs) / self.sample_rate
+
+
+def plan_path(points, sample_rate=SAMPLE_RATE, speed=SPEED, curve=BEZIER, closed=False, seed=None):
+    # Starts on the first point and visits the rest in order, back to the
+    # first one as well if closed (for looping). Every segment is computed
+    # at once: each sample knows its segment and how far along it it is.
+    import numpy as np
+    if curve not in CURVES:
+        raise ValueError(f"curve must be one of {', '.join(CURVES)}")
+    if not points:
+        raise ValueError("a path needs at least one point")
+    targets = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if closed and len(targets) > 1:
+        targets = np.vstack([targets, targets[:1]])
+    starts, ends = targets[:-1], targets[1:]
+
+    lengths = np.hypot(*(ends - starts).T)
+    seconds = np.maximum(lengths / speed, MIN_SEGMENT)
+    counts = np.maximum(1, np.ceil(seconds * sample_rate)).astype(np.int64)
+
+    # Sample 0 sits on the first target; each segment's samples follow,
+    # ending exactly on its target
+    segment = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    t = (np.arange(counts.sum()) - first[segment] + 1) / counts[segment]
+
+    if curve == LINEAR:
+        eased = t
+    else:
+        eased = t * t * (3 - 2 * t)
+    p0, p3 = starts[segment], ends[segment]
+
+    if curve == BEZIER:
+        # Both control points pushed to the same side, by a random amount
+        # per segment, so each move is a gentle arc
+        rng = np.random.default_rng(seed)
+        direction = ends - starts
+        normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+        bow = rng.uniform(-BOW, BOW, (len(counts), 1))
+        c1 = starts + direction / 3 + normal * bow
+        c2 = starts + direction * 2 / 3 + normal * bow
+        u = eased[:, None]
+        v = 1 - u
+        xy = v ** 3 * p0 + 3 * v * v * u * c1[segment] + 3 * v * u * u * c2[segment] + u ** 3 * p3
+    else:
+        xy = p0 + (p3 - p0) * eased[:, None]
+
+    xy = np.vstack([targets[:1], xy])
+    xy = np.rint(xy).astype(np.int64)
+    clicks = [0] + (np.cumsum(counts)).tolist()
+    if closed and len(points) > 1:
+        # The last sample is the first target again, clicked on the next loop
+        xy = xy[:-1]
+        clicks = clicks[:-1]
+    return Path(xy[:, 0].tolist(), xy[:, 1].tolist(), clicks, sample_rate)
+
+
+def _ignore(*args):
+    pass
+
+
+class PathEngine:
+    # Sends one point of the path per sample period and clicks on the
+    # samples that land on a target. Every point gets sent: if we fall
+    # behind they go out back to back until we've caught up. loops=0 goes
+    # round forever. clock is a timing.VirtualClock to simulate with.
+
+    def __init__(self, backend, path, loops=1, button="left", on_finished=None, clock=REAL_CLOCK):
+        self.backend = backend
+        self.clock = clock
+        self.path = path
+        self.loops = loops
+        self.button = button
+        # Called when all loops are done, not when stopped
+        self.on_finished = on_finished or _ignore
+        self.metrics = EngineMetrics("path")
+        self.scheduler = None
+        self.running = True
+        # Set by stop() to cut any wait short
+        self.wake = threading.Event()
+
+    def run(self):
+        try:
+            self.path_loop()
+        finally:
+            self.backend.close()
+
+    def path_loop(self):
+        path = self.path
+        xs, ys = path.xs, path.ys
+        clicks = set(path.clicks)
+        move = self.backend.move
+        click = self.backend.click
+        button = self.button
+        metrics = self.metrics
+        clock = self.clock.now_ns
+        self.scheduler = scheduler = DeadlineScheduler(1 / path.sample_rate, CATCH_UP, clock=self.clock)
+        scheduler.start()
+
+        loop = 0
+        while self.running and (self.loops == 0 or loop < self.loops):
+            for i in range(len(xs)):
+                if not scheduler.wait(self.wake):
+                    return
+                start = clock()
+                move(xs[i], ys[i])
+                if i in clicks:
+                    click(button=button)
+                now = clock()
+                metrics.record(start, now)
+                scheduler.mark(now)
+                metrics.missed_deadlines = scheduler.missed
+            loop += 1
+
+        if self.running:
+            self.running = False
+            self.on_finished()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
@@ -0,0 +1,192 @@
+import threading
+
+from telemetry import EngineMetrics
+from timing import DeadlineScheduler, REAL_CLOCK, SKIP
+
+# Clicks when something happens inside a small screen region instead of on
+# a timer. Only the region is captured, and frames are compared with
+# vectorized NumPy operations on preallocated buffers. numpy (and mss, if
+# it's around) are only imported once a watch starts.
+
+CHANGE = "Change"
+COLOUR = "Colour"
+TEMPLATE = "Template"
+WATCH_MODES = [CHANGE, COLOUR, TEMPLATE]
+
+
+class RegionGrabber:
+    # Grabs (left, top, width, height) as an RGB uint8 array. Uses mss when
+    # installed and falls back to pyautogui's screenshot otherwise. Must be
+    # opened on the thread that grabs.
+    def __init__(self, region):
+        self.region = region
+        self._grab = None
+
+    def open(self):
+        import numpy as np
+        left, top, width, height = self.region
+        try:
+            import mss
+        except ImportError:
+            import pyautogui
+
+            def grab():
+                return np.asarray(pyautogui.screenshot(region=self.region))[:, :, :3]
+        else:
+            sct = mss.mss()
+            monitor = {"left": left, "top": top, "width": width, "height": height}
+
+            def grab():
+                shot = sct.grab(monitor)
+                # BGRA to RGB as a view, without copying
+                return np.frombuffer(shot.raw, np.uint8).reshape(height, width, 4)[:, :, 2::-1]
+        self._grab = grab
+
+    def grab(self):
+        if self._grab is None:
+            self.open()
+        return self._grab()
+
+
+class RegionDetector:
+    # Decides whether a frame should trigger a click.
+    #
+    # CHANGE fires when at least `threshold` of the pixels differ from the
+    # previous frame by more than `tolerance` in any channel.
+    # COLOUR fires when at least `threshold` of the pixels are within
+    # `tolerance` of `colour`.
+    # TEMPLATE fires when the mean difference from `reference` is within
+    # `tolerance`.
+    # COLOUR and TEMPLATE only fire when the match starts, not on every
+    # frame while it lasts.
+
+    def __init__(self, mode, tolerance=16, threshold=0.01, colour=(255, 255, 255), reference=None):
+        import numpy as np
+        self.np = np
+        self.mode = mode
+        self.tolerance = tolerance
+        self.threshold = threshold
+        self.colour = np.array(colour, dtype=np.int16)
+        self.reference = None if reference is None else np.array(reference, dtype=np.int16)
+        self.matching = False
+        self._diff = None
+        self._mask = None
+
+    def _buffers(self, frame):
+        if self._diff is None or self._diff.shape != frame.shape:
+            self._diff = self.np.empty(frame.shape, dtype=self.np.int16)
+            self._mask = self.np.empty(frame.shape[:2], dtype=bool)
+        return self._diff, self._mask
+
+    def check(self, frame):
+        np = self.np
+        diff, mask = self._buffers(frame)
+
+        if self.mode == CHANGE:
+            if self.reference is None or self.reference.shape != frame.shape:
+                self.reference = frame.astype(np.int16)
+                return False
+            np.subtract(frame, self.reference, out=diff)
+            np.abs(diff, out=diff)
+            np.greater(diff.max(axis=2), self.tolerance, out=mask)
+            self.reference[...] = frame
+            return mask.mean() >= self.threshold
+
+        if self.mode == COLOUR:
+            np.subtract(frame, self.colour, out=diff)
+            np.abs(diff, out=diff)
+            np.less_equal(diff.max(axis=2), self.tolerance, out=mask)
+            matching = mask.mean() >= self.threshold
+        else:
+            if self.reference is None or self.reference.shape != frame.shape:
+                return False
+            np.subtract(frame, self.reference, out=diff)
+            np.abs(diff, out=diff)
+            matching = diff.mean() <= self.tolerance
+
+        fire = matching and not self.matching
+        self.matching = matching
+        return fire
+
+
+def _ignore(*args):
+    pass
+
+
+class WatchEngine:
+    # Polls the region poll_rate times a second and clicks (at the centre of
+    # the region unless told otherwise) through the input backend whenever
+    # the detector fires. Reports frames/s, triggers and the average capture
+    # and compare cost per frame about once a second. clock is a
+    # timing.VirtualClock to simulate with.
+
+    def __init__(self, backend, grabber, detector, poll_rate=30, click_at=None,
+                 button="left", on_stats=None, clock=REAL_CLOCK):
+        self.backend = backend
+        self.clock = clock
+        self.grabber = grabber
+        self.detector = detector
+        self.poll_rate = poll_rate
+        if click_at is None:
+            left, top, width, height = grabber.region
+            click_at = (left + width // 2, top + height // 2)
+        self.click_at = click_at
+        self.button = button
+        self.on_stats = on_stats or _ignore  # frames/s, triggers, capture ms, compare ms
+        self.metrics = EngineMetrics("watch")
+        self.frames = 0
+        self.triggers = 0
+        self.capture_ns = 0
+        self.compare_ns = 0
+        self.running = True
+        # Set by stop() to cut any wait short
+        self.wake = threading.Event()
+
+    def run(self):
+        try:
+            self.watch_loop()
+        finally:
+            self.backend.close()
+
+    def watch_loop(self):
+        self.grabber.open()
+        scheduler = DeadlineScheduler(1 / self.poll_rate, SKIP, clock=self.clock)
+        grab = self.grabber.grab
+        check = self.detector.check
+        x, y = self.click_at
+        now_ns = self.clock.now_ns
+
+        next_report = scheduler.start() + 1_000_000_000
+        while self.running:
+            if not scheduler.wait(self.wake):
+                break
+            t0 = now_ns()
+            frame = grab()
+            t1 = now_ns()
+            fire = check(frame)
+            t2 = now_ns()
+            self.capture_ns += t1 - t0
+            self.compare_ns += t2 - t1
+            self.frames += 1
+            if fire:
+                self.backend.click(x, y, self.button)
+                self.metrics.record(t2, now_ns())
+                self.triggers += 1
+            now = scheduler.mark()
+            self.metrics.missed_deadlines = scheduler.missed
+            if now >= next_report:
+                self.on_stats(*self.stats(scheduler))
+                next_report = now + 1_000_000_000
+
+    def stats(self, scheduler):
+        frames = self.frames or 1
+        return (
+            scheduler.achieved_rate(),
+            self.triggers,
+            self.capture_ns / frames / 1_000_000,
+            self.compare_ns / frames / 1_000_000,
+        )
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
@@ -0,0 +1,155 @@
+import threading
+import time
+
+from backends import RecordingBackend, create_backend
+from engines import check_settings
+from telemetry import VALUE_COUNT, EngineMetrics
+
+# Runs an engine in a process of its own, so nothing else in the GUI's
+# process (the Qt event loop, image matching, generating schedules) can
+# hold the GIL while it's due to send an event.
+#
+# A ProcessEngine stands in for the engine in this process: it has the
+# same run(), stop(), reconfigure() and metrics, so the GUI threads wrap it
+# like any other engine. run() starts the worker and then relays the
+# engine's callbacks until it exits. Commands go to the worker down a pipe;
+# the worker copies the engine's metrics into shared memory every
+# PUBLISH_INTERVAL, so reading them never waits on the worker or the pipe.
+#
+# Workers are spawned, not forked: forking a process that has Qt and other
+# threads running isn't safe. The engine class and its settings have to
+# pickle, and the worker opens its own backend by name.
+
+# How often the worker refreshes the shared metrics, in seconds
+PUBLISH_INTERVAL = 0.1
+
+
+def _ignore(*args):
+    pass
+
+
+def _forward(conn, name):
+    # Sends the callback's arguments back to the ProcessEngine
+    def send(*args):
+        try:
+            conn.send((name, args))
+        except OSError:
+            pass
+    return send
+
+
+def _worker_main(conn, shared, engine_class, backend_name, settings, callback_names):
+    try:
+        backend = create_backend(backend_name)
+    except Exception as e:
+        conn.send(("on_error", (f"Failed to open the {backend_name} input backend:\n{e}",)))
+        return
+    callbacks = {name: _forward(conn, name) for name in callback_names}
+    engine = engine_class(backend, **settings, **callbacks)
+    conn.send(("_started", (engine.metrics.engine,)))
+
+    thread = threading.Thread(target=engine.run, daemon=True)
+    cpu_start = time.process_time()
+    thread.start()
+    while thread.is_alive():
+        if conn.poll(PUBLISH_INTERVAL):
+            try:
+                command, values = conn.recv()
+            except EOFError:
+                # Whoever started us is gone
+                command, values = "stop", None
+            if command == "stop":
+                engine.stop()
+                break
+            elif command == "reconfigure":
+                engine.reconfigure(**values)
+        shared[:] = engine.metrics.values()
+    thread.join()
+    shared[:] = engine.metrics.values()
+
+    # A recording backend's events go back too, for the benchmarks, and
+    # the engine's trace if it kept one
+    recorded = backend.events if isinstance(backend, RecordingBackend) else None
+    try:
+        conn.send(("_exited", (time.process_time() - cpu_start, recorded, getattr(engine, "trace", None))))
+    except OSError:
+        pass
+
+
+class ProcessEngine:
+    # engine_class(backend, **settings, **callbacks) is built in the worker.
+    # callbacks are called on the thread running run(); on_error gets a
+    # message if the worker couldn't open its backend.
+
+    def __init__(self, engine_class, backend_name, settings, callbacks=None, on_error=None):
+        # multiprocessing takes a while to import and is only needed here
+        import multiprocessing
+        self.context = multiprocessing.get_context("spawn")
+        self.engine_class = engine_class
+        self.backend_name = backend_name
+        self.settings = settings
+        self.callbacks = callbacks or {}
+        self.on_error = on_error or _ignore
+        self.running = True
+        # Filled in by the worker: the name its metrics go under, and once
+        # it has exited the CPU time it used while the engine ran and, for a
+        # recording backend, the events
+        self.metrics_name = engine_class.__name__
+        self.cpu_time = None
+        self.recorded = None
+        # The worker fills in its own copy; this one is replaced with it
+        self.trace = settings.get("trace")
+        self._shared = self.context.RawArray('Q', VALUE_COUNT)
+        self._conn, self._child_conn = self.context.Pipe()
+        self._send_lock = threading.Lock()
+
+    @property
+    def metrics(self):
+        # A snapshot, at most PUBLISH_INTERVAL old
+        return EngineMetrics.from_values(self.metrics_name, self._shared[:])
+
+    def run(self):
+        process = self.context.Process(
+            target=_worker_main,
+            args=(self._child_conn, self._shared, self.engine_class, self.backend_name,
+                  self.settings, list(self.callbacks)),
+            daemon=True
+        )
+        process.start()
+        self._child_conn.close()
+        try:
+            while True:
+                try:
+                    name, args = self._conn.recv()
+                except EOFError:
+                    break
+                if name == "_started":
+                    self.metrics_name = args[0]
+                elif name == "_exited":
+                    self.cpu_time, self.recorded, self.trace = args
+                elif name == "on_error":
+                    self.on_error(*args)
+                else:
+                    self.callbacks[name](*args)
+        finally:
+            process.join()
+            self.running = False
+            with self._send_lock:
+                self._conn.close()
+
+    def _send(self, command, values=None):
+        with self._send_lock:
+            try:
+                self._conn.send((command, values))
+            except OSError:
+                # The worker has already gone
+                pass
+
+    def reconfigure(self, **settings):
+        # Checked here, where the caller can see the error, not in the worker
+        check_settings(self.engine_class, settings)
+        self._send("reconfigure", settings)
+
+    def stop(self):
+        self.running = False
+        self._send("stop")